@@ -0,0 +1,84 @@
+"""
+Static guides served when the AI guide can't be generated (provider down, circuit open, no API key):
+general instructions for the document, without the personalised advice
+"""
+
+from typing import List, Optional
+
+_AUTOCERTIFICAZIONE_COMUNE = """## Come presentarla
+- Firma il documento: non serve l'autentica della firma né la marca da bollo.
+- Consegnala all'ufficio che la richiede insieme a una copia di un documento d'identità valido,
+  oppure inviala via PEC o e-mail se l'ente lo consente.
+
+## Validità e limitazioni
+- Le pubbliche amministrazioni e i gestori di pubblici servizi sono obbligati ad accettarla;
+  i privati possono accettarla ma non sono tenuti a farlo.
+- L'ente può svolgere controlli sulla veridicità di quanto dichiarato.
+
+## Riferimenti normativi
+- DPR 445/2000, artt. 46 e 47 (dichiarazioni sostitutive).
+- DPR 445/2000, art. 76: le dichiarazioni false comportano responsabilità penale."""
+
+FALLBACK_GUIDES = {
+    'partita_iva': """## Riepilogo della situazione
+Il modulo AA9/12 per la dichiarazione di inizio attività è pronto: va presentato all'Agenzia delle Entrate.
+
+## Documenti necessari
+- Modulo AA9/12 compilato e firmato.
+- Documento d'identità e codice fiscale del titolare.
+
+## Procedura passo-passo
+1. Verifica i dati del modulo, in particolare il codice ATECO e il regime fiscale.
+2. Presentalo online con i servizi telematici dell'Agenzia delle Entrate (SPID, CIE o CNS),
+   tramite un intermediario abilitato, oppure di persona presso un ufficio territoriale.
+3. Conserva la ricevuta con il numero di Partita IVA attribuito.
+
+## Tempistiche
+- Entro 30 giorni dalla data di inizio dell'attività.
+
+## Costi
+- La presentazione del modulo è gratuita.
+
+## Dopo l'apertura
+- Iscrizione alla gestione previdenziale INPS corretta per la tua attività.
+- Attivazione di un indirizzo PEC e della fatturazione elettronica.
+- Per le attività d'impresa, iscrizione al Registro delle Imprese tramite ComUnica.""",
+
+    'autocertificazione': """## Cos'è l'autocertificazione di residenza
+È una dichiarazione sostitutiva di certificazione con cui attesti la tua residenza
+al posto del certificato rilasciato dal Comune.
+
+""" + _AUTOCERTIFICAZIONE_COMUNE,
+
+    'autocertificazione_nascita': """## Cos'è l'autocertificazione di nascita
+È una dichiarazione sostitutiva di certificazione con cui il dichiarante attesta i dati di nascita
+al posto del certificato rilasciato dall'ufficio di stato civile.
+
+""" + _AUTOCERTIFICAZIONE_COMUNE,
+
+    'stato_civile': """## Cos'è l'autocertificazione di stato civile
+È una dichiarazione sostitutiva di certificazione con cui attesti il tuo stato civile
+(celibe/nubile, coniugato/a, separato/a, divorziato/a, vedovo/a) al posto del certificato del Comune.
+
+""" + _AUTOCERTIFICAZIONE_COMUNE,
+}
+
+_TITLES = {
+    'partita_iva': "Apertura della Partita IVA",
+    'autocertificazione': "Autocertificazione di residenza",
+    'autocertificazione_nascita': "Autocertificazione di nascita",
+    'stato_civile': "Autocertificazione di stato civile",
+}
+
+def fallback_guide(documento: str, reason: str, note: str, documenti: Optional[List[str]] = None) -> str:
+    """
+    Warning line plus the static guide of the document (of each document, for a bundle)
+    """
+    header = f"⚠️ Guida AI personalizzata non disponibile ({reason}). {note} Di seguito la guida generale."
+    if documento != 'bundle':
+        return f"{header}\n\n{FALLBACK_GUIDES[documento]}"
+    parts = [header]
+    for doc in documenti or []:
+        body = FALLBACK_GUIDES[doc].replace('\n## ', '\n### ').replace('## ', '### ', 1)
+        parts.append(f"## {_TITLES[doc]}\n\n{body}")
+    return '\n\n'.join(parts)
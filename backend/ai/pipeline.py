@@ -1,7 +1,35 @@
-from openai import OpenAI
+import json
 import os
-from typing import Dict, Any, Optional
-from datetime import datetime
+import time
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import date
+
+import config
+from ai.prompts.partita_iva import PARTITA_IVA_PROMPT
+from ai.prompts.autocertificazione import AUTOCERTIFICAZIONE_PROMPT
+from ai.prompts.autocertificazione_nascita import AUTOCERTIFICAZIONE_NASCITA_PROMPT
+from ai.prompts.autocertificazione_stato_civile import AUTOCERTIFICAZIONE_STATO_CIVILE_PROMPT
+from ai.prompts.bundle import BUNDLE_PROMPT
+from ai.fallback_guides import fallback_guide
+from services.ateco import lookup_ateco
+from services.circuit_breaker import llm_breaker
+from services.scheduler import stage_slot
+from services.tenants import record_usage
+from services.tracing import span
+
+LLM_MODEL = "gpt-4-turbo-preview"
+
+# (system prompt, user prompt, max tokens) di una guida
+GuideRequest = Tuple[str, str, int]
+
+@lru_cache(maxsize=1)
+def _openai_client(api_key: str):
+    # openai è pesante da importare: lo carica il warm-up o la prima guida richiesta.
+    # Il client è riusato per tutte le richieste così da mantenere il pool di connessioni
+    from openai import OpenAI
+    # Timeout breve: con il provider lento la richiesta ripiega sulla guida generale invece di restare appesa
+    return OpenAI(api_key=api_key, timeout=config.LLM_TIMEOUT, max_retries=config.LLM_MAX_RETRIES)
 
 def get_openai_client():
     """Get OpenAI client with proper error handling"""
@@ -9,7 +37,100 @@ def get_openai_client():
     if not api_key:
         print("⚠️  OPENAI_API_KEY non trovata nel file .env")
         return None
-    return OpenAI(api_key=api_key)
+    return _openai_client(api_key)
+
+def _completion_body(system_prompt: str, user_prompt: str, max_tokens: int) -> Dict[str, Any]:
+    # Stessi parametri per la chiamata interattiva e per le righe dei batch
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_prompt
+            }
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.3,
+    }
+
+def _provider_failure(error: Exception) -> bool:
+    """
+    Whether an error means the provider is unavailable (timeout, connection error, 429, 5xx):
+    errors in the request itself (other 4xx, validation) don't count for the circuit breaker
+    """
+    from openai import APIConnectionError, APIStatusError
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    # APITimeoutError è una sottoclasse di APIConnectionError
+    return isinstance(error, APIConnectionError)
+
+def _complete(client, system_prompt: str, user_prompt: str, max_tokens: int) -> str:
+    """
+    Run one chat completion in the current tenant's fair share of the LLM slots,
+    traced and accounted with the token usage. Raises CircuitOpenError without calling
+    the provider while the circuit breaker is open
+    """
+    with stage_slot('llm'):
+        # Dentro lo slot: la chiamata di prova del circuito semi-aperto non resta in coda
+        probe = llm_breaker.before_call()
+        recorded = False
+        try:
+            with span("llm.completion", model=LLM_MODEL, max_tokens=max_tokens, prompt_chars=len(user_prompt)) as current:
+                body = _completion_body(system_prompt, user_prompt, max_tokens)
+                started = time.monotonic()
+                try:
+                    response = client.chat.completions.create(**body)
+                except Exception as e:
+                    recorded = True
+                    llm_breaker.record(time.monotonic() - started, failed=_provider_failure(e))
+                    raise
+                recorded = True
+                llm_breaker.record(time.monotonic() - started, failed=False)
+                if response.usage:
+                    record_usage(tokens=response.usage.total_tokens)
+                    current.set_attributes({
+                        "llm.prompt_tokens": response.usage.prompt_tokens,
+                        "llm.completion_tokens": response.usage.completion_tokens,
+                        "llm.total_tokens": response.usage.total_tokens,
+                    })
+                return response.choices[0].message.content.strip()
+        finally:
+            if probe and not recorded:
+                # La prova non è arrivata al provider: un'altra chiamata potrà farla
+                llm_breaker.release_probe()
+
+def partita_iva_guide_request(data: Dict[str, Any]) -> GuideRequest:
+    """
+    System prompt, user prompt and max tokens of the Partita IVA guide
+    """
+    # Format prompt with user data
+    formatted_prompt = PARTITA_IVA_PROMPT.format(
+        nome=data.get('nome', ''),
+        cognome=data.get('cognome', ''),
+        codiceFiscale=data.get('codiceFiscale', ''),
+        indirizzo=data.get('indirizzo', ''),
+        civico=data.get('civico', ''),
+        cap=data.get('cap', ''),
+        comune=data.get('comune', ''),
+        provincia=data.get('provincia', ''),
+        email=data.get('email', ''),
+        telefono=data.get('telefono', 'Non fornito'),
+        codiceAteco=data.get('codiceAteco', ''),
+        descrizioneAteco=describe_ateco(data.get('codiceAteco', '')),
+        descrizioneAttivita=data.get('descrizioneAttivita', ''),
+        regimeFiscale=data.get('regimeFiscale', ''),
+        dataInizio=format_date_for_prompt(data.get('dataInizio', ''))
+    )
+    
+    return (
+        "Sei un esperto consulente fiscale italiano specializzato in adempimenti per freelance e microimprese. Rispondi sempre in italiano con informazioni accurate e aggiornate.",
+        formatted_prompt,
+        2000
+    )
 
 def generate_partita_iva_guide(data: Dict[str, Any]) -> Optional[str]:
     """
@@ -21,48 +142,34 @@ def generate_partita_iva_guide(data: Dict[str, Any]) -> Optional[str]:
         if not client:
             return "⚠️ Guida AI non disponibile: API key mancante. Il modulo AA9/12 è stato generato correttamente."
         
-        from ai.prompts.partita_iva import PARTITA_IVA_PROMPT
-        
-        # Format prompt with user data
-        formatted_prompt = PARTITA_IVA_PROMPT.format(
-            nome=data.get('nome', ''),
-            cognome=data.get('cognome', ''),
-            codiceFiscale=data.get('codiceFiscale', ''),
-            indirizzo=data.get('indirizzo', ''),
-            civico=data.get('civico', ''),
-            cap=data.get('cap', ''),
-            comune=data.get('comune', ''),
-            provincia=data.get('provincia', ''),
-            email=data.get('email', ''),
-            telefono=data.get('telefono', 'Non fornito'),
-            codiceAteco=data.get('codiceAteco', ''),
-            descrizioneAttivita=data.get('descrizioneAttivita', ''),
-            regimeFiscale=data.get('regimeFiscale', ''),
-            dataInizio=format_date_for_prompt(data.get('dataInizio', ''))
-        )
-        
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Sei un esperto consulente fiscale italiano specializzato in adempimenti per freelance e microimprese. Rispondi sempre in italiano con informazioni accurate e aggiornate."
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content.strip()
+        return _complete(client, *partita_iva_guide_request(data))
         
     except Exception as e:
         print(f"Errore nella generazione della guida AI: {e}")
-        return f"⚠️ Guida AI non disponibile: {str(e)}. Il modulo AA9/12 è stato generato correttamente."
+        return fallback_guide('partita_iva', str(e), "Il modulo AA9/12 è stato generato correttamente.")
+
+def autocertificazione_guide_request(data: Dict[str, Any]) -> GuideRequest:
+    """
+    System prompt, user prompt and max tokens of the Autocertificazione guide
+    """
+    # Format prompt with user data
+    formatted_prompt = AUTOCERTIFICAZIONE_PROMPT.format(
+        nome=data.get('nome', ''),
+        cognome=data.get('cognome', ''),
+        codiceFiscale=data.get('codiceFiscale', ''),
+        luogoNascita=data.get('luogoNascita', ''),
+        dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
+        comuneResidenza=data.get('comuneResidenza', ''),
+        indirizzoResidenza=data.get('indirizzoResidenza', ''),
+        motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
+    )
+    
+    return (
+        "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana.",
+        formatted_prompt,
+        2000
+    )
 
 def generate_autocertificazione_guide(data: Dict[str, Any]) -> Optional[str]:
     """
@@ -74,42 +181,36 @@ def generate_autocertificazione_guide(data: Dict[str, Any]) -> Optional[str]:
         if not client:
             return "⚠️ Guida AI non disponibile: API key mancante. L'autocertificazione è stata generata correttamente."
         
-        from ai.prompts.autocertificazione import AUTOCERTIFICAZIONE_PROMPT
-        
-        # Format prompt with user data
-        formatted_prompt = AUTOCERTIFICAZIONE_PROMPT.format(
-            nome=data.get('nome', ''),
-            cognome=data.get('cognome', ''),
-            codiceFiscale=data.get('codiceFiscale', ''),
-            luogoNascita=data.get('luogoNascita', ''),
-            dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
-            comuneResidenza=data.get('comuneResidenza', ''),
-            indirizzoResidenza=data.get('indirizzoResidenza', ''),
-            motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
-        )
-        
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana."
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content.strip()
+        return _complete(client, *autocertificazione_guide_request(data))
         
     except Exception as e:
         print(f"Errore nella generazione della guida AI per Autocertificazione: {e}")
-        return f"⚠️ Guida AI non disponibile: {str(e)}. L'autocertificazione è stata generata correttamente."
+        return fallback_guide('autocertificazione', str(e), "L'autocertificazione è stata generata correttamente.")
+
+def autocertificazione_nascita_guide_request(data: Dict[str, Any]) -> GuideRequest:
+    """
+    System prompt, user prompt and max tokens of the Autocertificazione di Nascita guide
+    """
+    # Format prompt with user data
+    formatted_prompt = AUTOCERTIFICAZIONE_NASCITA_PROMPT.format(
+        nomeDichiarante=data.get('nomeDichiarante', ''),
+        cognomeDichiarante=data.get('cognomeDichiarante', ''),
+        codiceFiscaleDichiarante=data.get('codiceFiscaleDichiarante', ''),
+        nomeNato=data.get('nomeNato', ''),
+        cognomeNato=data.get('cognomeNato', ''),
+        dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
+        luogoNascita=data.get('luogoNascita', ''),
+        provinciaNascita=data.get('provinciaNascita', ''),
+        ospedale=data.get('ospedale', 'Non specificato'),
+        motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
+    )
+    
+    return (
+        "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni di nascita. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana.",
+        formatted_prompt,
+        2000
+    )
 
 def generate_autocertificazione_nascita_guide(data: Dict[str, Any]) -> Optional[str]:
     """
@@ -121,44 +222,73 @@ def generate_autocertificazione_nascita_guide(data: Dict[str, Any]) -> Optional[
         if not client:
             return "⚠️ Guida AI non disponibile: API key mancante. L'autocertificazione di nascita è stata generata correttamente."
         
-        from ai.prompts.autocertificazione_nascita import AUTOCERTIFICAZIONE_NASCITA_PROMPT
-        
-        # Format prompt with user data
-        formatted_prompt = AUTOCERTIFICAZIONE_NASCITA_PROMPT.format(
-            nomeDichiarante=data.get('nomeDichiarante', ''),
-            cognomeDichiarante=data.get('cognomeDichiarante', ''),
-            codiceFiscaleDichiarante=data.get('codiceFiscaleDichiarante', ''),
-            nomeNato=data.get('nomeNato', ''),
-            cognomeNato=data.get('cognomeNato', ''),
-            dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
-            luogoNascita=data.get('luogoNascita', ''),
-            provinciaNascita=data.get('provinciaNascita', ''),
-            ospedale=data.get('ospedale', 'Non specificato'),
-            motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
-        )
-        
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni di nascita. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana."
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            max_tokens=2000,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content.strip()
+        return _complete(client, *autocertificazione_nascita_guide_request(data))
         
     except Exception as e:
         print(f"Errore nella generazione della guida AI per Autocertificazione di Nascita: {e}")
-        return f"⚠️ Guida AI non disponibile: {str(e)}. L'autocertificazione di nascita è stata generata correttamente."
+        return fallback_guide('autocertificazione_nascita', str(e), "L'autocertificazione di nascita è stata generata correttamente.")
+
+def autocertificazione_stato_civile_guide_request(data: Dict[str, Any]) -> GuideRequest:
+    """
+    System prompt, user prompt and max tokens of the Autocertificazione di Stato Civile guide
+    """
+    # Prepare additional data based on civil status
+    stato_civile = data.get('statoCivile', '')
+    dati_aggiuntivi = []
+    
+    if stato_civile == 'coniugato':
+        if data.get('nomeConiuge') and data.get('cognomeConiuge'):
+            dati_aggiuntivi.append(f"Coniuge: {data.get('nomeConiuge')} {data.get('cognomeConiuge')}")
+        if data.get('dataMatrimonio'):
+            dati_aggiuntivi.append(f"Data matrimonio: {format_date_for_prompt(data.get('dataMatrimonio'))}")
+        if data.get('comuneMatrimonio'):
+            dati_aggiuntivi.append(f"Comune matrimonio: {data.get('comuneMatrimonio')}")
+    
+    elif stato_civile == 'separato':
+        if data.get('dataSeparazione'):
+            dati_aggiuntivi.append(f"Data separazione: {format_date_for_prompt(data.get('dataSeparazione'))}")
+        if data.get('tribunaleCompetente'):
+            dati_aggiuntivi.append(f"Tribunale competente: {data.get('tribunaleCompetente')}")
+    
+    elif stato_civile == 'divorziato':
+        if data.get('dataDivorzio'):
+            dati_aggiuntivi.append(f"Data divorzio: {format_date_for_prompt(data.get('dataDivorzio'))}")
+        if data.get('tribunaleCompetente'):
+            dati_aggiuntivi.append(f"Tribunale competente: {data.get('tribunaleCompetente')}")
+    
+    elif stato_civile == 'vedovo':
+        if data.get('dataDecesso'):
+            dati_aggiuntivi.append(f"Data decesso coniuge: {format_date_for_prompt(data.get('dataDecesso'))}")
+    
+    # Format stato civile for display
+    stato_civile_display = {
+        'celibe_nubile': 'Celibe/Nubile',
+        'coniugato': 'Coniugato/a',
+        'separato': 'Separato/a',
+        'divorziato': 'Divorziato/a',
+        'vedovo': 'Vedovo/a'
+    }.get(stato_civile, stato_civile)
+    
+    # Format prompt with user data
+    formatted_prompt = AUTOCERTIFICAZIONE_STATO_CIVILE_PROMPT.format(
+        nome=data.get('nome', ''),
+        cognome=data.get('cognome', ''),
+        codiceFiscale=data.get('codiceFiscale', ''),
+        luogoNascita=data.get('luogoNascita', ''),
+        dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
+        comuneResidenza=data.get('comuneResidenza', ''),
+        indirizzoResidenza=data.get('indirizzoResidenza', ''),
+        statoCivile=stato_civile_display,
+        datiAggiuntivi='; '.join(dati_aggiuntivi) if dati_aggiuntivi else 'Nessun dato aggiuntivo',
+        motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
+    )
+    
+    return (
+        "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni di stato civile. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana.",
+        formatted_prompt,
+        2500
+    )
 
 def generate_autocertificazione_stato_civile_guide(data: Dict[str, Any]) -> Optional[str]:
     """
@@ -170,81 +300,73 @@ def generate_autocertificazione_stato_civile_guide(data: Dict[str, Any]) -> Opti
         if not client:
             return "⚠️ Guida AI non disponibile: API key mancante. L'autocertificazione di stato civile è stata generata correttamente."
         
-        from ai.prompts.autocertificazione_stato_civile import AUTOCERTIFICAZIONE_STATO_CIVILE_PROMPT
-        
-        # Prepare additional data based on civil status
-        stato_civile = data.get('statoCivile', '')
-        dati_aggiuntivi = []
-        
-        if stato_civile == 'coniugato':
-            if data.get('nomeConiuge') and data.get('cognomeConiuge'):
-                dati_aggiuntivi.append(f"Coniuge: {data.get('nomeConiuge')} {data.get('cognomeConiuge')}")
-            if data.get('dataMatrimonio'):
-                dati_aggiuntivi.append(f"Data matrimonio: {format_date_for_prompt(data.get('dataMatrimonio'))}")
-            if data.get('comuneMatrimonio'):
-                dati_aggiuntivi.append(f"Comune matrimonio: {data.get('comuneMatrimonio')}")
-        
-        elif stato_civile == 'separato':
-            if data.get('dataSeparazione'):
-                dati_aggiuntivi.append(f"Data separazione: {format_date_for_prompt(data.get('dataSeparazione'))}")
-            if data.get('tribunaleCompetente'):
-                dati_aggiuntivi.append(f"Tribunale competente: {data.get('tribunaleCompetente')}")
-        
-        elif stato_civile == 'divorziato':
-            if data.get('dataDivorzio'):
-                dati_aggiuntivi.append(f"Data divorzio: {format_date_for_prompt(data.get('dataDivorzio'))}")
-            if data.get('tribunaleCompetente'):
-                dati_aggiuntivi.append(f"Tribunale competente: {data.get('tribunaleCompetente')}")
-        
-        elif stato_civile == 'vedovo':
-            if data.get('dataDecesso'):
-                dati_aggiuntivi.append(f"Data decesso coniuge: {format_date_for_prompt(data.get('dataDecesso'))}")
-        
-        # Format stato civile for display
-        stato_civile_display = {
-            'celibe_nubile': 'Celibe/Nubile',
-            'coniugato': 'Coniugato/a',
-            'separato': 'Separato/a',
-            'divorziato': 'Divorziato/a',
-            'vedovo': 'Vedovo/a'
-        }.get(stato_civile, stato_civile)
+        # Call OpenAI API
+        return _complete(client, *autocertificazione_stato_civile_guide_request(data))
         
-        # Format prompt with user data
-        formatted_prompt = AUTOCERTIFICAZIONE_STATO_CIVILE_PROMPT.format(
-            nome=data.get('nome', ''),
-            cognome=data.get('cognome', ''),
-            codiceFiscale=data.get('codiceFiscale', ''),
-            luogoNascita=data.get('luogoNascita', ''),
-            dataNascita=format_date_for_prompt(data.get('dataNascita', '')),
-            comuneResidenza=data.get('comuneResidenza', ''),
-            indirizzoResidenza=data.get('indirizzoResidenza', ''),
-            statoCivile=stato_civile_display,
-            datiAggiuntivi='; '.join(dati_aggiuntivi) if dati_aggiuntivi else 'Nessun dato aggiuntivo',
-            motivoRichiesta=data.get('motivoRichiesta', 'Non specificato')
-        )
+    except Exception as e:
+        print(f"Errore nella generazione della guida AI per Autocertificazione di Stato Civile: {e}")
+        return fallback_guide('stato_civile', str(e), "L'autocertificazione di stato civile è stata generata correttamente.")
+
+def bundle_guide_request(data: Dict[str, Any], documenti: List[str]) -> GuideRequest:
+    """
+    System prompt, user prompt and max tokens of the bundle guide
+    """
+    documenti_display = {
+        'partita_iva': 'Modello AA9/12 per l\'apertura della Partita IVA',
+        'autocertificazione': 'Autocertificazione di residenza',
+        'stato_civile': 'Autocertificazione di stato civile'
+    }
+    
+    # Only the data relevant to the selected documents goes into the prompt
+    dati_specifici = []
+    if data.get('luogoNascita') or data.get('dataNascita'):
+        dati_specifici.append(f"- Nato/a a: {data.get('luogoNascita') or 'Non specificato'} il {format_date_for_prompt(data.get('dataNascita') or '')}")
+    if 'partita_iva' in documenti:
+        dati_specifici.append(f"- Codice ATECO: {data.get('codiceAteco', '')} ({describe_ateco(data.get('codiceAteco') or '')})")
+        dati_specifici.append(f"- Descrizione attività: {data.get('descrizioneAttivita', '')}")
+        dati_specifici.append(f"- Regime fiscale: {data.get('regimeFiscale', '')}")
+        dati_specifici.append(f"- Data inizio attività: {format_date_for_prompt(data.get('dataInizio') or '')}")
+    if 'stato_civile' in documenti:
+        dati_specifici.append(f"- Stato civile: {data.get('statoCivile', '')}")
+    if data.get('motivoRichiesta'):
+        dati_specifici.append(f"- Motivo richiesta: {data.get('motivoRichiesta')}")
+    
+    # Format prompt with user data
+    formatted_prompt = BUNDLE_PROMPT.format(
+        nome=data.get('nome', ''),
+        cognome=data.get('cognome', ''),
+        codiceFiscale=data.get('codiceFiscale', ''),
+        indirizzo=data.get('indirizzo', ''),
+        civico=data.get('civico', ''),
+        cap=data.get('cap', ''),
+        comune=data.get('comune', ''),
+        provincia=data.get('provincia', ''),
+        datiSpecifici='\n'.join(dati_specifici),
+        documenti='\n'.join(f"- {documenti_display.get(d, d)}" for d in documenti)
+    )
+    
+    return (
+        "Sei un esperto consulente di pratiche burocratiche e fiscali italiane. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana.",
+        formatted_prompt,
+        3000
+    )
+
+def generate_bundle_guide(data: Dict[str, Any], documenti: List[str]) -> Optional[str]:
+    """
+    Generate a single combined guide for a bundle of documents using GPT-4
+    """
+    try:
+        # Get OpenAI client
+        client = get_openai_client()
+        if not client:
+            return "⚠️ Guida AI non disponibile: API key mancante. I documenti sono stati generati correttamente."
         
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Sei un esperto consulente di pratiche burocratiche italiane specializzato in autocertificazioni di stato civile. Rispondi sempre in italiano con informazioni accurate e aggiornate sulla normativa italiana."
-                },
-                {
-                    "role": "user",
-                    "content": formatted_prompt
-                }
-            ],
-            max_tokens=2500,
-            temperature=0.3
-        )
-        
-        return response.choices[0].message.content.strip()
+        return _complete(client, *bundle_guide_request(data, documenti))
         
     except Exception as e:
-        print(f"Errore nella generazione della guida AI per Autocertificazione di Stato Civile: {e}")
-        return f"⚠️ Guida AI non disponibile: {str(e)}. L'autocertificazione di stato civile è stata generata correttamente."
+        print(f"Errore nella generazione della guida AI per il bundle: {e}")
+        return fallback_guide('bundle', str(e), "I documenti sono stati generati correttamente.", documenti)
 
 def format_date_for_prompt(date_string: str) -> str:
     """
@@ -252,8 +374,104 @@ def format_date_for_prompt(date_string: str) -> str:
     """
     try:
         if date_string:
-            date_obj = datetime.strptime(date_string, '%Y-%m-%d')
+            date_obj = date.fromisoformat(date_string)
             return date_obj.strftime('%d/%m/%Y')
     except ValueError:
         pass
-    return date_string
\ No newline at end of file
+    return date_string
+
+def describe_ateco(codice: str) -> str:
+    """
+    Official ATECO description, so the model doesn't have to guess the activity
+    """
+    entry = lookup_ateco(codice) if codice else None
+    if entry:
+        return f"{entry.descrizione}, ATECO {entry.edizione}"
+    return "descrizione ufficiale non disponibile"
+
+# Guide differite tramite la Batch API del provider: costo ridotto e limiti separati,
+# risultati entro la finestra di completamento invece che in pochi secondi
+GUIDE_REQUESTS = {
+    'partita_iva': partita_iva_guide_request,
+    'autocertificazione': autocertificazione_guide_request,
+    'autocertificazione_nascita': autocertificazione_nascita_guide_request,
+    'stato_civile': autocertificazione_stato_civile_guide_request,
+}
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_MAX_REQUESTS = 50000
+_BATCH_FINAL_STATES = {'completed', 'failed', 'expired', 'cancelled'}
+
+def submit_guide_batch(requests: List[Tuple[str, GuideRequest]], batch_dir: str) -> List[str]:
+    """
+    Write (custom_id, guide request) pairs as batch JSONL files and submit them; returns the batch ids
+    """
+    client = get_openai_client()
+    if not client:
+        raise RuntimeError("API key mancante")
+    os.makedirs(batch_dir, exist_ok=True)
+
+    batch_ids = []
+    for start in range(0, len(requests), BATCH_MAX_REQUESTS):
+        chunk = requests[start:start + BATCH_MAX_REQUESTS]
+        path = os.path.join(batch_dir, f"guide_batch_{start // BATCH_MAX_REQUESTS:03d}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for custom_id, request in chunk:
+                line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": _completion_body(*request)}
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+
+        with span("llm.batch.submit", model=LLM_MODEL, requests=len(chunk)):
+            with open(path, 'rb') as f:
+                input_file = client.files.create(file=f, purpose="batch")
+            batch = client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window=BATCH_COMPLETION_WINDOW,
+            )
+        print(f"📤 Batch di guide inviato: {batch.id} ({len(chunk)} richieste)")
+        batch_ids.append(batch.id)
+    return batch_ids
+
+def _batch_results(client, file_id: Optional[str]) -> Dict[str, str]:
+    results: Dict[str, str] = {}
+    if not file_id:
+        return results
+    for line in client.files.content(file_id).text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        response = entry.get('response') or {}
+        if entry.get('error') or response.get('status_code') != 200:
+            error = entry.get('error') or response.get('body', {}).get('error') or {}
+            results[entry['custom_id']] = f"⚠️ Guida AI non disponibile: {error.get('message', 'errore nel batch')}."
+        else:
+            results[entry['custom_id']] = response['body']['choices'][0]['message']['content'].strip()
+    return results
+
+def poll_guide_batch(batch_id: str, poll_interval: float = 30.0, timeout: Optional[float] = None) -> Dict[str, str]:
+    """
+    Wait for a guide batch to finish and return custom_id -> guide.
+    Failed requests get the usual "⚠️ Guida AI non disponibile" message; raises TimeoutError after timeout
+    """
+    client = get_openai_client()
+    if not client:
+        raise RuntimeError("API key mancante")
+
+    started = time.monotonic()
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in _BATCH_FINAL_STATES:
+            break
+        if timeout is not None and time.monotonic() - started > timeout:
+            raise TimeoutError(f"Batch {batch_id} ancora in stato {batch.status}")
+        counts = batch.request_counts
+        if counts:
+            print(f"⏳ Batch {batch_id}: {batch.status}, {counts.completed + counts.failed}/{counts.total} richieste")
+        time.sleep(poll_interval)
+
+    with span("llm.batch.results", batch_id=batch_id, status=batch.status):
+        results = _batch_results(client, batch.output_file_id)
+        results.update(_batch_results(client, batch.error_file_id))
+    print(f"📥 Batch {batch_id} {batch.status}: {len(results)} risultati")
+    return results
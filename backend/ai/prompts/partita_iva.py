@@ -7,7 +7,7 @@ DATI UTENTE:
 - Residenza: {indirizzo} {civico}, {cap} {comune} ({provincia})
 - Email: {email}
 - Telefono: {telefono}
-- Codice ATECO: {codiceAteco}
+- Codice ATECO: {codiceAteco} ({descrizioneAteco})
 - Descrizione attività: {descrizioneAttivita}
 - Regime fiscale: {regimeFiscale}
 - Data inizio attività: {dataInizio}
@@ -0,0 +1,347 @@
+"""
+Offline bulk generation from a CSV or JSONL file of records, without going through the HTTP API
+
+Usage:
+    python bulk.py dipendenti.csv --tipo autocertificazione --workers 4
+    python bulk.py richieste.jsonl --tipo partita_iva --guide --guide-concurrency 4
+    python bulk.py richieste.jsonl --tipo partita_iva --guide --guide-mode batch
+
+Every processed row is appended to the manifest (JSONL) as soon as it completes: rerunning
+the same command resumes from where it stopped, skipping the rows already in the manifest.
+With --guide-mode batch the guides go through the provider batch API: submitted batches are
+saved in guide_batches.json, so a rerun keeps polling them instead of submitting again.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+
+import config
+from models.schemas import (
+    PartitaIvaRequest,
+    AutocertificazioneRequest,
+    AutocertificazioneNascitaRequest,
+    AutocertificazioneStatoCivileRequest,
+)
+
+# Tipo di documento: modello di validazione, generatore PDF, guida, prefisso e campi del nome file
+DOCUMENTS: Dict[str, Dict[str, Any]] = {
+    'partita_iva': {
+        'model': PartitaIvaRequest,
+        'generate_pdf': 'generate_aa912_pdf',
+        'generate_guide': 'generate_partita_iva_guide',
+        'guide_cache': 'partita_iva',
+        'filename_prefix': 'aa912',
+        'name_fields': ('cognome', 'nome'),
+    },
+    'autocertificazione': {
+        'model': AutocertificazioneRequest,
+        'generate_pdf': 'generate_autocertificazione_pdf',
+        'generate_guide': 'generate_autocertificazione_guide',
+        'guide_cache': 'autocertificazione',
+        'filename_prefix': 'autocertificazione',
+        'name_fields': ('cognome', 'nome'),
+    },
+    'nascita': {
+        'model': AutocertificazioneNascitaRequest,
+        'generate_pdf': 'generate_autocertificazione_nascita_pdf',
+        'generate_guide': 'generate_autocertificazione_nascita_guide',
+        'guide_cache': 'autocertificazione_nascita',
+        'filename_prefix': 'autocertificazione_nascita',
+        'name_fields': ('cognomeNato', 'nomeNato'),
+    },
+    'stato_civile': {
+        'model': AutocertificazioneStatoCivileRequest,
+        'generate_pdf': 'generate_autocertificazione_stato_civile_pdf',
+        'generate_guide': 'generate_autocertificazione_stato_civile_guide',
+        'guide_cache': 'stato_civile',
+        'filename_prefix': 'autocertificazione_stato_civile',
+        'name_fields': ('cognome', 'nome'),
+    },
+}
+
+def iter_records(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Stream (row number, record) from a CSV (header row) or JSONL file
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for row_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield row_no, json.loads(line)
+        else:
+            for row_no, row in enumerate(csv.DictReader(f), start=1):
+                # Celle vuote = campo non fornito
+                yield row_no, {k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+
+def validate_record(tipo: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a record with the same schema as the API; raises ValueError with the reasons
+    """
+    try:
+        request = DOCUMENTS[tipo]['model'](**record)
+    except ValidationError as e:
+        raise ValueError('; '.join(f"{'.'.join(str(l) for l in err['loc'])}: {err['msg']}" for err in e.errors()))
+
+    if tipo == 'stato_civile':
+        from routes.autocertificazione_stato_civile import validate_conditional_fields
+        error = validate_conditional_fields(request)
+        if error:
+            raise ValueError(error)
+    return request.model_dump()
+
+def load_finished_rows(manifest_path: str, retry_failed: bool) -> Set[int]:
+    """
+    Rows already completed in a previous run (failed ones too, unless retry_failed)
+    """
+    finished: Set[int] = set()
+    if not os.path.exists(manifest_path):
+        return finished
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # riga troncata da un'interruzione
+            if entry['status'] == 'ok' or not retry_failed:
+                finished.add(entry['row'])
+    return finished
+
+def _render_pdf(tipo: str, data: Dict[str, Any], pdf_path: str) -> bool:
+    # Eseguita nei processi del pool
+    from services import pdf_generator
+    return getattr(pdf_generator, DOCUMENTS[tipo]['generate_pdf'])(data, pdf_path)
+
+def _generate_guide(tipo: str, data: Dict[str, Any], guide_path: str) -> str:
+    from ai import pipeline
+    from services.guide_cache import cached_guide
+    spec = DOCUMENTS[tipo]
+    guide = cached_guide(spec['guide_cache'], data, getattr(pipeline, spec['generate_guide']))
+    if not guide or guide.startswith('⚠️'):
+        raise RuntimeError(guide or "Guida AI non disponibile")
+    with open(guide_path, 'w', encoding='utf-8') as f:
+        f.write(guide)
+    return guide_path
+
+def _safe_name(value: Any) -> str:
+    return re.sub(r'[^A-Za-z0-9]+', '_', str(value or '')).strip('_')[:40]
+
+def load_guide_batches(path: str) -> List[Dict[str, Any]]:
+    """
+    Guide batches submitted and not yet attached: [{"batch_id", "rows": {custom_id: [row, pdf]}}]
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_guide_batches(path: str, batches: List[Dict[str, Any]]) -> None:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(batches, f)
+    os.replace(tmp_path, path)
+
+class Manifest:
+    """Append-only JSONL manifest, flushed to disk after every row"""
+
+    def __init__(self, path: str):
+        self._f = open(path, 'a', encoding='utf-8')
+
+    def write(self, row: int, status: str, **fields: Any) -> None:
+        entry = {'row': row, 'status': status, **fields, 'timestamp': datetime.now().isoformat()}
+        self._f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self) -> None:
+        self._f.close()
+
+def run_bulk(
+    input_path: str,
+    tipo: str,
+    output_dir: str,
+    workers: int,
+    guides: bool,
+    guide_concurrency: int,
+    retry_failed: bool = False,
+    guide_mode: str = 'interactive',
+    poll_interval: float = 30.0,
+) -> Dict[str, int]:
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.jsonl')
+    finished = load_finished_rows(manifest_path, retry_failed)
+    if finished:
+        print(f"↩️  Ripresa: {len(finished)} righe già completate in {manifest_path}")
+
+    # Righe con PDF pronto e guida in un batch già inviato: non vanno rigenerate
+    batches_path = os.path.join(output_dir, 'guide_batches.json')
+    guide_batches = load_guide_batches(batches_path)
+    for batch in guide_batches:
+        finished.update(row for row, _ in batch['rows'].values())
+
+    manifest = Manifest(manifest_path)
+    spec = DOCUMENTS[tipo]
+    counts = {'ok': 0, 'invalid': 0, 'error': 0, 'skipped': 0}
+
+    # Lavori in corso: future -> (tipo di lavoro, riga, dati, percorso PDF)
+    pending: Dict[Future, Tuple[str, int, Dict[str, Any], str]] = {}
+    max_pending = (workers + guide_concurrency) * 2
+
+    pdf_pool = ProcessPoolExecutor(max_workers=workers)
+    guide_pool: Optional[ThreadPoolExecutor] = None
+    if guides and guide_mode == 'interactive':
+        guide_pool = ThreadPoolExecutor(max_workers=guide_concurrency)
+    # Modalità batch: righe con PDF pronto in attesa di essere inviate come batch di guide
+    batch_rows: List[Tuple[int, Dict[str, Any], str]] = []
+
+    def handle(done: Set[Future]) -> None:
+        for future in done:
+            kind, row, data, pdf_path = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result, error = None, str(e)
+            else:
+                error = None if result else "Generazione PDF fallita"
+
+            if error:
+                stage = 'guida' if kind == 'guide' else 'pdf'
+                manifest.write(row, 'error', stage=stage, pdf=pdf_path if kind == 'guide' else None, errors=[error])
+                counts['error'] += 1
+            elif kind == 'pdf' and guides and guide_mode == 'batch':
+                batch_rows.append((row, data, pdf_path))
+            elif kind == 'pdf' and guide_pool is not None:
+                guide_path = os.path.splitext(pdf_path)[0] + '.guida.md'
+                pending[guide_pool.submit(_generate_guide, tipo, data, guide_path)] = ('guide', row, data, pdf_path)
+            else:
+                manifest.write(row, 'ok', pdf=pdf_path, guida=result if kind == 'guide' else None)
+                counts['ok'] += 1
+
+    started = time.perf_counter()
+    try:
+        for row, record in iter_records(input_path):
+            if row in finished:
+                counts['skipped'] += 1
+                continue
+            try:
+                data = validate_record(tipo, record)
+            except ValueError as e:
+                manifest.write(row, 'invalid', errors=[str(e)])
+                counts['invalid'] += 1
+                continue
+
+            names = '_'.join(_safe_name(data.get(field)) for field in spec['name_fields'])
+            pdf_path = os.path.join(output_dir, f"{spec['filename_prefix']}_{row:06d}_{names}.pdf")
+            pending[pdf_pool.submit(_render_pdf, tipo, data, pdf_path)] = ('pdf', row, data, pdf_path)
+
+            # Lettura in streaming: non si accodano più di max_pending righe
+            while len(pending) >= max_pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                handle(done)
+
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            handle(done)
+
+        if batch_rows or guide_batches:
+            run_guide_batches(tipo, batch_rows, guide_batches, batches_path, output_dir, manifest, counts, poll_interval)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrotto: le righe completate sono nel manifest, rilancia lo stesso comando per riprendere")
+        pdf_pool.shutdown(wait=False, cancel_futures=True)
+        if guide_pool is not None:
+            guide_pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        manifest.close()
+
+    pdf_pool.shutdown()
+    if guide_pool is not None:
+        guide_pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Completato in {elapsed:.1f} s: {counts['ok']} ok, {counts['invalid']} non validi, "
+          f"{counts['error']} errori, {counts['skipped']} già fatti")
+    print(f"📒 Manifest: {manifest_path}")
+    return counts
+
+def run_guide_batches(
+    tipo: str,
+    batch_rows: List[Tuple[int, Dict[str, Any], str]],
+    guide_batches: List[Dict[str, Any]],
+    batches_path: str,
+    output_dir: str,
+    manifest: Manifest,
+    counts: Dict[str, int],
+    poll_interval: float,
+) -> None:
+    """
+    Submit the guides of the rendered rows as provider batches, then attach each result to its row
+    """
+    from ai import pipeline
+
+    if batch_rows:
+        build_request = pipeline.GUIDE_REQUESTS[DOCUMENTS[tipo]['guide_cache']]
+        requests = [(f"row-{row}", build_request(data)) for row, data, _ in batch_rows]
+        rows = {f"row-{row}": [row, pdf_path] for row, _, pdf_path in batch_rows}
+        batch_ids = pipeline.submit_guide_batch(requests, os.path.join(output_dir, 'batches'))
+        # Ogni batch porta con sé solo le proprie righe
+        for i, batch_id in enumerate(batch_ids):
+            chunk = requests[i * pipeline.BATCH_MAX_REQUESTS:(i + 1) * pipeline.BATCH_MAX_REQUESTS]
+            guide_batches.append({'batch_id': batch_id, 'rows': {custom_id: rows[custom_id] for custom_id, _ in chunk}})
+        save_guide_batches(batches_path, guide_batches)
+
+    while guide_batches:
+        batch = guide_batches[0]
+        results = pipeline.poll_guide_batch(batch['batch_id'], poll_interval)
+        for custom_id, (row, pdf_path) in batch['rows'].items():
+            guide = results.get(custom_id)
+            if not guide or guide.startswith('⚠️'):
+                manifest.write(row, 'error', stage='guida', pdf=pdf_path, errors=[guide or "Risultato mancante nel batch"])
+                counts['error'] += 1
+                continue
+            guide_path = os.path.splitext(pdf_path)[0] + '.guida.md'
+            with open(guide_path, 'w', encoding='utf-8') as f:
+                f.write(guide)
+            manifest.write(row, 'ok', pdf=pdf_path, guida=guide_path, batch_id=batch['batch_id'])
+            counts['ok'] += 1
+        guide_batches.pop(0)
+        save_guide_batches(batches_path, guide_batches)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generazione massiva di documenti da CSV o JSONL")
+    parser.add_argument('input', help="file .csv (con intestazione) o .jsonl")
+    parser.add_argument('--tipo', choices=list(DOCUMENTS), required=True)
+    parser.add_argument('--output-dir', help="default: OUTPUT_DIR/bulk/<nome file>")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processi per il rendering PDF")
+    parser.add_argument('--guide', action='store_true', help="genera anche la guida AI per ogni riga")
+    parser.add_argument('--guide-concurrency', type=int, default=4, help="richieste di guida contemporanee")
+    parser.add_argument('--guide-mode', choices=['interactive', 'batch'], default='interactive',
+                        help="batch: guide tramite la batch API del provider (costo ridotto, risultati entro 24 ore)")
+    parser.add_argument('--batch-poll-interval', type=float, default=30.0, help="secondi tra un controllo e l'altro del batch")
+    parser.add_argument('--retry-failed', action='store_true', help="riprova le righe non valide o fallite")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.path.join(
+        config.OUTPUT_DIR, 'bulk', os.path.splitext(os.path.basename(args.input))[0]
+    )
+    try:
+        counts = run_bulk(
+            args.input, args.tipo, os.path.abspath(output_dir), args.workers,
+            args.guide, args.guide_concurrency, args.retry_failed,
+            args.guide_mode, args.batch_poll_interval,
+        )
+    except KeyboardInterrupt:
+        return 130
+    return 0 if counts['error'] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
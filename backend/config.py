@@ -0,0 +1,118 @@
+"""
+Runtime configuration for PraticAI, read from the environment (.env)
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _abs_path(env_name: str, default: str) -> str:
+    """Resolve a configured path against the backend directory, never against the CWD"""
+    return os.path.abspath(os.path.join(BASE_DIR, os.getenv(env_name) or default))
+
+# Dati statici distribuiti con il backend (tabelle Belfiore, ATECO)
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+# Percorsi configurabili: con più nodi OUTPUT_DIR deve essere un volume condiviso
+TEMPLATE_DIR = _abs_path("TEMPLATE_DIR", "data")
+OUTPUT_DIR = _abs_path("OUTPUT_DIR", os.path.join("data", "output"))
+SKELETON_DIR = _abs_path("SKELETON_DIR", os.path.join("data", "skeletons"))
+
+# Modalità di rendering: 'html' (wkhtmltopdf per ogni richiesta) oppure
+# 'overlay' (scheletro statico pre-renderizzato + sovrapposizione dei soli campi)
+PDF_RENDER_MODE = os.getenv("PDF_RENDER_MODE", "html").lower()
+
+# Stato condiviso tra i worker: 'memory' (solo processo singolo), 'sqlite' (più worker
+# sullo stesso nodo) oppure 'redis' (più nodi)
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+STATE_URL = os.getenv("STATE_URL") or os.path.join(OUTPUT_DIR, "state.db")
+
+# Server di produzione (serve.py)
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Richieste di generazione per client al minuto (0 = nessun limite)
+RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "0"))
+
+# Warm-up all'avvio di ogni worker (template, indici, client LLM, render PDF di prova)
+WARM_UP = os.getenv("WARM_UP", "true").lower() not in ("0", "false", "no")
+
+# Soglie di readiness (/health/ready): oltre queste il worker si dichiara non pronto
+HEALTH_MIN_FREE_MB = int(os.getenv("HEALTH_MIN_FREE_MB", "200"))
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "16"))
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "8"))
+
+# Durata (secondi) delle risposte salvate per Idempotency-Key
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# Post-processing dei PDF generati: compressione e linearizzazione (pikepdf se installato),
+# più un passaggio Ghostscript opzionale per il subsetting dei font
+PDF_POSTPROCESS = os.getenv("PDF_POSTPROCESS", "false").lower() in ("1", "true", "yes")
+PDF_GHOSTSCRIPT = os.getenv("PDF_GHOSTSCRIPT", "false").lower() in ("1", "true", "yes")
+GHOSTSCRIPT_PATH = os.getenv("GHOSTSCRIPT_PATH", "gs")
+
+# Durata (secondi) delle guide AI riutilizzabili quando cambiano solo campi non rilevanti
+GUIDE_CACHE_TTL = int(os.getenv("GUIDE_CACHE_TTL", str(24 * 3600)))
+
+# Render dei template con funzioni Python precompilate invece di Jinja (se il template lo consente)
+TEMPLATE_FAST_PATH = os.getenv("TEMPLATE_FAST_PATH", "true").lower() not in ("0", "false", "no")
+# Controllo (secondi) delle modifiche ai template: la nuova versione viene compilata in background
+# e sostituita atomicamente; 0 = solo ricarica manuale da POST /admin/templates/reload
+TEMPLATE_WATCH_INTERVAL = float(os.getenv("TEMPLATE_WATCH_INTERVAL", "2"))
+
+# Tracing OpenTelemetry (opzionale): 'none', 'otlp' (OTEL_EXPORTER_OTLP_ENDPOINT), 'file' o 'console'
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+TRACING_FILE = _abs_path("TRACING_FILE", os.path.join("data", "output", "traces.jsonl"))
+
+# Token per gli endpoint /admin (profiling); vuoto = endpoint disattivati
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Profili per richiesta conservati in OUTPUT_DIR/profiles: oltre, i più vecchi vengono cancellati (0 = nessun limite)
+PROFILES_KEEP = int(os.getenv("PROFILES_KEEP", "50"))
+
+# Link di download firmati (HMAC), validi su ogni worker senza registro condiviso;
+# senza DOWNLOAD_SECRET la chiave viene generata e salvata in OUTPUT_DIR
+DOWNLOAD_SECRET = os.getenv("DOWNLOAD_SECRET", "")
+DOWNLOAD_TOKEN_TTL = int(os.getenv("DOWNLOAD_TOKEN_TTL", str(24 * 3600)))
+# Origine dei link (es. una CDN davanti ai worker); vuoto = URL relativi
+DOWNLOAD_BASE_URL = os.getenv("DOWNLOAD_BASE_URL", "").rstrip('/')
+# 'private' = cache solo nel browser; 'public' per farli cachare alla CDN fino alla scadenza
+DOWNLOAD_CACHE_SCOPE = os.getenv("DOWNLOAD_CACHE_SCOPE", "private")
+
+# Archivio dei documenti generati (metadati e hash dei dati identificativi, ricercabile da /admin/documents);
+# senza ARCHIVE_HASH_KEY la chiave degli hash viene generata e salvata in OUTPUT_DIR
+ARCHIVE_DB = _abs_path("ARCHIVE_DB", os.path.join("data", "output", "archive.db"))
+ARCHIVE_HASH_KEY = os.getenv("ARCHIVE_HASH_KEY", "")
+
+# Tenant con API key, pesi e quote giornaliere (JSON); file assente = nessun controllo
+TENANTS_FILE = _abs_path("TENANTS_FILE", os.path.join("data", "tenants.json"))
+USAGE_DB = _abs_path("USAGE_DB", os.path.join("data", "output", "usage.db"))
+
+# Slot contemporanei delle fasi costose, assegnati ai tenant con fair queueing
+PDF_CONCURRENCY = int(os.getenv("PDF_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+# Generazioni ammesse insieme nel threadpool (40 thread, fino a 4 per un bundle): le altre attendono
+# in coda fair senza occupare thread, che restano liberi per le chiamate brevi degli altri tenant
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "8"))
+
+# Thread dedicati all'I/O su file delle richieste async (download, bundle): un disco lento non blocca il resto
+IO_THREADS = int(os.getenv("IO_THREADS", "16"))
+
+# Chiamate LLM: timeout per chiamata e circuit breaker (apertura su tasso di errori o chiamate lente)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+LLM_SLOW_CALL_SECONDS = float(os.getenv("LLM_SLOW_CALL_SECONDS", "45"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_WINDOW = float(os.getenv("LLM_BREAKER_WINDOW", "60"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+# Sandbox di wkhtmltopdf: limiti per singolo rendering
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "30"))
+PDF_MAX_CPU_SECONDS = int(os.getenv("PDF_MAX_CPU_SECONDS", "20"))
+PDF_MAX_MEMORY_MB = int(os.getenv("PDF_MAX_MEMORY_MB", "2048"))
+PDF_MAX_OUTPUT_MB = int(os.getenv("PDF_MAX_OUTPUT_MB", "50"))
+PDF_MAX_HTML_KB = int(os.getenv("PDF_MAX_HTML_KB", "512"))
@@ -2,7 +2,12 @@
 FastAPI main application for PraticAI
 """
 
+import time
+_started_at = time.perf_counter()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from pydantic import BaseModel, EmailStr
@@ -10,18 +15,39 @@ from typing import Optional
 import os
 from datetime import datetime
 import uuid
-from dotenv import load_dotenv
-load_dotenv()
+import config  # carica .env prima dei router
 
 from routes.generate import router as generate_router
 from routes.autocertificazione import router as autocertificazione_router
 from routes.autocertificazione_nascita import router as autocertificazione_nascita_router
 from routes.autocertificazione_stato_civile import router as autocertificazione_stato_civile_router
+from routes.bundle import router as bundle_router
+from routes.ateco import router as ateco_router
+from routes.guide import router as guide_router
+from routes.files import router as files_router
+from routes.health import router as health_router
+from routes.admin import router as admin_router
+from services.rate_limit import rate_limit_middleware
+from services.tenants import tenant_middleware
+from services.health import track_in_flight_middleware
+from services.compression import CompressionMiddleware
+from services.tracing import setup_tracing, tracing_middleware
+from services.profiling import request_profiling_middleware
+from services.startup import STARTUP, warm_up
+from services.templates import template_store
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up prima di accettare richieste: la prima generazione non paga import e compilazione
+    await run_in_threadpool(warm_up, _started_at)
+    template_store.start_watcher(config.TEMPLATE_WATCH_INTERVAL)
+    yield
 
 app = FastAPI(
     title="PraticAI API",
     description="API per la generazione automatica di documenti burocratici",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -33,11 +59,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressione brotli/gzip delle risposte JSON (guide) e degli stream di eventi
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+# Tenant da X-API-Key (TENANTS_FILE): quote giornaliere e priorità per il fair queueing
+app.middleware("http")(tenant_middleware)
+
+# Rate limiting condiviso tra i worker (RATE_LIMIT_PER_MINUTE)
+app.middleware("http")(rate_limit_middleware)
+
+# Conteggio delle richieste in corso per /health/ready
+app.middleware("http")(track_in_flight_middleware)
+
+# Tracing per richiesta (TRACING_EXPORTER): span radice e X-Trace-Id nella risposta
+setup_tracing()
+app.middleware("http")(tracing_middleware)
+
+# Profilo cProfile per richiesta (header X-Debug-Profile + X-Admin-Token): registrato solo
+# se ADMIN_TOKEN è impostato, così senza profiling non c'è alcun overhead
+if config.ADMIN_TOKEN:
+    app.middleware("http")(request_profiling_middleware)
+
 # Include routers
 app.include_router(generate_router, prefix="/api")
 app.include_router(autocertificazione_router, prefix="/api")
 app.include_router(autocertificazione_nascita_router, prefix="/api")
 app.include_router(autocertificazione_stato_civile_router, prefix="/api")
+app.include_router(bundle_router, prefix="/api")
+app.include_router(ateco_router, prefix="/api")
+app.include_router(guide_router, prefix="/api")
+app.include_router(files_router, prefix="/api")
+app.include_router(health_router)
+app.include_router(admin_router, prefix="/admin")
 
 @app.get("/")
 async def root():
@@ -45,4 +98,9 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+    return {
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "ready": STARTUP['ready'],
+        "startup_seconds": STARTUP['seconds']
+    }
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Per-request generation context shared by the PDF and AI guide stages
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict
+import uuid
+
+from pydantic import BaseModel
+
+from services.storage import output_path
+
+@dataclass(slots=True)
+class GenerationContext:
+    data: Dict[str, Any]
+    file_id: str
+    pdf_path: str
+
+    @classmethod
+    def from_request(cls, request: BaseModel, filename_prefix: str, *name_parts: str) -> "GenerationContext":
+        """
+        Dump the validated request once and allocate the output file for it
+        """
+        file_id = str(uuid.uuid4())
+        pdf_filename = '_'.join((filename_prefix, *name_parts, file_id)) + '.pdf'
+        return cls(
+            data=request.model_dump(),
+            file_id=file_id,
+            pdf_path=output_path(pdf_filename),
+        )
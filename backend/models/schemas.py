@@ -2,181 +2,195 @@
 Pydantic models for request/response schemas
 """
 
-from pydantic import BaseModel, EmailStr, validator
-from typing import Literal, Optional
+from pydantic import AfterValidator, BaseModel, EmailStr, StringConstraints, field_validator, model_validator
+from typing import Annotated, List, Literal, Optional
 from datetime import date
 
+from services.codice_fiscale import validate_codice_fiscale, check_codice_fiscale_matches
+from services.ateco import validate_codice_ateco
+
+# ===== TIPI CONDIVISI =====
+# I validatori sono compilati una sola volta nello schema pydantic-core del modello
+
+def _validate_cap(v: str) -> str:
+    if len(v) != 5 or not v.isdigit():
+        raise ValueError('Il CAP deve essere di 5 cifre')
+    return v
+
+def _validate_provincia(v: str) -> str:
+    v = v.upper().strip()
+    if len(v) != 2:
+        raise ValueError('La provincia deve essere di 2 caratteri')
+    return v
+
+def _parse_iso_date(v: str) -> date:
+    try:
+        return date.fromisoformat(v)
+    except ValueError:
+        raise ValueError('Formato data non valido. Utilizzare YYYY-MM-DD')
+
+def _validate_iso_date(v: str) -> str:
+    _parse_iso_date(v)
+    return v
+
+def _past_date_validator(message: str):
+    def validate(v: str) -> str:
+        if _parse_iso_date(v) > date.today():
+            raise ValueError(message)
+        return v
+    return validate
+
+CodiceFiscale = Annotated[str, AfterValidator(validate_codice_fiscale)]
+Cap = Annotated[str, AfterValidator(_validate_cap)]
+CodiceAteco = Annotated[str, AfterValidator(validate_codice_ateco)]
+Provincia = Annotated[str, AfterValidator(_validate_provincia)]
+IsoDate = Annotated[str, AfterValidator(_validate_iso_date)]  # Format: YYYY-MM-DD
+DataNascita = Annotated[str, AfterValidator(_past_date_validator('La data di nascita non può essere futura'))]
+DataPassata = Annotated[str, AfterValidator(_past_date_validator('Le date non possono essere future'))]
+
+# Lunghezze massime (come nel frontend): un testo enorme non arriva mai al rendering del PDF
+Nome = Annotated[str, StringConstraints(max_length=50)]
+Luogo = Annotated[str, StringConstraints(max_length=100)]
+Indirizzo = Annotated[str, StringConstraints(max_length=200)]
+Civico = Annotated[str, StringConstraints(max_length=10)]
+Telefono = Annotated[str, StringConstraints(max_length=20)]
+Descrizione = Annotated[str, StringConstraints(max_length=200)]
+Motivo = Annotated[str, StringConstraints(max_length=300)]
+
 class PartitaIvaRequest(BaseModel):
-    nome: str
-    cognome: str
-    codiceFiscale: str
-    indirizzo: str
-    civico: str
-    cap: str
-    comune: str
-    provincia: str
-    codiceAteco: str
-    descrizioneAttivita: str
+    nome: Nome
+    cognome: Nome
+    codiceFiscale: CodiceFiscale
+    indirizzo: Indirizzo
+    civico: Civico
+    cap: Cap
+    comune: Luogo
+    provincia: Provincia
+    codiceAteco: CodiceAteco
+    descrizioneAttivita: Descrizione
     regimeFiscale: Literal['forfettario', 'ordinario']
-    dataInizio: str  # Format: YYYY-MM-DD
+    dataInizio: IsoDate
     email: EmailStr
-    telefono: Optional[str] = None
-    
-    @validator('codiceFiscale')
-    def validate_codice_fiscale(cls, v):
-        v = v.upper().strip()
-        if len(v) != 16:
-            raise ValueError('Il codice fiscale deve essere di 16 caratteri')
-        return v
-    
-    @validator('cap')
-    def validate_cap(cls, v):
-        if len(v) != 5 or not v.isdigit():
-            raise ValueError('Il CAP deve essere di 5 cifre')
-        return v
-    
-    @validator('provincia')
-    def validate_provincia(cls, v):
-        v = v.upper().strip()
-        if len(v) != 2:
-            raise ValueError('La provincia deve essere di 2 caratteri')
-        return v
+    telefono: Optional[Telefono] = None
 
 class AutocertificazioneRequest(BaseModel):
-    nome: str
-    cognome: str
-    codiceFiscale: str
-    luogoNascita: str
-    dataNascita: str  # Format: YYYY-MM-DD
-    comuneResidenza: str
-    indirizzoResidenza: str
-    motivoRichiesta: Optional[str] = None
-    
-    @validator('codiceFiscale')
-    def validate_codice_fiscale(cls, v):
-        v = v.upper().strip()
-        if len(v) != 16:
-            raise ValueError('Il codice fiscale deve essere di 16 caratteri')
-        return v
-    
-    @validator('dataNascita')
-    def validate_data_nascita(cls, v):
-        try:
-            date.fromisoformat(v)
-        except ValueError:
-            raise ValueError('Formato data non valido. Utilizzare YYYY-MM-DD')
-        return v
+    nome: Nome
+    cognome: Nome
+    codiceFiscale: CodiceFiscale
+    luogoNascita: Luogo
+    dataNascita: IsoDate
+    comuneResidenza: Luogo
+    indirizzoResidenza: Indirizzo
+    motivoRichiesta: Optional[Motivo] = None
+
+    @model_validator(mode='after')
+    def validate_codice_fiscale_dati_nascita(self):
+        check_codice_fiscale_matches(self.codiceFiscale, self.luogoNascita, self.dataNascita)
+        return self
 
 class AutocertificazioneNascitaRequest(BaseModel):
     # Dati del dichiarante
-    nomeDichiarante: str
-    cognomeDichiarante: str
-    codiceFiscaleDichiarante: str
-    
+    nomeDichiarante: Nome
+    cognomeDichiarante: Nome
+    codiceFiscaleDichiarante: CodiceFiscale
+
     # Dati del nato/nata
-    nomeNato: str
-    cognomeNato: str
-    dataNascita: str  # Format: YYYY-MM-DD
-    luogoNascita: str
-    provinciaNascita: str
-    ospedale: Optional[str] = None
-    
-    motivoRichiesta: Optional[str] = None
-    
-    @validator('codiceFiscaleDichiarante')
-    def validate_codice_fiscale_dichiarante(cls, v):
-        v = v.upper().strip()
-        if len(v) != 16:
-            raise ValueError('Il codice fiscale del dichiarante deve essere di 16 caratteri')
-        return v
-    
-    @validator('provinciaNascita')
-    def validate_provincia_nascita(cls, v):
-        v = v.upper().strip()
-        if len(v) != 2:
-            raise ValueError('La provincia deve essere di 2 caratteri')
-        return v
-    
-    @validator('dataNascita')
-    def validate_data_nascita(cls, v):
-        try:
-            date_obj = date.fromisoformat(v)
-            # Check if date is not in the future
-            if date_obj > date.today():
-                raise ValueError('La data di nascita non può essere futura')
-        except ValueError as e:
-            if 'format' in str(e).lower():
-                raise ValueError('Formato data non valido. Utilizzare YYYY-MM-DD')
-            raise e
-        return v
+    nomeNato: Nome
+    cognomeNato: Nome
+    dataNascita: DataNascita
+    luogoNascita: Luogo
+    provinciaNascita: Provincia
+    ospedale: Optional[Luogo] = None
+
+    motivoRichiesta: Optional[Motivo] = None
 
 class AutocertificazioneStatoCivileRequest(BaseModel):
     # Dati personali
-    nome: str
-    cognome: str
-    codiceFiscale: str
-    luogoNascita: str
-    dataNascita: str  # Format: YYYY-MM-DD
-    comuneResidenza: str
-    indirizzoResidenza: str
-    
+    nome: Nome
+    cognome: Nome
+    codiceFiscale: CodiceFiscale
+    luogoNascita: Luogo
+    dataNascita: DataNascita
+    comuneResidenza: Luogo
+    indirizzoResidenza: Indirizzo
+
     # Stato civile
+    # Le validazioni incrociate sui campi condizionali sono fatte nel route handler
     statoCivile: Literal['celibe_nubile', 'coniugato', 'separato', 'divorziato', 'vedovo']
-    
+
     # Dati aggiuntivi condizionali (opzionali)
-    nomeConiuge: Optional[str] = None
-    cognomeConiuge: Optional[str] = None
-    dataMatrimonio: Optional[str] = None  # Format: YYYY-MM-DD
-    comuneMatrimonio: Optional[str] = None
-    dataSeparazione: Optional[str] = None  # Format: YYYY-MM-DD
-    dataDivorzio: Optional[str] = None  # Format: YYYY-MM-DD
-    tribunaleCompetente: Optional[str] = None
-    dataDecesso: Optional[str] = None  # Format: YYYY-MM-DD
-    
-    motivoRichiesta: Optional[str] = None
-    
-    @validator('codiceFiscale')
-    def validate_codice_fiscale(cls, v):
-        v = v.upper().strip()
-        if len(v) != 16:
-            raise ValueError('Il codice fiscale deve essere di 16 caratteri')
-        return v
-    
-    @validator('dataNascita')
-    def validate_data_nascita(cls, v):
-        try:
-            date_obj = date.fromisoformat(v)
-            if date_obj > date.today():
-                raise ValueError('La data di nascita non può essere futura')
-        except ValueError as e:
-            if 'format' in str(e).lower():
-                raise ValueError('Formato data non valido. Utilizzare YYYY-MM-DD')
-            raise e
-        return v
-    
-    @validator('dataMatrimonio', 'dataSeparazione', 'dataDivorzio', 'dataDecesso')
-    def validate_date_fields(cls, v):
-        if v is not None:
-            try:
-                date_obj = date.fromisoformat(v)
-                if date_obj > date.today():
-                    raise ValueError('Le date non possono essere future')
-            except ValueError as e:
-                if 'format' in str(e).lower():
-                    raise ValueError('Formato data non valido. Utilizzare YYYY-MM-DD')
-                raise e
-        return v
-    
-    @validator('statoCivile')
-    def validate_stato_civile_requirements(cls, v, values):
-        # Non possiamo fare validazioni incrociate complete qui poiché
-        # i campi potrebbero non essere ancora tutti processati
-        # La validazione più complessa sarà fatta nel route handler
+    nomeConiuge: Optional[Nome] = None
+    cognomeConiuge: Optional[Nome] = None
+    dataMatrimonio: Optional[DataPassata] = None
+    comuneMatrimonio: Optional[Luogo] = None
+    dataSeparazione: Optional[DataPassata] = None
+    dataDivorzio: Optional[DataPassata] = None
+    tribunaleCompetente: Optional[Luogo] = None
+    dataDecesso: Optional[DataPassata] = None
+
+    motivoRichiesta: Optional[Motivo] = None
+
+    @model_validator(mode='after')
+    def validate_codice_fiscale_dati_nascita(self):
+        check_codice_fiscale_matches(self.codiceFiscale, self.luogoNascita, self.dataNascita)
+        return self
+
+class BundleRequest(BaseModel):
+    # Documenti da generare insieme
+    documenti: List[Literal['partita_iva', 'autocertificazione', 'stato_civile']]
+    formato: Literal['pdf', 'zip'] = 'pdf'
+
+    # Dati personali condivisi
+    nome: Nome
+    cognome: Nome
+    codiceFiscale: CodiceFiscale
+    luogoNascita: Optional[Luogo] = None
+    dataNascita: Optional[DataNascita] = None
+    indirizzo: Indirizzo
+    civico: Civico
+    cap: Cap
+    comune: Luogo
+    provincia: Provincia
+    email: Optional[EmailStr] = None
+    telefono: Optional[Telefono] = None
+    motivoRichiesta: Optional[Motivo] = None
+
+    # Dati Partita IVA (richiesti se 'partita_iva' è tra i documenti)
+    codiceAteco: Optional[CodiceAteco] = None
+    descrizioneAttivita: Optional[Descrizione] = None
+    regimeFiscale: Optional[Literal['forfettario', 'ordinario']] = None
+    dataInizio: Optional[IsoDate] = None
+
+    # Dati Stato Civile (richiesti se 'stato_civile' è tra i documenti)
+    statoCivile: Optional[Literal['celibe_nubile', 'coniugato', 'separato', 'divorziato', 'vedovo']] = None
+    nomeConiuge: Optional[Nome] = None
+    cognomeConiuge: Optional[Nome] = None
+    dataMatrimonio: Optional[DataPassata] = None
+    comuneMatrimonio: Optional[Luogo] = None
+    dataSeparazione: Optional[DataPassata] = None
+    dataDivorzio: Optional[DataPassata] = None
+    tribunaleCompetente: Optional[Luogo] = None
+    dataDecesso: Optional[DataPassata] = None
+
+    @field_validator('documenti')
+    @classmethod
+    def validate_documenti(cls, v):
+        if not v:
+            raise ValueError('Selezionare almeno un documento')
+        # Un documento ripetuto è quasi sempre un errore del client: meglio segnalarlo
+        duplicati = sorted({d for d in v if v.count(d) > 1})
+        if duplicati:
+            raise ValueError(f"Documenti ripetuti: {', '.join(duplicati)}")
         return v
 
+    @model_validator(mode='after')
+    def validate_codice_fiscale_dati_nascita(self):
+        check_codice_fiscale_matches(self.codiceFiscale, self.luogoNascita, self.dataNascita)
+        return self
+
 class GenerateResponse(BaseModel):
     success: bool
     guida: Optional[str] = None
     pdfUrl: Optional[str] = None
     error: Optional[str] = None
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
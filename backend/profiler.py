@@ -0,0 +1,108 @@
+"""
+Profile a single pipeline stage in isolation: PDF generation or AI guide for one document type
+
+Usage:
+    python profiler.py pdf stato_civile --iterations 20 --format speedscope -o profile.json
+    python profiler.py guide partita_iva --data richiesta.json --format text
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import sys
+import tempfile
+import time
+
+from services import pdf_generator
+from services.profiling import SamplingProfiler, profile_summary
+from ai import pipeline
+
+STAGES = {
+    'partita_iva': (pdf_generator.generate_aa912_pdf, pipeline.generate_partita_iva_guide),
+    'autocertificazione': (pdf_generator.generate_autocertificazione_pdf, pipeline.generate_autocertificazione_guide),
+    'nascita': (pdf_generator.generate_autocertificazione_nascita_pdf, pipeline.generate_autocertificazione_nascita_guide),
+    'stato_civile': (pdf_generator.generate_autocertificazione_stato_civile_pdf, pipeline.generate_autocertificazione_stato_civile_guide),
+}
+
+# Dati di esempio usati se non si passa --data
+SAMPLE_DATA = {
+    'partita_iva': {
+        "nome": "Mario", "cognome": "Rossi", "codiceFiscale": "RSSMRA80A01H501U",
+        "indirizzo": "Via Roma", "civico": "123", "cap": "00100", "comune": "Roma", "provincia": "RM",
+        "email": "mario.rossi@email.com", "telefono": "3331234567", "codiceAteco": "62.01.00",
+        "descrizioneAttivita": "Sviluppo software", "regimeFiscale": "forfettario", "dataInizio": "2024-01-15",
+    },
+    'autocertificazione': {
+        "nome": "Mario", "cognome": "Rossi", "codiceFiscale": "RSSMRA80A01H501U", "luogoNascita": "Roma",
+        "dataNascita": "1980-01-01", "comuneResidenza": "Roma", "indirizzoResidenza": "Via Roma, 123",
+        "motivoRichiesta": "Iscrizione scolastica",
+    },
+    'nascita': {
+        "nomeDichiarante": "Mario", "cognomeDichiarante": "Rossi", "codiceFiscaleDichiarante": "RSSMRA80A01H501U",
+        "nomeNato": "Luca", "cognomeNato": "Rossi", "dataNascita": "2020-05-10", "luogoNascita": "Roma",
+        "provinciaNascita": "RM", "ospedale": "Policlinico Gemelli",
+    },
+    'stato_civile': {
+        "nome": "Mario", "cognome": "Rossi", "codiceFiscale": "RSSMRA80A01H501U", "luogoNascita": "Roma",
+        "dataNascita": "1980-01-01", "comuneResidenza": "Roma", "indirizzoResidenza": "Via Roma, 123",
+        "statoCivile": "coniugato", "nomeConiuge": "Anna", "cognomeConiuge": "Bianchi",
+        "dataMatrimonio": "2010-06-12", "comuneMatrimonio": "Milano", "motivoRichiesta": "Pratica INPS",
+    },
+}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profila la generazione PDF o la guida AI di un documento")
+    parser.add_argument('stage', choices=['pdf', 'guide'])
+    parser.add_argument('documento', choices=list(STAGES))
+    parser.add_argument('--data', help="JSON con i dati della richiesta (default: dati di esempio)")
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--format', choices=['speedscope', 'folded', 'prof', 'text'], default='text')
+    parser.add_argument('--interval-ms', type=float, default=1.0, help="intervallo di campionamento (speedscope/folded)")
+    parser.add_argument('-o', '--output', help="file di output (default: stdout, obbligatorio per prof)")
+    args = parser.parse_args()
+
+    data = SAMPLE_DATA[args.documento]
+    if args.data:
+        with open(args.data, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    generate_pdf, generate_guide = STAGES[args.documento]
+    output_dir = tempfile.mkdtemp(prefix='praticai-profile-')
+
+    def run_stage(i: int) -> None:
+        if args.stage == 'pdf':
+            generate_pdf(data, os.path.join(output_dir, f"{args.documento}_{i}.pdf"))
+        else:
+            generate_guide(data)
+
+    started = time.perf_counter()
+    if args.format in ('speedscope', 'folded'):
+        sampler = SamplingProfiler()
+        sampler.start(args.interval_ms / 1000)
+        for i in range(args.iterations):
+            run_stage(i)
+        sampler.stop()
+        result = json.dumps(sampler.speedscope()) if args.format == 'speedscope' else sampler.folded()
+    else:
+        profile = cProfile.Profile()
+        for i in range(args.iterations):
+            profile.runcall(run_stage, i)
+        prof_path = args.output if args.format == 'prof' and args.output else os.path.join(output_dir, 'stage.prof')
+        profile.dump_stats(prof_path)
+        result = None if args.format == 'prof' else profile_summary(prof_path)
+    elapsed = time.perf_counter() - started
+
+    print(f"⏱️  {args.stage} {args.documento}: {args.iterations} iterazioni in {elapsed:.2f} s "
+          f"({elapsed / args.iterations * 1000:.1f} ms/iterazione)", file=sys.stderr)
+
+    if result is not None:
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(result)
+        else:
+            print(result)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
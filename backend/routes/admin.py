@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+import os
+import re
+
+from services.archive import get_archive
+from services.auth import require_admin
+from services.download_tokens import download_url
+from services.profiling import PROFILES_DIR, profile_summary, sampler
+from services.scheduler import ADMISSION, SCHEDULERS
+from services.storage import output_path
+from services.templates import template_store
+from services.tenants import get_usage_db, load_tenants
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.post("/profiler/start")
+async def start_profiler(interval_ms: int = Query(10, ge=1, le=1000)):
+    """
+    Start the sampling profiler on this worker
+    """
+    sampler.start(interval_ms / 1000)
+    print(f"🔬 Profiler a campionamento avviato (worker {os.getpid()}, {interval_ms} ms)")
+    return {"success": True, "running": True, "pid": os.getpid(), "interval_ms": interval_ms}
+
+@router.post("/profiler/stop")
+async def stop_profiler():
+    """
+    Stop the sampling profiler; the samples stay available until the next start
+    """
+    sampler.stop()
+    print(f"🔬 Profiler a campionamento fermato: {sum(sampler.samples.values())} campioni")
+    return {
+        "success": True,
+        "running": False,
+        "pid": os.getpid(),
+        "samples": sum(sampler.samples.values()),
+        "seconds": round(sampler.duration, 3),
+    }
+
+@router.get("/profiler")
+async def get_profile(format: Literal['folded', 'speedscope'] = 'speedscope'):
+    """
+    Download the samples as collapsed stacks (flamegraph) or speedscope JSON
+    """
+    if format == 'folded':
+        return PlainTextResponse(sampler.folded())
+    return JSONResponse(
+        sampler.speedscope(),
+        headers={"Content-Disposition": f'attachment; filename="praticai-{os.getpid()}.speedscope.json"'}
+    )
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(profile_id: str, format: Literal['prof', 'text'] = 'text'):
+    """
+    Download a per-request cProfile captured with the X-Debug-Profile header
+    """
+    if not re.fullmatch(r'[0-9a-f]{32}', profile_id):
+        raise HTTPException(status_code=404, detail="Profilo non trovato")
+    prof_path = os.path.join(PROFILES_DIR, f"{profile_id}.prof")
+    if not os.path.exists(prof_path):
+        raise HTTPException(status_code=404, detail="Profilo non trovato")
+    if format == 'prof':
+        return FileResponse(prof_path, media_type='application/octet-stream', filename=f"{profile_id}.prof")
+    return PlainTextResponse(profile_summary(prof_path))
+
+@router.get("/usage")
+async def get_usage(days: int = Query(7, ge=1, le=366)):
+    """
+    Daily requests, documents and tokens per tenant, with the quotas and the stage queues of this worker
+    """
+    return {
+        "tenants": [
+            {"name": t.name, "weight": t.weight, "priority": t.priority,
+             "documents_per_day": t.documents_per_day, "tokens_per_day": t.tokens_per_day}
+            for t in load_tenants()
+        ],
+        "usage": get_usage_db().report(days),
+        "admission": ADMISSION.stats(),
+        "stages": {name: scheduler.stats() for name, scheduler in SCHEDULERS.items()},
+        "pid": os.getpid(),
+    }
+
+def _day_start(day: date) -> float:
+    return datetime.combine(day, datetime.min.time()).timestamp()
+
+@router.get("/documents")
+async def search_documents(
+    tipo: Optional[str] = None,
+    codice_fiscale: Optional[str] = None,
+    nome: Optional[str] = Query(None, description="Cognome e nome, in quest'ordine"),
+    tenant: Optional[str] = None,
+    dal: Optional[date] = None,
+    al: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = None,
+):
+    """
+    Search the archive of generated documents, newest first, with keyset pagination (pass nextCursor back)
+    and a fresh signed download link for each document
+    """
+    documents, next_cursor = get_archive().search(
+        document_type=tipo,
+        codice_fiscale=codice_fiscale,
+        nome=nome,
+        tenant=tenant,
+        since=_day_start(dal) if dal else None,
+        until=_day_start(al + timedelta(days=1)) if al else None,
+        limit=limit,
+        cursor=cursor,
+    )
+    for document in documents:
+        document["created_at"] = datetime.fromtimestamp(document["created_at"]).isoformat(timespec='seconds')
+        document["downloadUrl"] = download_url(output_path(document["storage_key"]), document["document_type"])
+    return {"documents": documents, "nextCursor": next_cursor}
+
+@router.get("/templates")
+async def get_templates():
+    """
+    Current and previous versions of the templates compiled by this worker
+    """
+    return {"templates": template_store.stats(), "pid": os.getpid()}
+
+@router.post("/templates/reload")
+async def reload_templates():
+    """
+    Recompile the templates on this worker and swap in the changed ones; requests in flight keep their version
+    """
+    from services.pdf_generator import TEMPLATE_NAMES
+    versions = await run_in_threadpool(template_store.reload_all, TEMPLATE_NAMES)
+    return {"success": True, "versions": versions, "pid": os.getpid()}
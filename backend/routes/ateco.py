@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Query
+from typing import Literal, Optional
+
+from services.ateco import search_ateco
+
+router = APIRouter()
+
+@router.get("/ateco")
+async def autocomplete_ateco(
+    q: str = Query(..., min_length=1, max_length=100),
+    edizione: Optional[Literal['2007', '2025']] = None,
+    limit: int = Query(10, ge=1, le=50)
+):
+    """
+    Autocomplete ATECO codes by code prefix or description
+    """
+    risultati = search_ateco(q, edizione=edizione, limit=limit)
+    return {
+        "success": True,
+        "risultati": [
+            {"codice": e.codice, "edizione": e.edizione, "descrizione": e.descrizione}
+            for e in risultati
+        ]
+    }
@@ -1,34 +1,54 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
-from typing import Optional
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header, Query
+from typing import Any, Dict, Optional
 import os
-import uuid
 from datetime import datetime
 
 from services.pdf_generator import generate_autocertificazione_nascita_pdf
 from ai.pipeline import generate_autocertificazione_nascita_guide
 from models.schemas import AutocertificazioneNascitaRequest
+from models.context import GenerationContext
+from services.download_tokens import download_url
+from services.fileio import run_io
+from services.storage import register_file, delete_file
+from services.idempotency import run_idempotent
+from services.guide_sections import attach_guide_sections
+from services.guide_cache import cached_guide
+from services.profiling import profiled_call
+from services.scheduler import run_admitted
 
 router = APIRouter()
 
-# Dizionario per tracciare i file generati
-generated_files = {}
-
 @router.post("/autocertificazione-nascita")
 async def generate_autocertificazione_nascita_documents(
     request: AutocertificazioneNascitaRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None),
+    guida: str = Query("completa", pattern="^(completa|sezioni)$")
 ):
     """
-    Generate Autocertificazione di Nascita PDF and AI guide
+    Generate Autocertificazione di Nascita PDF and AI guide.
+    Retries with the same Idempotency-Key and identical concurrent requests share one generation.
+    With ?guida=sezioni the guide is sent as a section outline, fetched via /api/guide.
+    """
+    result = await run_idempotent(
+        "autocertificazione-nascita",
+        idempotency_key,
+        request.model_dump(),
+        lambda: run_admitted(profiled_call, build_autocertificazione_nascita_documents, request)
+    )
+    return await attach_guide_sections(result, sections_only=guida == "sezioni")
+
+def build_autocertificazione_nascita_documents(request: AutocertificazioneNascitaRequest) -> Dict[str, Any]:
+    """
+    Render the Autocertificazione di Nascita PDF and the AI guide (blocking, runs in the threadpool)
     """
     try:
         print(f"🚀 Inizio generazione Autocertificazione Nascita per: {request.nomeNato} {request.cognomeNato}")
         
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        pdf_filename = f"autocertificazione_nascita_{request.cognomeNato}_{request.nomeNato}_{file_id}.pdf"
-        pdf_path = os.path.join("data", "output", pdf_filename)
+        # Dump the request once and allocate the output file
+        ctx = GenerationContext.from_request(request, "autocertificazione_nascita", request.cognomeNato, request.nomeNato)
+        file_id = ctx.file_id
+        pdf_path = ctx.pdf_path
         
         print(f"📁 File ID: {file_id}")
         print(f"📄 PDF path: {pdf_path}")
@@ -40,9 +60,9 @@ async def generate_autocertificazione_nascita_documents(
         
         # Generate PDF
         print("🔧 Generazione PDF Autocertificazione Nascita...")
-        pdf_success = generate_autocertificazione_nascita_pdf(request.dict(), pdf_path)
+        template_version = generate_autocertificazione_nascita_pdf(ctx.data, pdf_path)
         
-        if not pdf_success:
+        if not template_version:
             print("❌ Errore nella generazione PDF")
             raise HTTPException(status_code=500, detail="Errore nella generazione del PDF")
         
@@ -51,14 +71,13 @@ async def generate_autocertificazione_nascita_documents(
             print(f"❌ File PDF non trovato dopo generazione: {pdf_path}")
             raise HTTPException(status_code=500, detail="PDF non generato correttamente")
         
-        # Salva il mapping file_id -> path
-        generated_files[file_id] = pdf_path
-        print(f"💾 File mappato: {file_id} -> {pdf_path}")
-        print(f"📋 File attualmente mappati: {list(generated_files.keys())}")
+        # Salva il mapping file_id -> path nel registro condiviso
+        register_file(file_id, pdf_path, "autocertificazione_nascita", ctx.data, template_version)
         
         # Generate AI guide
         print("🤖 Generazione guida AI...")
-        ai_guide = generate_autocertificazione_nascita_guide(request.dict())
+        # Riusa la guida precedente se sono cambiati solo campi che finiscono nel PDF
+        ai_guide = cached_guide("autocertificazione_nascita", ctx.data, generate_autocertificazione_nascita_guide)
         if not ai_guide:
             ai_guide = "Guida AI non disponibile. L'autocertificazione di nascita è stata generata correttamente."
         
@@ -70,7 +89,7 @@ async def generate_autocertificazione_nascita_documents(
         return {
             "success": True,
             "guida": ai_guide,
-            "pdfUrl": f"/api/download/{file_id}",
+            "pdfUrl": download_url(pdf_path, "autocertificazione_nascita"),
             "message": "Autocertificazione di nascita generata con successo"
         }
         
@@ -78,65 +97,11 @@ async def generate_autocertificazione_nascita_documents(
         print(f"❌ Errore completo: {e}")
         raise HTTPException(status_code=500, detail=f"Errore interno: {str(e)}")
 
-@router.get("/download/{file_id}")
-async def download_autocertificazione_nascita_pdf(file_id: str):
-    """
-    Download generated Autocertificazione di Nascita PDF file
-    """
-    print(f"📥 Richiesta download per file_id: {file_id}")
-    print(f"📋 File disponibili: {list(generated_files.keys())}")
-    
-    # Cerca nel dizionario dei file generati
-    if file_id in generated_files:
-        file_path = generated_files[file_id]
-        print(f"✅ File trovato nel mapping: {file_path}")
-        
-        if os.path.exists(file_path):
-            filename = os.path.basename(file_path)
-            print(f"📄 Invio file: {filename}")
-            return FileResponse(
-                file_path,
-                media_type='application/pdf',
-                filename=filename
-            )
-        else:
-            print(f"❌ File non esiste nel filesystem: {file_path}")
-    else:
-        print(f"❌ File_id non trovato nel mapping")
-    
-    # Fallback: cerca nella directory output
-    output_dir = os.path.join("data", "output")
-    print(f"🔍 Cerco nella directory: {output_dir}")
-    
-    if os.path.exists(output_dir):
-        files_in_dir = os.listdir(output_dir)
-        print(f"📁 File nella directory: {files_in_dir}")
-        
-        for filename in files_in_dir:
-            if file_id in filename and filename.endswith('.pdf'):
-                file_path = os.path.join(output_dir, filename)
-                print(f"✅ File trovato nel fallback: {file_path}")
-                if os.path.exists(file_path):
-                    return FileResponse(
-                        file_path,
-                        media_type='application/pdf',
-                        filename=filename
-                    )
-    else:
-        print(f"❌ Directory output non esiste: {output_dir}")
-    
-    print("❌ File non trovato da nessuna parte")
-    raise HTTPException(status_code=404, detail=f"File non trovato: {file_id}")
-
 async def cleanup_file(file_id: str):
     """
     Clean up generated files after some time
     """
     try:
-        if file_id in generated_files:
-            file_path = generated_files[file_id]
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            del generated_files[file_id]
+        await run_io(delete_file, file_id)
     except Exception:
         pass  # Ignore cleanup errors
\ No newline at end of file
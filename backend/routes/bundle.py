@@ -0,0 +1,138 @@
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from typing import Any, Dict, List, Optional
+import asyncio
+import os
+import uuid
+
+from services.bundle import BUNDLE_DOCUMENTS, build_document_data, bundle_pdf_paths, render_bundle_pdfs, merge_pdfs, zip_pdfs
+from ai.pipeline import generate_bundle_guide
+from models.schemas import BundleRequest, AutocertificazioneStatoCivileRequest
+from routes.autocertificazione_stato_civile import validate_conditional_fields
+from services.download_tokens import download_url
+from services.fileio import exists, remove, run_io
+from services.storage import output_path, register_file
+from services.idempotency import run_idempotent
+from services.guide_sections import attach_guide_sections
+from services.guide_cache import cached_guide
+from services.profiling import profiled_call
+from services.scheduler import admitted
+import config
+
+router = APIRouter()
+
+@router.post("/bundle")
+async def generate_bundle_documents(
+    request: BundleRequest,
+    idempotency_key: Optional[str] = Header(None),
+    guida: str = Query("completa", pattern="^(completa|sezioni)$")
+):
+    """
+    Generate several documents from shared personal data, merged in one PDF or ZIP,
+    with a single combined AI guide.
+    Retries with the same Idempotency-Key and identical concurrent requests share one generation.
+    With ?guida=sezioni the guide is sent as a section outline, fetched via /api/guide.
+    """
+    result = await run_idempotent(
+        "bundle",
+        idempotency_key,
+        request.model_dump(),
+        lambda: build_bundle_documents(request)
+    )
+    return await attach_guide_sections(result, sections_only=guida == "sezioni")
+
+async def build_bundle_documents(request: BundleRequest) -> Dict[str, Any]:
+    """
+    Validate, render and combine the bundle documents
+    """
+    try:
+        print(f"🚀 Inizio generazione bundle {request.documenti} per: {request.nome} {request.cognome}")
+
+        bundle_data = request.model_dump()
+
+        # Validazione dei dati per ciascun documento richiesto
+        documents = {}
+        for documento in request.documenti:
+            try:
+                documents[documento] = build_document_data(documento, bundle_data)
+            except ValidationError as e:
+                campi = ', '.join(str(err['loc'][-1]) for err in e.errors())
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Dati mancanti o non validi per '{BUNDLE_DOCUMENTS[documento]['label']}': {campi}"
+                )
+
+        if 'stato_civile' in documents:
+            validation_error = validate_conditional_fields(
+                AutocertificazioneStatoCivileRequest(**documents['stato_civile'])
+            )
+            if validation_error:
+                raise HTTPException(status_code=422, detail=validation_error)
+
+        # Generate unique filename
+        file_id = str(uuid.uuid4())
+        extension = 'zip' if request.formato == 'zip' else 'pdf'
+        bundle_filename = f"bundle_{request.cognome}_{request.nome}_{file_id}.{extension}"
+        output_dir = config.OUTPUT_DIR
+        bundle_path = output_path(bundle_filename)
+
+        print(f"📁 File ID: {file_id}")
+        print(f"📄 Bundle path: {bundle_path}")
+
+        # Il bundle usa più thread (un PDF per documento e la guida): parte quando la coda fair lo ammette
+        async with admitted():
+            # PDF e guida unica procedono in parallelo
+            print(f"🔧 Generazione di {len(documents)} PDF e guida AI in parallelo...")
+            guide_task = run_in_threadpool(profiled_call, cached_guide, "bundle", bundle_data, generate_bundle_guide, list(documents))
+            pdf_paths = bundle_pdf_paths(documents, output_dir, file_id)
+            rendered, ai_guide = await asyncio.gather(
+                render_bundle_pdfs(documents, output_dir, file_id),
+                guide_task,
+                return_exceptions=True
+            )
+            error = next((r for r in (rendered, ai_guide) if isinstance(r, Exception)), None)
+            if error:
+                # Nessun bundle: i PDF già scritti non servono più
+                await _remove_files(pdf_paths)
+                if isinstance(error, RuntimeError):
+                    print(f"❌ {error}")
+                    raise HTTPException(status_code=500, detail=str(error))
+                raise error
+            _, template_version = rendered
+
+            # Unione dei PDF in un unico file o archivio
+            combine = zip_pdfs if request.formato == 'zip' else merge_pdfs
+            combined = await run_in_threadpool(profiled_call, combine, pdf_paths, bundle_path)
+
+        await _remove_files(pdf_paths)
+
+        if not combined or not await exists(bundle_path):
+            print(f"❌ Bundle non creato: {bundle_path}")
+            raise HTTPException(status_code=500, detail="Errore nella creazione del bundle")
+
+        # Salva il mapping file_id -> path nel registro condiviso
+        await run_io(register_file, file_id, bundle_path, "bundle", bundle_data, template_version)
+
+        if not ai_guide:
+            ai_guide = "Guida AI non disponibile. I documenti sono stati generati correttamente."
+
+        print("✅ Generazione bundle completata con successo!")
+
+        return {
+            "success": True,
+            "guida": ai_guide,
+            "pdfUrl": download_url(bundle_path, "bundle"),
+            "message": f"{len(documents)} documenti generati con successo"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Errore completo: {e}")
+        raise HTTPException(status_code=500, detail=f"Errore interno: {str(e)}")
+
+async def _remove_files(paths: List[str]) -> None:
+    for path in paths:
+        if await exists(path):
+            await remove(path)
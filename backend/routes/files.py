@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Request
+import time
+
+import config
+from services.download_tokens import ExpiredDownloadToken, InvalidDownloadToken, verify_download
+from services.downloads import document_response
+from services.fileio import exists
+from services.storage import output_path
+from services.tracing import set_attributes
+
+router = APIRouter()
+
+@router.get("/files/{token}")
+async def download_signed(token: str, request: Request):
+    """
+    Download a generated document through a signed link: no registry lookup, the token says which file
+    """
+    try:
+        claims = verify_download(token)
+    except ExpiredDownloadToken:
+        raise HTTPException(status_code=410, detail="Link di download scaduto: rigenera il documento")
+    except InvalidDownloadToken as e:
+        print(f"⛔ Link di download rifiutato: {e}")
+        raise HTTPException(status_code=403, detail="Link di download non valido")
+
+    set_attributes(document_type=claims.document_type)
+    file_path = output_path(claims.storage_key)
+    if not await exists(file_path):
+        raise HTTPException(status_code=404, detail="File non trovato")
+
+    media_type = 'application/zip' if claims.storage_key.endswith('.zip') else 'application/pdf'
+    # Cachabile fino alla scadenza del link, non oltre
+    max_age = max(claims.expires - int(time.time()), 0)
+    cache_control = f"{config.DOWNLOAD_CACHE_SCOPE}, max-age={max_age}, immutable"
+    return await document_response(request, file_path, media_type, claims.storage_key, cache_control)
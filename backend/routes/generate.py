@@ -1,35 +1,55 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Header, Query
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Any, Dict, Optional
 import os
-import uuid
 from datetime import datetime
 
 from services.pdf_generator import generate_aa912_pdf
 from ai.pipeline import generate_partita_iva_guide
 from models.schemas import PartitaIvaRequest
+from models.context import GenerationContext
+from services.download_tokens import download_url
+from services.fileio import run_io
+from services.storage import register_file, delete_file
+from services.idempotency import run_idempotent
+from services.guide_sections import attach_guide_sections
+from services.guide_cache import cached_guide
+from services.profiling import profiled_call
+from services.scheduler import run_admitted
 
 router = APIRouter()
 
-# Dizionario per tracciare i file generati
-generated_files = {}
-
 @router.post("/generate")
 async def generate_partita_iva_documents(
     request: PartitaIvaRequest,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None),
+    guida: str = Query("completa", pattern="^(completa|sezioni)$")
 ):
     """
-    Generate AA9/12 PDF and AI guide for Partita IVA opening
+    Generate AA9/12 PDF and AI guide for Partita IVA opening.
+    Retries with the same Idempotency-Key and identical concurrent requests share one generation.
+    With ?guida=sezioni the guide is sent as a section outline, fetched via /api/guide.
+    """
+    result = await run_idempotent(
+        "generate",
+        idempotency_key,
+        request.model_dump(),
+        lambda: run_admitted(profiled_call, build_partita_iva_documents, request)
+    )
+    return await attach_guide_sections(result, sections_only=guida == "sezioni")
+
+def build_partita_iva_documents(request: PartitaIvaRequest) -> Dict[str, Any]:
+    """
+    Render the AA9/12 PDF and the AI guide (blocking, runs in the threadpool)
     """
     try:
         print(f"🚀 Inizio generazione per: {request.nome} {request.cognome}")
         
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        pdf_filename = f"aa912_{request.cognome}_{request.nome}_{file_id}.pdf"
-        pdf_path = os.path.join("data", "output", pdf_filename)
+        # Dump the request once and allocate the output file
+        ctx = GenerationContext.from_request(request, "aa912", request.cognome, request.nome)
+        file_id = ctx.file_id
+        pdf_path = ctx.pdf_path
         
         print(f"📁 File ID: {file_id}")
         print(f"📄 PDF path: {pdf_path}")
@@ -41,9 +61,9 @@ async def generate_partita_iva_documents(
         
         # Generate PDF
         print("🔧 Generazione PDF...")
-        pdf_success = generate_aa912_pdf(request.dict(), pdf_path)
+        template_version = generate_aa912_pdf(ctx.data, pdf_path)
         
-        if not pdf_success:
+        if not template_version:
             print("❌ Errore nella generazione PDF")
             raise HTTPException(status_code=500, detail="Errore nella generazione del PDF")
         
@@ -52,14 +72,13 @@ async def generate_partita_iva_documents(
             print(f"❌ File PDF non trovato dopo generazione: {pdf_path}")
             raise HTTPException(status_code=500, detail="PDF non generato correttamente")
         
-        # Salva il mapping file_id -> path
-        generated_files[file_id] = pdf_path
-        print(f"💾 File mappato: {file_id} -> {pdf_path}")
-        print(f"📋 File attualmente mappati: {list(generated_files.keys())}")
+        # Salva il mapping file_id -> path nel registro condiviso
+        register_file(file_id, pdf_path, "aa912", ctx.data, template_version)
         
         # Generate AI guide
         print("🤖 Generazione guida AI...")
-        ai_guide = generate_partita_iva_guide(request.dict())
+        # Riusa la guida precedente se sono cambiati solo campi che finiscono nel PDF
+        ai_guide = cached_guide("partita_iva", ctx.data, generate_partita_iva_guide)
         if not ai_guide:
             ai_guide = "Guida AI non disponibile. Il PDF è stato generato correttamente."
         
@@ -71,7 +90,7 @@ async def generate_partita_iva_documents(
         return {
             "success": True,
             "guida": ai_guide,
-            "pdfUrl": f"/api/download/{file_id}",
+            "pdfUrl": download_url(pdf_path, "aa912"),
             "message": "Documenti generati con successo"
         }
         
@@ -79,65 +98,11 @@ async def generate_partita_iva_documents(
         print(f"❌ Errore completo: {e}")
         raise HTTPException(status_code=500, detail=f"Errore interno: {str(e)}")
 
-@router.get("/download/{file_id}")
-async def download_pdf(file_id: str):
-    """
-    Download generated PDF file
-    """
-    print(f"📥 Richiesta download per file_id: {file_id}")
-    print(f"📋 File disponibili: {list(generated_files.keys())}")
-    
-    # Cerca nel dizionario dei file generati
-    if file_id in generated_files:
-        file_path = generated_files[file_id]
-        print(f"✅ File trovato nel mapping: {file_path}")
-        
-        if os.path.exists(file_path):
-            filename = os.path.basename(file_path)
-            print(f"📄 Invio file: {filename}")
-            return FileResponse(
-                file_path,
-                media_type='application/pdf',
-                filename=filename
-            )
-        else:
-            print(f"❌ File non esiste nel filesystem: {file_path}")
-    else:
-        print(f"❌ File_id non trovato nel mapping")
-    
-    # Fallback: cerca nella directory output
-    output_dir = os.path.join("data", "output")
-    print(f"🔍 Cerco nella directory: {output_dir}")
-    
-    if os.path.exists(output_dir):
-        files_in_dir = os.listdir(output_dir)
-        print(f"📁 File nella directory: {files_in_dir}")
-        
-        for filename in files_in_dir:
-            if file_id in filename and filename.endswith('.pdf'):
-                file_path = os.path.join(output_dir, filename)
-                print(f"✅ File trovato nel fallback: {file_path}")
-                if os.path.exists(file_path):
-                    return FileResponse(
-                        file_path,
-                        media_type='application/pdf',
-                        filename=filename
-                    )
-    else:
-        print(f"❌ Directory output non esiste: {output_dir}")
-    
-    print("❌ File non trovato da nessuna parte")
-    raise HTTPException(status_code=404, detail=f"File non trovato: {file_id}")
-
 async def cleanup_file(file_id: str):
     """
     Clean up generated files after some time
     """
     try:
-        if file_id in generated_files:
-            file_path = generated_files[file_id]
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            del generated_files[file_id]
+        await run_io(delete_file, file_id)
     except Exception:
         pass  # Ignore cleanup errors
\ No newline at end of file
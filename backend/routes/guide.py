@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+import time
+
+from services.guide_sections import get_rendered_guide, outline
+import config
+
+router = APIRouter()
+
+async def _rendered_guide(guide_id: str):
+    rendered = await run_in_threadpool(get_rendered_guide, guide_id)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Guida non trovata o scaduta: rigenera il documento")
+    return rendered
+
+def _cache_control(rendered) -> str:
+    # Non oltre la scadenza delle sezioni nello store: dopo, lo stesso id risponde 404
+    expires = rendered.get("expires", time.time() + config.GUIDE_CACHE_TTL)
+    return f"private, max-age={max(int(expires - time.time()), 0)}"
+
+@router.get("/guide/{guide_id}")
+async def guide_outline(guide_id: str):
+    """
+    Section list of a rendered guide
+    """
+    rendered = await _rendered_guide(guide_id)
+    return JSONResponse(
+        {"guidaId": guide_id, "sezioni": outline(rendered)},
+        headers={"Cache-Control": _cache_control(rendered)},
+    )
+
+@router.get("/guide/{guide_id}/{section_id}")
+async def guide_section(guide_id: str, section_id: str):
+    """
+    One section of a rendered guide as HTML. The guide id is a content hash, so the response doesn't change while it's stored
+    """
+    rendered = await _rendered_guide(guide_id)
+    for section in rendered["sections"]:
+        if section["id"] == section_id:
+            return JSONResponse(section, headers={"Cache-Control": _cache_control(rendered)})
+    raise HTTPException(status_code=404, detail=f"Sezione non trovata: {section_id}")
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from datetime import datetime
+
+from services.health import readiness
+
+router = APIRouter()
+
+@router.get("/health/live")
+async def liveness():
+    """
+    The process is up and the event loop is responsive
+    """
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@router.get("/health/ready")
+async def readiness_check():
+    """
+    The worker can take new work: 503 makes the load balancer shed traffic
+    """
+    result = await readiness()
+    result["timestamp"] = datetime.now().isoformat()
+    return JSONResponse(status_code=200 if result["ready"] else 503, content=result)
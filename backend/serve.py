@@ -0,0 +1,28 @@
+"""
+Production server for PraticAI: N uvicorn worker processes sharing state through STATE_BACKEND
+
+Usage: WORKERS=4 python serve.py
+"""
+
+import uvicorn
+
+import config
+
+if __name__ == "__main__":
+    if config.WORKERS > 1 and config.STATE_BACKEND == 'memory':
+        print("⚠️  STATE_BACKEND=memory non è condiviso tra i worker: uso 'sqlite'")
+        config.STATE_BACKEND = 'sqlite'
+        import os
+        os.environ["STATE_BACKEND"] = 'sqlite'
+
+    print(f"🚀 Avvio PraticAI su {config.HOST}:{config.PORT} con {config.WORKERS} worker "
+          f"(stato condiviso: {config.STATE_BACKEND}, output: {config.OUTPUT_DIR})")
+
+    uvicorn.run(
+        "main:app",
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        proxy_headers=True,
+        log_level="info",
+    )
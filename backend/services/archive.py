@@ -0,0 +1,145 @@
+"""
+Archive of the generated documents: one row per file in an embedded SQLite database, with document type,
+template version, time, tenant, size, storage key and keyed hashes of the identity fields,
+searchable without scanning OUTPUT_DIR
+"""
+
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from services.auth import load_secret
+from services.guide_cache import IDENTITY_FIELDS
+from services.tenants import current_tenant
+
+_COLUMNS = ("id", "storage_key", "document_type", "template_version", "created_at", "tenant", "size")
+
+# Nome del dichiarante per tipo di documento (il codice fiscale è quello della cache delle guide)
+_NAME_FIELDS: Dict[str, Tuple[str, str]] = {
+    'autocertificazione_nascita': ('cognomeDichiarante', 'nomeDichiarante'),
+}
+
+def identity_fields(document_type: str) -> Tuple[str, str, str]:
+    """
+    Codice fiscale, cognome and nome fields of a document type (aa912 is the partita_iva form)
+    """
+    documento = 'partita_iva' if document_type == 'aa912' else document_type
+    return (IDENTITY_FIELDS.get(documento, 'codiceFiscale'), *_NAME_FIELDS.get(document_type, ('cognome', 'nome')))
+
+@lru_cache(maxsize=1)
+def _hash_key() -> bytes:
+    return load_secret(config.ARCHIVE_HASH_KEY, '.archive_key')
+
+def identity_hash(value: str) -> str:
+    """
+    Keyed hash of an identity field (codice fiscale, name): searchable by exact value, not reversible
+    """
+    normalized = ' '.join(value.split()).upper()
+    return hmac.new(_hash_key(), normalized.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+class DocumentArchive:
+    """Metadata of the generated documents, shared by all the workers on one node"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id INTEGER PRIMARY KEY, storage_key TEXT NOT NULL UNIQUE, document_type TEXT NOT NULL, "
+            "created_at REAL NOT NULL, tenant TEXT NOT NULL, size INTEGER NOT NULL, "
+            "cf_hash TEXT, name_hash TEXT, template_version TEXT);"
+            # Le ricerche filtrano per uno di questi campi e scorrono per id decrescente (= data di creazione)
+            "CREATE INDEX IF NOT EXISTS documents_type ON documents (document_type, id);"
+            "CREATE INDEX IF NOT EXISTS documents_cf ON documents (cf_hash, id);"
+            "CREATE INDEX IF NOT EXISTS documents_name ON documents (name_hash, id);"
+            "CREATE INDEX IF NOT EXISTS documents_tenant ON documents (tenant, id);"
+            "CREATE INDEX IF NOT EXISTS documents_created ON documents (created_at);"
+        )
+        columns = {row[1] for row in self._connect().execute("PRAGMA table_info(documents)")}
+        if "template_version" not in columns:
+            self._connect().execute("ALTER TABLE documents ADD COLUMN template_version TEXT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, path: str, document_type: str, data: Dict[str, Any], template_version: Optional[str] = None) -> None:
+        cf_field, cognome_field, nome_field = identity_fields(document_type)
+        codice_fiscale = data.get(cf_field)
+        cognome_nome = f"{data.get(cognome_field) or ''} {data.get(nome_field) or ''}".strip()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO documents "
+            "(storage_key, document_type, template_version, created_at, tenant, size, cf_hash, name_hash) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                os.path.basename(path),
+                document_type,
+                template_version,
+                time.time(),
+                current_tenant()[0].name,
+                os.path.getsize(path),
+                identity_hash(codice_fiscale) if codice_fiscale else None,
+                identity_hash(cognome_nome) if cognome_nome else None,
+            )
+        )
+
+    def remove(self, storage_key: str) -> None:
+        self._connect().execute("DELETE FROM documents WHERE storage_key = ?", (storage_key,))
+
+    def search(
+        self,
+        document_type: Optional[str] = None,
+        codice_fiscale: Optional[str] = None,
+        nome: Optional[str] = None,
+        tenant: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Newest first; returns one page and the cursor of the next one (None on the last page)
+        """
+        filters: List[Tuple[str, Any]] = [
+            ("document_type = ?", document_type),
+            ("cf_hash = ?", identity_hash(codice_fiscale) if codice_fiscale else None),
+            ("name_hash = ?", identity_hash(nome) if nome else None),
+            ("tenant = ?", tenant),
+            ("created_at >= ?", since),
+            ("created_at < ?", until),
+            ("id < ?", cursor),  # paginazione per chiave: costo costante anche in fondo all'archivio
+        ]
+        active = [(clause, value) for clause, value in filters if value is not None]
+        where = " AND ".join(clause for clause, _ in active) or "1"
+        rows = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM documents WHERE {where} ORDER BY id DESC LIMIT ?",
+            (*(value for _, value in active), limit + 1)
+        ).fetchall()
+        documents = [dict(zip(_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = documents[-1]["id"] if len(rows) > limit else None
+        return documents, next_cursor
+
+@lru_cache(maxsize=1)
+def get_archive() -> DocumentArchive:
+    return DocumentArchive(config.ARCHIVE_DB)
+
+def archive_document(path: str, document_type: str, data: Dict[str, Any], template_version: Optional[str] = None) -> None:
+    """
+    Record a generated document; a failure is logged and never fails the generation
+    """
+    try:
+        get_archive().add(path, document_type, data, template_version)
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️  Archiviazione documento non riuscita: {e}")
@@ -0,0 +1,132 @@
+"""
+ATECO code index: sorted arrays with bisect prefix search on codes and description words
+"""
+
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import config
+
+ATECO_PATH = os.path.join(config.DATA_DIR, "ateco.tsv")
+
+# L'edizione 2025 è in vigore dal 1° aprile 2025: in caso di codice presente in entrambe prevale
+EDIZIONI = ('2025', '2007')
+
+class AtecoEntry(NamedTuple):
+    codice: str
+    edizione: str
+    descrizione: str
+
+class _AtecoIndex(NamedTuple):
+    codes: List[str]                # codici ordinati, per la ricerca per prefisso
+    entries: List[AtecoEntry]       # allineato a codes
+    words: List[Tuple[str, int]]    # (parola normalizzata, posizione in entries), ordinato
+    by_code: Dict[Tuple[str, str], AtecoEntry]
+
+def _normalize_text(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+@lru_cache(maxsize=1)
+def _ateco_index() -> _AtecoIndex:
+    entries = []
+    with open(ATECO_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            codice, edizione, descrizione = line.rstrip('\n').split('\t')
+            entries.append(AtecoEntry(codice, edizione, descrizione))
+    entries.sort()
+    words = sorted({
+        (word, i)
+        for i, e in enumerate(entries)
+        for word in re.findall(r'[a-z0-9]+', _normalize_text(e.descrizione))
+    })
+    return _AtecoIndex(
+        codes=[e.codice for e in entries],
+        entries=entries,
+        words=words,
+        by_code={(e.codice, e.edizione): e for e in entries},
+    )
+
+def _entries_with_word_prefix(index: _AtecoIndex, prefix: str) -> Set[int]:
+    matches = set()
+    i = bisect_left(index.words, (prefix, -1))
+    while i < len(index.words) and index.words[i][0].startswith(prefix):
+        matches.add(index.words[i][1])
+        i += 1
+    return matches
+
+def load_ateco_index() -> int:
+    """
+    Preload the ATECO index, returning the number of codes
+    """
+    return len(_ateco_index().codes)
+
+def normalize_ateco_code(code: str) -> str:
+    """
+    Normalize an ATECO code (or code prefix) to the dotted form: "620100" -> "62.01.00"
+    """
+    digits = re.sub(r'\D', '', code)
+    return '.'.join(digits[i:i + 2] for i in range(0, len(digits), 2))
+
+def lookup_ateco(code: str, edizione: Optional[str] = None) -> Optional[AtecoEntry]:
+    """
+    Return the official entry for a complete ATECO code, preferring the most recent edition
+    """
+    index = _ateco_index()
+    codice = normalize_ateco_code(code)
+    for ed in ((edizione,) if edizione else EDIZIONI):
+        entry = index.by_code.get((codice, ed))
+        if entry:
+            return entry
+    return None
+
+def search_ateco(query: str, edizione: Optional[str] = None, limit: int = 10) -> List[AtecoEntry]:
+    """
+    Autocomplete ATECO codes: numeric queries match by code prefix, text queries by description
+    """
+    index = _ateco_index()
+    query = query.strip()
+    results: List[AtecoEntry] = []
+    if not query or limit <= 0:
+        return results
+
+    if re.fullmatch(r'[\d.\s]+', query):
+        prefix = normalize_ateco_code(query)
+        i = bisect_left(index.codes, prefix)
+        while i < len(index.codes) and index.codes[i].startswith(prefix) and len(results) < limit:
+            entry = index.entries[i]
+            if not edizione or entry.edizione == edizione:
+                results.append(entry)
+            i += 1
+        return results
+
+    # Ogni parola della query deve essere il prefisso di una parola della descrizione
+    candidates: Optional[Set[int]] = None
+    for word in re.findall(r'[a-z0-9]+', _normalize_text(query)):
+        matches = _entries_with_word_prefix(index, word)
+        candidates = matches if candidates is None else candidates & matches
+        if not candidates:
+            return results
+
+    for i in sorted(candidates or ()):
+        entry = index.entries[i]
+        if not edizione or entry.edizione == edizione:
+            results.append(entry)
+            if len(results) >= limit:
+                break
+    return results
+
+def validate_codice_ateco(v: str) -> str:
+    """
+    Validate an ATECO code against the embedded table, returning it in dotted form
+    """
+    entry = lookup_ateco(v)
+    if entry is None:
+        raise ValueError('Codice ATECO non valido: indicare una sottocategoria esistente (es. 62.10.00)')
+    return entry.codice
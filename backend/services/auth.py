@@ -0,0 +1,57 @@
+"""
+Admin authentication for the operational endpoints (ADMIN_TOKEN) and the server-side secret keys
+"""
+
+import hmac
+import os
+import secrets
+import tempfile
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+import config
+
+def is_admin(token: Optional[str]) -> bool:
+    """
+    True if token matches ADMIN_TOKEN; always False when no admin token is configured
+    """
+    return bool(config.ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, config.ADMIN_TOKEN)
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Dependency for the /admin routes: they don't exist unless ADMIN_TOKEN is set
+    """
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token amministratore non valido")
+
+def load_secret(value: str, filename: str) -> bytes:
+    """
+    The configured secret, or a random one created once in OUTPUT_DIR (shared by workers and nodes)
+    """
+    if value:
+        return value.encode('utf-8')
+    path = os.path.join(config.OUTPUT_DIR, filename)
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    if not os.path.exists(path):
+        # Scritta per intero in un file temporaneo e pubblicata con link(): atomica e senza sovrascrivere
+        # la chiave di un altro worker arrivato prima, che nessuno può leggere a metà
+        fd, tmp_path = tempfile.mkstemp(prefix=filename, dir=config.OUTPUT_DIR)
+        try:
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(secrets.token_urlsafe(32))
+                f.flush()
+                os.fsync(f.fileno())
+            os.link(tmp_path, path)
+            print(f"🔑 Chiave generata in {path}")
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp_path)
+    with open(path, 'r', encoding='ascii') as f:
+        key = f.read().strip()
+    if not key:
+        raise RuntimeError(f"Chiave vuota in {path}: eliminala o configura la variabile corrispondente")
+    return key.encode('ascii')
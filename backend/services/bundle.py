@@ -0,0 +1,130 @@
+import asyncio
+import os
+import zipfile
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.pdf_generator import (
+    generate_aa912_pdf,
+    generate_autocertificazione_pdf,
+    generate_autocertificazione_stato_civile_pdf,
+    postprocess_pdf,
+)
+from models.schemas import (
+    PartitaIvaRequest,
+    AutocertificazioneRequest,
+    AutocertificazioneStatoCivileRequest,
+)
+from services.fileio import makedirs
+from services.profiling import profiled_call
+
+# Documenti generabili in un bundle: modello di validazione, generatore PDF e prefisso del file
+BUNDLE_DOCUMENTS: Dict[str, Dict[str, Any]] = {
+    'partita_iva': {
+        'label': 'Modello AA9/12 - Apertura Partita IVA',
+        'model': PartitaIvaRequest,
+        'generate_pdf': generate_aa912_pdf,
+        'filename_prefix': 'aa912',
+    },
+    'autocertificazione': {
+        'label': 'Autocertificazione di Residenza',
+        'model': AutocertificazioneRequest,
+        'generate_pdf': generate_autocertificazione_pdf,
+        'filename_prefix': 'autocertificazione',
+    },
+    'stato_civile': {
+        'label': 'Autocertificazione di Stato Civile',
+        'model': AutocertificazioneStatoCivileRequest,
+        'generate_pdf': generate_autocertificazione_stato_civile_pdf,
+        'filename_prefix': 'autocertificazione_stato_civile',
+    },
+}
+
+def build_document_data(documento: str, bundle: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map the shared bundle data onto the request model of a single document.
+    Raises pydantic.ValidationError if the data is incomplete for that document.
+    """
+    data = dict(bundle)
+    indirizzo_completo = f"{bundle.get('indirizzo', '')}, {bundle.get('civico', '')}"
+    data['comuneResidenza'] = bundle.get('comune')
+    data['indirizzoResidenza'] = indirizzo_completo
+
+    model = BUNDLE_DOCUMENTS[documento]['model']
+    return model(**data).model_dump()
+
+def _render_pdf(documento: str, data: Dict[str, Any], output_path: str) -> Optional[str]:
+    generate_pdf: Callable[[Dict[str, Any], str], Optional[str]] = BUNDLE_DOCUMENTS[documento]['generate_pdf']
+    return generate_pdf(data, output_path)
+
+def bundle_pdf_paths(documents: Dict[str, Dict[str, Any]], output_dir: str, file_id: str) -> List[str]:
+    """
+    Paths of the single PDFs of a bundle, in the requested order
+    """
+    return [
+        os.path.join(output_dir, f"{BUNDLE_DOCUMENTS[documento]['filename_prefix']}_{file_id}.pdf")
+        for documento in documents
+    ]
+
+async def render_bundle_pdfs(documents: Dict[str, Dict[str, Any]], output_dir: str, file_id: str) -> Tuple[List[str], str]:
+    """
+    Render all the bundle PDFs in parallel (wkhtmltopdf runs in worker threads).
+    Returns the generated paths in the requested order and the template versions used, joined by '+'.
+    Raises RuntimeError once every render has finished, if any of them failed.
+    """
+    await makedirs(output_dir)
+    paths = bundle_pdf_paths(documents, output_dir, file_id)
+
+    # return_exceptions: in caso di errore si aspettano comunque tutti i PDF, così chi
+    # chiama può cancellare quelli già scritti senza che altri arrivino dopo
+    results = await asyncio.gather(*(
+        run_in_threadpool(profiled_call, _render_pdf, documento, data, path)
+        for (documento, data), path in zip(documents.items(), paths)
+    ), return_exceptions=True)
+
+    failed = [
+        documento for documento, result in zip(documents, results)
+        if not result or isinstance(result, Exception)
+    ]
+    if failed:
+        raise RuntimeError(f"Generazione PDF fallita per: {', '.join(failed)}")
+
+    return paths, '+'.join(results)
+
+def merge_pdfs(paths: List[str], output_path: str) -> bool:
+    """
+    Merge several PDFs into a single file, in the given order
+    """
+    try:
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path)
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+        writer.close()
+        postprocess_pdf(output_path)
+
+        print(f"✅ PDF unito: {output_path} ({os.path.getsize(output_path)} bytes)")
+        return True
+    except Exception as e:
+        print(f"❌ Errore nell'unione dei PDF: {e}")
+        return False
+
+def zip_pdfs(paths: List[str], output_path: str) -> bool:
+    """
+    Pack several PDFs into a single ZIP archive
+    """
+    try:
+        # I PDF sono già compressi: ZIP_STORED evita lavoro inutile
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+            for path in paths:
+                zf.write(path, arcname=os.path.basename(path))
+
+        print(f"✅ ZIP creato: {output_path} ({os.path.getsize(output_path)} bytes)")
+        return True
+    except Exception as e:
+        print(f"❌ Errore nella creazione dello ZIP: {e}")
+        return False
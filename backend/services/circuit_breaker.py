@@ -0,0 +1,111 @@
+"""
+Circuit breaker for the LLM provider: after too many failed or slow calls it opens and the guides
+are served from the fallback immediately, then it lets a single probe call through to detect recovery
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+import config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+class CircuitOpenError(Exception):
+    """The call was skipped because the circuit is open"""
+
+class CircuitBreaker:
+    """Failure-rate breaker over a sliding time window; slow calls count as failures"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float,
+        min_calls: int,
+        window_seconds: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._calls: Deque[Tuple[float, bool]] = deque()  # (istante, fallita)
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError if the call must be skipped; in half-open only one probe passes.
+        Returns True for the probe, which must end with record() or release_probe().
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                print(f"🟡 Circuito {self.name} semi-aperto: chiamata di prova")
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            raise CircuitOpenError(f"servizio {self.name} temporaneamente non raggiungibile")
+
+    def record(self, seconds: float, failed: bool) -> None:
+        """
+        Record the outcome of a call made after before_call(); failed means the service failed
+        (timeout, unavailable), not that it rejected the request
+        """
+        failed = failed or seconds > self.slow_call_seconds
+        now = time.monotonic()
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._open(now, "chiamata di prova fallita")
+                else:
+                    self.state = CLOSED
+                    self._calls.clear()
+                    print(f"🟢 Circuito {self.name} chiuso: servizio di nuovo disponibile")
+                return
+
+            self._calls.append((now, failed))
+            while self._calls and now - self._calls[0][0] > self.window_seconds:
+                self._calls.popleft()
+            failures = sum(1 for _, f in self._calls if f)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls and failures / len(self._calls) >= self.failure_rate:
+                self._open(now, f"{failures}/{len(self._calls)} chiamate fallite o lente")
+
+    def release_probe(self) -> None:
+        """
+        Give back the half-open probe when the call failed before reaching the service
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        print(f"🔴 Circuito {self.name} aperto per {self.open_seconds:.0f} s: {reason}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "calls": len(self._calls),
+                "failures": sum(1 for _, f in self._calls if f),
+            }
+
+llm_breaker = CircuitBreaker(
+    "llm",
+    failure_rate=config.LLM_BREAKER_FAILURE_RATE,
+    min_calls=config.LLM_BREAKER_MIN_CALLS,
+    window_seconds=config.LLM_BREAKER_WINDOW,
+    slow_call_seconds=config.LLM_SLOW_CALL_SECONDS,
+    open_seconds=config.LLM_BREAKER_OPEN_SECONDS,
+)
@@ -0,0 +1,143 @@
+"""
+Codice fiscale validation: structure, check character and Belfiore municipality lookup
+"""
+
+import os
+import re
+import unicodedata
+from datetime import date
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Tuple
+
+import config
+
+BELFIORE_PATH = os.path.join(config.DATA_DIR, "belfiore.tsv")
+
+# Cifre sostituibili in caso di omocodia (posizioni 7-8, 10-11, 13-15)
+_OMOCODIA = str.maketrans('LMNPQRSTUV', '0123456789')
+_OMOCODIA_POSITIONS = (6, 7, 9, 10, 12, 13, 14)
+
+_CF_PATTERN = re.compile(
+    r'^[A-Z]{6}[0-9LMNPQRSTUV]{2}[ABCDEHLMPRST][0-9LMNPQRSTUV]{2}[A-Z][0-9LMNPQRSTUV]{3}[A-Z]$'
+)
+
+_MONTHS = 'ABCDEHLMPRST'
+
+# Valori dei caratteri in posizione dispari (1-based) per il carattere di controllo
+_ODD_VALUES = dict(zip(
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ',
+    (1, 0, 5, 7, 9, 13, 15, 17, 19, 21,
+     1, 0, 5, 7, 9, 13, 15, 17, 19, 21, 2, 4, 18, 20, 11, 3, 6, 8, 12, 14, 16, 10, 22, 25, 24, 23)
+))
+_EVEN_VALUES = {
+    **{str(d): d for d in range(10)},
+    **{chr(ord('A') + i): i for i in range(26)},
+}
+
+def compute_check_character(first15: str) -> str:
+    """
+    Compute the check character (16th) of a codice fiscale
+    """
+    total = 0
+    for i, char in enumerate(first15):
+        total += _ODD_VALUES[char] if i % 2 == 0 else _EVEN_VALUES[char]
+    return chr(ord('A') + total % 26)
+
+def _normalize_place(name: str) -> str:
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+@lru_cache(maxsize=1)
+def _belfiore_index() -> Tuple[Dict[str, str], Dict[str, FrozenSet[Tuple[str, str]]]]:
+    """
+    Load the embedded Belfiore table once: code -> name and normalized name -> {(code, provincia)}
+    """
+    by_code: Dict[str, str] = {}
+    by_name: Dict[str, set] = {}
+    with open(BELFIORE_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            code, provincia, name = line.rstrip('\n').split('\t')
+            by_code.setdefault(code, name)
+            by_name.setdefault(_normalize_place(name), set()).add((code, provincia))
+    return by_code, {name: frozenset(codes) for name, codes in by_name.items()}
+
+def load_belfiore_index() -> int:
+    """
+    Preload the Belfiore index, returning the number of codes
+    """
+    return len(_belfiore_index()[0])
+
+def lookup_belfiore(code: str) -> Optional[str]:
+    """
+    Return the municipality (or foreign country) name for a Belfiore code
+    """
+    return _belfiore_index()[0].get(code.upper())
+
+def codes_for_place(place: str) -> FrozenSet[str]:
+    """
+    Return the Belfiore codes matching a place name, e.g. "Roma" or "Roma (RM)"
+    """
+    provincia = None
+    match = re.match(r'^(.*?)\s*[\(,]\s*([A-Za-z]{2})\s*\)?\s*$', place)
+    if match:
+        place, provincia = match.group(1), match.group(2).upper()
+
+    entries = _belfiore_index()[1].get(_normalize_place(place), frozenset())
+    if provincia:
+        entries = frozenset(e for e in entries if e[1] == provincia) or entries
+    return frozenset(code for code, _ in entries)
+
+def decode_omocodia(cf: str) -> str:
+    """
+    Restore the original digits of a codice fiscale altered for omocodia
+    """
+    chars = list(cf)
+    for i in _OMOCODIA_POSITIONS:
+        chars[i] = chars[i].translate(_OMOCODIA)
+    return ''.join(chars)
+
+def validate_codice_fiscale(cf: str) -> str:
+    """
+    Validate structure, check character and municipality code of a codice fiscale.
+    Returns the normalized value or raises ValueError.
+    """
+    cf = cf.upper().strip()
+    if len(cf) != 16:
+        raise ValueError('Il codice fiscale deve essere di 16 caratteri')
+    if not _CF_PATTERN.match(cf):
+        raise ValueError('Il codice fiscale non ha un formato valido')
+    if compute_check_character(cf[:15]) != cf[15]:
+        raise ValueError('Il codice fiscale non è valido (carattere di controllo errato)')
+
+    decoded = decode_omocodia(cf)
+    day = int(decoded[9:11])
+    if not (1 <= day <= 31 or 41 <= day <= 71):
+        raise ValueError('Il codice fiscale contiene un giorno di nascita non valido')
+    if lookup_belfiore(decoded[11:15]) is None:
+        raise ValueError('Il codice fiscale contiene un codice catastale inesistente')
+    return cf
+
+def check_codice_fiscale_matches(cf: str, luogo_nascita: Optional[str], data_nascita: Optional[str]) -> None:
+    """
+    Cross-check an already validated codice fiscale against birth place and date.
+    Raises ValueError on mismatch; unknown places are not checked.
+    """
+    decoded = decode_omocodia(cf)
+
+    if data_nascita:
+        birth = date.fromisoformat(data_nascita)
+        day = int(decoded[9:11])
+        if (
+            int(decoded[6:8]) != birth.year % 100
+            or decoded[8] != _MONTHS[birth.month - 1]
+            or day not in (birth.day, birth.day + 40)
+        ):
+            raise ValueError('Il codice fiscale non corrisponde alla data di nascita indicata')
+
+    if luogo_nascita:
+        codes = codes_for_place(luogo_nascita)
+        if codes and decoded[11:15] not in codes:
+            raise ValueError('Il codice fiscale non corrisponde al luogo di nascita indicato')
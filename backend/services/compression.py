@@ -0,0 +1,110 @@
+"""
+Response compression for JSON and event streams: brotli when available, otherwise gzip
+"""
+
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli  # opzionale: senza il pacchetto si usa solo gzip
+except ImportError:
+    brotli = None
+
+# Solo contenuti testuali: PDF e ZIP sono già compressi e supportano Range
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+def _negotiate(accept_encoding: str) -> Optional[str]:
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(('q=0', 'q=0.0'))
+    }
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == 'br':
+            self._impl = brotli.Compressor(quality=5)
+            self.compress, self._flush, self._finish = self._impl.process, self._impl.flush, self._impl.finish
+        else:
+            self._impl = zlib.compressobj(6, zlib.DEFLATED, 31)
+            self.compress = self._impl.compress
+            self._flush = lambda: self._impl.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._impl.flush
+
+    def chunk(self, body: bytes, more_body: bool) -> bytes:
+        # Con lo streaming ogni chunk viene svuotato subito, così gli eventi SSE non restano nel buffer
+        data = self.compress(body)
+        return data + (self._flush() if more_body else self._finish())
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = _negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                data = compressor.chunk(body, more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                start_message = None
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            await send({"type": "http.response.body", "body": compressor.chunk(body, more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,74 @@
+"""
+Pre-signed download links: the token carries storage key, document type and expiry, signed with
+HMAC-SHA256, so any worker (or a CDN in front of them) validates it without the shared file registry
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import config
+from services.auth import load_secret
+
+class InvalidDownloadToken(Exception):
+    """The token is malformed or its signature doesn't match"""
+
+class ExpiredDownloadToken(InvalidDownloadToken):
+    """The token is authentic but past its expiry"""
+
+class DownloadClaims(NamedTuple):
+    storage_key: str
+    document_type: str
+    expires: int
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+@lru_cache(maxsize=1)
+def _secret() -> bytes:
+    return load_secret(config.DOWNLOAD_SECRET, '.download_secret')
+
+def _signature(payload: str) -> str:
+    return _b64encode(hmac.new(_secret(), payload.encode('ascii'), hashlib.sha256).digest())
+
+def sign_download(path: str, document_type: str, ttl: Optional[int] = None) -> str:
+    """
+    Token granting download of the generated file at path for ttl seconds (DOWNLOAD_TOKEN_TTL)
+    """
+    expires = int(time.time()) + (ttl if ttl is not None else config.DOWNLOAD_TOKEN_TTL)
+    claims = {"k": os.path.basename(path), "t": document_type, "e": expires}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{_signature(payload)}"
+
+def download_url(path: str, document_type: str) -> str:
+    """
+    Signed download URL of a generated file, on DOWNLOAD_BASE_URL when downloads go through a CDN
+    """
+    return f"{config.DOWNLOAD_BASE_URL}/api/files/{sign_download(path, document_type)}"
+
+def verify_download(token: str) -> DownloadClaims:
+    """
+    Check signature and expiry of a download token; raises InvalidDownloadToken or ExpiredDownloadToken
+    """
+    payload, _, signature = token.partition('.')
+    if not payload or not token.isascii() or not hmac.compare_digest(signature, _signature(payload)):
+        raise InvalidDownloadToken("firma non valida")
+    try:
+        claims = json.loads(_b64decode(payload))
+        result = DownloadClaims(str(claims["k"]), str(claims["t"]), int(claims["e"]))
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidDownloadToken(f"token malformato: {e}")
+    # Chiave firmata da noi, ma resta confinata in OUTPUT_DIR
+    if os.path.basename(result.storage_key) != result.storage_key or result.storage_key.startswith('.'):
+        raise InvalidDownloadToken("chiave di storage non valida")
+    if result.expires < time.time():
+        raise ExpiredDownloadToken("link scaduto")
+    return result
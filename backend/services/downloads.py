@@ -0,0 +1,129 @@
+"""
+Conditional and partial downloads of generated documents: content-hash ETags, 304 and Range requests
+"""
+
+import hashlib
+import os
+import re
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+import config
+from services.fileio import open_file, run_io
+from services.state import get_store
+from services.tracing import set_attributes
+
+# I documenti generati non cambiano mai: cache lunga, ma solo nel browser (dati personali)
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_SIZE = 64 * 1024
+
+def file_etag(file_path: str) -> str:
+    """
+    Strong ETag from the SHA-256 of the file content, computed once per file version
+    """
+    stat = os.stat(file_path)
+    key = f"etag:{os.path.basename(file_path)}"
+    version = [stat.st_size, stat.st_mtime_ns]
+
+    cached = get_store().get(key)
+    if cached and cached['version'] == version:
+        return cached['etag']
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    etag = f'"{digest.hexdigest()[:32]}"'
+    # Un file si scarica solo finché vale il suo link firmato: oltre, l'ETag non serve più
+    get_store().set(key, {'version': version, 'etag': etag}, ttl=config.DOWNLOAD_TOKEN_TTL)
+    return etag
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=start-end" range; None when it can't be satisfied
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffisso: gli ultimi N byte
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+def _file_info(file_path: str) -> Tuple[str, int]:
+    return file_etag(file_path), os.path.getsize(file_path)
+
+async def _read_range(file_path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    async with open_file(file_path, 'rb') as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+async def document_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    filename: str,
+    cache_control: str = CACHE_CONTROL,
+) -> Response:
+    """
+    Serve a generated document with ETag, Cache-Control, If-None-Match (304) and single Range (206) support;
+    stat, hashing and reads all run on the file I/O pool
+    """
+    etag, size = await run_io(_file_info, file_path)
+    set_attributes(
+        size=size,
+        not_modified=_etag_matches(request.headers.get("if-none-match"), etag),
+        range=request.headers.get("range"),
+    )
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        print(f"♻️  File non modificato (304): {filename}")
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers.update({
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+        })
+        return StreamingResponse(_read_range(file_path, start, end), status_code=206, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_read_range(file_path, 0, size - 1), media_type=media_type, headers=headers)
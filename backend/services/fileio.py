@@ -0,0 +1,42 @@
+"""
+Non-blocking file I/O for the async request handlers: filesystem calls run on a dedicated thread pool
+(aiofiles), so a slow disk or network filesystem stalls neither the event loop nor the threadpool
+that renders the PDFs
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+import aiofiles
+import aiofiles.os
+
+import config
+
+T = TypeVar("T")
+
+IO_EXECUTOR = ThreadPoolExecutor(max_workers=config.IO_THREADS, thread_name_prefix="file-io")
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking filesystem function on the I/O pool, keeping the request context (tenant, tracing)
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(IO_EXECUTOR, partial(context.run, func, *args, **kwargs))
+
+async def exists(path: str) -> bool:
+    return await aiofiles.os.path.exists(path, executor=IO_EXECUTOR)
+
+async def makedirs(path: str) -> None:
+    await aiofiles.os.makedirs(path, exist_ok=True, executor=IO_EXECUTOR)
+
+async def remove(path: str) -> None:
+    await aiofiles.os.remove(path, executor=IO_EXECUTOR)
+
+def open_file(path: str, mode: str = 'rb'):
+    """
+    aiofiles.open on the I/O pool, to use with "async with"
+    """
+    return aiofiles.open(path, mode, executor=IO_EXECUTOR)
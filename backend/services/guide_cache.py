@@ -0,0 +1,66 @@
+"""
+Incremental regeneration: the AI guide depends only on a subset of the form fields,
+so an edit to a cosmetic field (e.g. civico) re-renders the PDF and reuses the previous guide
+"""
+
+import hashlib
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+from services.state import get_store
+from services.tracing import span
+
+# Campi che identificano la persona: la guida non viene mai condivisa tra persone diverse
+IDENTITY_FIELDS: Dict[str, str] = {
+    'partita_iva': 'codiceFiscale',
+    'autocertificazione': 'codiceFiscale',
+    'autocertificazione_nascita': 'codiceFiscaleDichiarante',
+    'stato_civile': 'codiceFiscale',
+    'bundle': 'codiceFiscale',
+}
+
+# Campi da cui dipende il contenuto della guida. Tutti gli altri (indirizzo, civico, CAP,
+# contatti, grafia del nome) finiscono solo nel PDF e non richiedono una nuova guida
+GUIDE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'partita_iva': ('codiceAteco', 'descrizioneAttivita', 'regimeFiscale', 'dataInizio', 'comune', 'provincia'),
+    'autocertificazione': ('comuneResidenza', 'motivoRichiesta'),
+    'autocertificazione_nascita': ('dataNascita', 'luogoNascita', 'provinciaNascita', 'motivoRichiesta'),
+    'stato_civile': (
+        'statoCivile', 'dataMatrimonio', 'comuneMatrimonio', 'dataSeparazione', 'dataDivorzio',
+        'dataDecesso', 'tribunaleCompetente', 'comuneResidenza', 'motivoRichiesta',
+    ),
+    'bundle': (
+        'documenti', 'comune', 'provincia', 'codiceAteco', 'descrizioneAttivita', 'regimeFiscale',
+        'dataInizio', 'statoCivile', 'motivoRichiesta',
+    ),
+}
+
+def guide_key(documento: str, data: Dict[str, Any]) -> str:
+    """
+    Cache key of the guide: identity plus the guide-relevant inputs only
+    """
+    relevant = {field: data.get(field) for field in GUIDE_FIELDS[documento]}
+    relevant['_identity'] = (data.get(IDENTITY_FIELDS[documento]) or '').upper()
+    digest = hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f"guide:{documento}:{digest}"
+
+def cached_guide(documento: str, data: Dict[str, Any], generate: Callable[..., Optional[str]], *args: Any) -> Optional[str]:
+    """
+    Return the guide for these guide-relevant inputs, generating it only if they changed.
+    Fallback messages (guide not available) are never cached.
+    """
+    key = guide_key(documento, data)
+    store = get_store()
+
+    with span("guide", documento=documento) as current:
+        guide = store.get(key)
+        current.set_attribute("cache.hit", guide is not None)
+        if guide is not None:
+            print(f"♻️  Guida riutilizzata: i campi rilevanti per la guida non sono cambiati ({documento})")
+            return guide
+
+        guide = generate(data, *args)
+        if guide and not guide.startswith('⚠️'):
+            store.set(key, guide, ttl=config.GUIDE_CACHE_TTL)
+        return guide
@@ -0,0 +1,194 @@
+"""
+Server-side guide rendering: the Markdown completion becomes HTML split into the sections of the
+prompt structure (Riepilogo, Documenti, Procedura, ...), cached by content hash and served on demand
+"""
+
+import hashlib
+import html
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+import config
+from services.state import get_store
+from services.tracing import span
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_BOLD_HEADING_RE = re.compile(r'^\d+[.)]\s+\*\*(.+?)\*\*:?\s*$')
+_UL_RE = re.compile(r'^\s*[-*+]\s+(.*)$')
+_OL_RE = re.compile(r'^\s*\d+[.)]\s+(.*)$')
+_HR_RE = re.compile(r'^\s*([-*_])(\s*\1){2,}\s*$')
+_NUMBERING_RE = re.compile(r'^\d+[.)]\s*')
+
+_INLINE = [
+    (re.compile(r'`([^`]+)`'), r'<code>\1</code>'),
+    (re.compile(r'\*\*(.+?)\*\*'), r'<strong>\1</strong>'),
+    (re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])'), r'<em>\1</em>'),
+    (re.compile(r'\[([^\]]+)\]\((https?://[^\s)]+)\)'), r'<a href="\2" target="_blank" rel="noopener noreferrer">\1</a>'),
+]
+
+def _inline(text: str) -> str:
+    # Il testo arriva dal modello: si fa l'escape di tutto prima di aggiungere i tag
+    text = html.escape(text, quote=True)
+    for pattern, replacement in _INLINE:
+        text = pattern.sub(replacement, text)
+    return text
+
+def markdown_to_html(markdown: str) -> str:
+    """
+    Render the Markdown subset used by the guides (headings, lists, bold/italic, code, links, rules)
+    """
+    out: List[str] = []
+    paragraph: List[str] = []
+    list_tag: Optional[str] = None
+
+    def close_paragraph() -> None:
+        if paragraph:
+            out.append(f"<p>{'<br>'.join(_inline(line) for line in paragraph)}</p>")
+            paragraph.clear()
+
+    def close_list() -> None:
+        nonlocal list_tag
+        if list_tag:
+            out.append(f"</{list_tag}>")
+            list_tag = None
+
+    for line in markdown.splitlines():
+        if not line.strip():
+            close_paragraph()
+            close_list()
+            continue
+
+        heading = _HEADING_RE.match(line)
+        ul, ol = _UL_RE.match(line), _OL_RE.match(line)
+        if heading:
+            close_paragraph()
+            close_list()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif _HR_RE.match(line):
+            close_paragraph()
+            close_list()
+            out.append("<hr>")
+        elif ul or ol:
+            close_paragraph()
+            tag = 'ul' if ul else 'ol'
+            if list_tag != tag:
+                close_list()
+                out.append(f"<{tag}>")
+                list_tag = tag
+            out.append(f"<li>{_inline((ul or ol).group(1))}</li>")
+        elif line.lstrip().startswith('>'):
+            close_paragraph()
+            close_list()
+            out.append(f"<blockquote><p>{_inline(line.lstrip()[1:].strip())}</p></blockquote>")
+        elif list_tag and line.startswith((' ', '\t')):
+            # Continuazione della voce di elenco precedente
+            out[-1] = out[-1][:-len('</li>')] + f" {_inline(line.strip())}</li>"
+        else:
+            close_list()
+            paragraph.append(line.strip())
+
+    close_paragraph()
+    close_list()
+    return '\n'.join(out)
+
+def _slug(title: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')[:40] or 'sezione'
+
+def _clean_title(title: str) -> str:
+    return _NUMBERING_RE.sub('', title.replace('**', '').strip()).rstrip(':').strip()
+
+def split_sections(markdown: str) -> List[Tuple[str, str]]:
+    """
+    Split the guide into (title, markdown) sections at its top-level headings.
+    A single title heading is skipped; numbered bold lines are used when there are no headings.
+    """
+    lines = markdown.splitlines()
+    levels = [len(m.group(1)) for m in map(_HEADING_RE.match, lines) if m]
+    split_level = None
+    for level in sorted(set(levels)):
+        if levels.count(level) > 1:
+            split_level = level
+            break
+
+    def heading_title(line: str) -> Optional[str]:
+        if split_level is not None:
+            match = _HEADING_RE.match(line)
+            return match.group(2) if match and len(match.group(1)) == split_level else None
+        match = _BOLD_HEADING_RE.match(line)
+        return match.group(1) if match else None
+
+    sections: List[Tuple[str, List[str]]] = [("Introduzione", [])]
+    for line in lines:
+        title = heading_title(line)
+        heading = _HEADING_RE.match(line)
+        if title is not None:
+            sections.append((_clean_title(title), []))
+        elif len(sections) == 1 and heading and split_level and len(heading.group(1)) < split_level:
+            continue  # titolo della guida sopra le sezioni
+        else:
+            sections[-1][1].append(line)
+
+    intro = sections[0][1]
+    if len(sections) == 1:
+        return [("Guida", '\n'.join(intro).strip())]
+    if not '\n'.join(intro).strip():
+        sections.pop(0)
+    return [(title, '\n'.join(body).strip()) for title, body in sections]
+
+def guide_id(guide: str) -> str:
+    return hashlib.sha256(guide.encode('utf-8')).hexdigest()[:32]
+
+def render_guide(guide: str) -> Dict[str, Any]:
+    """
+    Rendered sections of a guide, cached by content hash: {"id", "sections": [{"id", "title", "html"}]}
+    """
+    gid = guide_id(guide)
+    key = f"guide_sections:{gid}"
+    store = get_store()
+    rendered = store.get(key)
+    if rendered is not None:
+        return rendered
+
+    with span("guide.render", chars=len(guide)) as current:
+        sections = []
+        for i, (title, body) in enumerate(split_sections(guide), start=1):
+            sections.append({"id": f"{i}-{_slug(title)}", "title": title, "html": markdown_to_html(body)})
+        current.set_attribute("sections", len(sections))
+    # La scadenza serve a limitare la cache HTTP delle sezioni alla vita della voce nello store
+    rendered = {"id": gid, "sections": sections, "expires": int(time.time()) + config.GUIDE_CACHE_TTL}
+    store.set(key, rendered, ttl=config.GUIDE_CACHE_TTL)
+    return rendered
+
+def get_rendered_guide(gid: str) -> Optional[Dict[str, Any]]:
+    return get_store().get(f"guide_sections:{gid}")
+
+def outline(rendered: Dict[str, Any], inline_first: bool = False) -> List[Dict[str, Any]]:
+    """
+    Section list without the HTML (only the first one, when inline_first)
+    """
+    entries = []
+    for i, section in enumerate(rendered["sections"]):
+        entry = {"id": section["id"], "title": section["title"], "size": len(section["html"])}
+        if inline_first and i == 0:
+            entry["html"] = section["html"]
+        entries.append(entry)
+    return entries
+
+async def attach_guide_sections(result: Dict[str, Any], sections_only: bool) -> Dict[str, Any]:
+    """
+    Add guidaId and the section outline to a generation response.
+    With sections_only the full Markdown is dropped and only the first section is sent inline.
+    """
+    guide = result.get("guida")
+    if not guide:
+        return result
+    # Store condiviso (SQLite/Redis) e rendering Markdown sono bloccanti: fuori dall'event loop
+    rendered = await run_in_threadpool(render_guide, guide)
+    response = {**result, "guidaId": rendered["id"], "sezioni": outline(rendered, inline_first=sections_only)}
+    if sections_only:
+        response.pop("guida")
+    return response
@@ -0,0 +1,89 @@
+"""
+Liveness and readiness probes: PDF renderer, LLM provider, disk space and worker load
+"""
+
+import os
+import shutil
+from typing import Any, Dict
+
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import Request
+
+import config
+from services.circuit_breaker import llm_breaker
+from services.fileio import run_io
+from services.pdf_sandbox import wkhtmltopdf_binary
+from services.scheduler import ADMISSION, SCHEDULERS
+from services.startup import STARTUP
+
+# Richieste /api in corso in questo worker
+_in_flight = 0
+
+async def track_in_flight_middleware(request: Request, call_next):
+    """
+    Count the /api requests currently being served by this worker
+    """
+    global _in_flight
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    _in_flight += 1
+    try:
+        return await call_next(request)
+    finally:
+        _in_flight -= 1
+
+def check_pdf_renderer() -> Dict[str, Any]:
+    binary = wkhtmltopdf_binary()
+    return {"ok": binary is not None, "detail": binary or "wkhtmltopdf non trovato"}
+
+def check_llm() -> Dict[str, Any]:
+    # Solo la configurazione: una chiamata reale per ogni probe costerebbe token e latenza
+    if not os.getenv("OPENAI_API_KEY"):
+        return {"ok": False, "detail": "OPENAI_API_KEY mancante"}
+    # Circuito aperto = guide in modalità degradata: il worker resta pronto per i PDF
+    circuit = llm_breaker.stats()
+    return {"ok": True, "detail": f"API key configurata, circuito {circuit['state']}", "circuit": circuit}
+
+def check_disk() -> Dict[str, Any]:
+    os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+    free_mb = shutil.disk_usage(config.OUTPUT_DIR).free // (1024 * 1024)
+    return {"ok": free_mb >= config.HEALTH_MIN_FREE_MB, "detail": f"{free_mb} MB liberi", "free_mb": free_mb}
+
+def check_load() -> Dict[str, Any]:
+    # Profondità di coda: generazioni in attesa di ammissione, job in attesa di uno slot pdf/llm
+    # (dove si accumula il carico) e job in attesa di un thread del pool
+    queue_depth = (
+        ADMISSION.stats()["waiting"]
+        + sum(scheduler.stats()["waiting"] for scheduler in SCHEDULERS.values())
+        + current_default_thread_limiter().statistics().tasks_waiting
+    )
+    ok = _in_flight <= config.MAX_IN_FLIGHT and queue_depth <= config.MAX_QUEUE_DEPTH
+    return {
+        "ok": ok,
+        "detail": f"{_in_flight} richieste in corso, {queue_depth} in coda",
+        "in_flight": _in_flight,
+        "queue_depth": queue_depth,
+    }
+
+READINESS_CHECKS = {
+    "startup": lambda: {"ok": STARTUP['ready'], "detail": f"avvio in {STARTUP['seconds']} s" if STARTUP['ready'] else "warm-up in corso"},
+    "pdf": check_pdf_renderer,
+    "llm": check_llm,
+    "disk": check_disk,
+    "load": check_load,
+}
+
+# Controlli che toccano il filesystem: girano sul pool di I/O, non sull'event loop
+_BLOCKING_CHECKS = {"pdf", "disk"}
+
+async def readiness() -> Dict[str, Any]:
+    """
+    Run every readiness check; the worker is ready only if all of them pass
+    """
+    checks = {}
+    for name, check in READINESS_CHECKS.items():
+        try:
+            checks[name] = await run_io(check) if name in _BLOCKING_CHECKS else check()
+        except Exception as e:
+            checks[name] = {"ok": False, "detail": str(e)}
+    return {"ready": all(c["ok"] for c in checks.values()), "checks": checks}
@@ -0,0 +1,119 @@
+"""
+Idempotent generation: Idempotency-Key replay and single-flight coalescing of identical requests
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+import config
+from services.state import get_store
+from services.tenants import current_tenant
+from services.tracing import set_attributes, span
+
+# Richieste identiche in corso in questo worker: fingerprint -> future del risultato
+_in_flight: Dict[str, asyncio.Future] = {}
+
+# Attesa massima del risultato di una richiesta con la stessa chiave in corso su un altro worker
+_PENDING_WAIT_SECONDS = 120
+_PENDING_POLL_SECONDS = 0.5
+
+def request_fingerprint(scope: str, payload: Dict[str, Any]) -> str:
+    """
+    Stable hash of an endpoint and its validated payload
+    """
+    body = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f"{scope}\n{body}".encode('utf-8')).hexdigest()
+
+async def _single_flight(fingerprint: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Run compute once for concurrent identical requests: the duplicates await the same result
+    """
+    pending = _in_flight.get(fingerprint)
+    if pending is not None:
+        print(f"🔁 Richiesta identica già in corso, attendo il risultato ({fingerprint[:12]})")
+        set_attributes(coalesced=True)
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[fingerprint] = future
+    try:
+        result = await compute()
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        # Evita il warning "exception never retrieved" quando non ci sono duplicati in attesa
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(fingerprint, None)
+
+async def run_idempotent(
+    scope: str,
+    idempotency_key: Optional[str],
+    payload: Dict[str, Any],
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Run a generation at most once per Idempotency-Key (result replayed from the shared store)
+    and at most once at a time for identical payloads
+    """
+    # Per tenant: due tenant con gli stessi dati non condividono né il risultato né il file
+    fingerprint = request_fingerprint(f"{current_tenant()[0].name}:{scope}", payload)
+    with span(
+        "generation",
+        documento=scope,
+        payload_fields=sum(1 for v in payload.values() if v not in (None, '')),
+        idempotency_key=bool(idempotency_key),
+    ):
+        return await _run_idempotent(scope, idempotency_key, payload, fingerprint, compute)
+
+async def _run_idempotent(
+    scope: str,
+    idempotency_key: Optional[str],
+    payload: Dict[str, Any],
+    fingerprint: str,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    if not idempotency_key:
+        return await _single_flight(fingerprint, compute)
+
+    # Le chiamate allo store (SQLite/Redis) sono bloccanti: girano nel threadpool
+    store = get_store()
+    # La chiave è scelta dal client: due tenant possono usare la stessa
+    key = f"idempotency:{current_tenant()[0].name}:{scope}:{idempotency_key}"
+
+    # Prenota la chiave: incr == 1 solo per la prima richiesta, su qualunque worker
+    if await run_in_threadpool(store.incr, f"{key}:lock", ttl=_PENDING_WAIT_SECONDS) > 1:
+        deadline = time.monotonic() + _PENDING_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            saved = await run_in_threadpool(store.get, key)
+            if saved is not None:
+                if saved['fingerprint'] != fingerprint:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key già usata per una richiesta con dati diversi"
+                    )
+                print(f"🔁 Risposta riutilizzata per Idempotency-Key {idempotency_key}")
+                set_attributes(idempotency_replayed=True)
+                return saved['response']
+            if await run_in_threadpool(store.get, f"{key}:lock") is None:
+                # La prima richiesta è fallita: la chiave è di nuovo libera
+                return await _run_idempotent(scope, idempotency_key, payload, fingerprint, compute)
+            await asyncio.sleep(_PENDING_POLL_SECONDS)
+        raise HTTPException(status_code=409, detail="Richiesta con la stessa Idempotency-Key ancora in corso")
+
+    try:
+        response = await _single_flight(fingerprint, compute)
+    except BaseException:
+        await run_in_threadpool(store.delete, f"{key}:lock")
+        raise
+
+    await run_in_threadpool(store.set, key, {'fingerprint': fingerprint, 'response': response}, ttl=config.IDEMPOTENCY_TTL)
+    return response
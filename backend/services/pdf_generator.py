@@ -1,29 +1,188 @@
 import os
-from jinja2 import Template
-import pdfkit
-from typing import Dict, Any
-from datetime import datetime
+import shutil
+import subprocess
+from typing import Dict, Any, Optional
+from datetime import date, datetime
 
-def generate_aa912_pdf(data: Dict[str, Any], output_path: str) -> bool:
+import config
+from services.pdf_sandbox import render_html
+from services.scheduler import stage_slot
+from services.templates import TemplateVersion, template_store
+from services.tenants import record_usage
+from services.tracing import span
+
+# Configure PDF options
+PDF_OPTIONS = {
+    'page-size': 'A4',
+    'margin-top': '0.75in',
+    'margin-right': '0.75in',
+    'margin-bottom': '0.75in',
+    'margin-left': '0.75in',
+    'encoding': "UTF-8",
+    'no-outline': None,
+    # I template non usano risorse locali: nessun accesso al filesystem dall'HTML
+    'disable-local-file-access': None,
+    'disable-javascript': None,
+}
+
+# Template HTML dei documenti generati, precompilati all'avvio
+TEMPLATE_NAMES = (
+    "aa912_template.html",
+    "autocertificazione_template.html",
+    "autocertificazione_nascita_template.html",
+    "autocertificazione_stato_civile_template.html",
+)
+
+def html_to_pdf(html_content: str, output_path: str) -> None:
+    """
+    Convert an HTML document to PDF with wkhtmltopdf, in a sandboxed process with resource limits
+    """
+    with span("pdf.wkhtmltopdf", html_bytes=len(html_content)):
+        render_html(html_content, output_path, PDF_OPTIONS)
+
+def _replace_if_smaller(tmp_path: str, output_path: str) -> None:
+    if os.path.exists(tmp_path) and 0 < os.path.getsize(tmp_path) < os.path.getsize(output_path):
+        os.replace(tmp_path, output_path)
+    elif os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+def _ghostscript_pass(output_path: str) -> None:
+    # Riscrive il PDF con font ridotti ai soli glifi usati e compressi
+    gs = shutil.which(config.GHOSTSCRIPT_PATH)
+    if not gs:
+        print(f"⚠️  Ghostscript non trovato ({config.GHOSTSCRIPT_PATH}), passaggio saltato")
+        return
+    tmp_path = output_path + '.gs.tmp'
+    subprocess.run(
+        [gs, '-sDEVICE=pdfwrite', '-dCompatibilityLevel=1.5', '-dSubsetFonts=true', '-dCompressFonts=true',
+         '-dDetectDuplicateImages=true', '-dNOPAUSE', '-dBATCH', '-dQUIET', f'-sOutputFile={tmp_path}', output_path],
+        check=True, timeout=60
+    )
+    _replace_if_smaller(tmp_path, output_path)
+
+def _compress_and_linearize(output_path: str) -> None:
+    try:
+        import pikepdf  # opzionale: linearizzazione e object stream
+    except ImportError:
+        pikepdf = None
+
+    if pikepdf is None:
+        # Senza pikepdf: solo compressione dei content stream con pypdf, niente linearizzazione
+        from pypdf import PdfReader, PdfWriter
+        writer = PdfWriter(clone_from=PdfReader(output_path))
+        for page in writer.pages:
+            page.compress_content_streams()
+        tmp_path = output_path + '.pypdf.tmp'
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        _replace_if_smaller(tmp_path, output_path)
+        return
+
+    tmp_path = output_path + '.qpdf.tmp'
+    with pikepdf.open(output_path) as pdf:
+        pdf.remove_unreferenced_resources()
+        pdf.save(
+            tmp_path,
+            linearize=True,
+            compress_streams=True,
+            recompress_flate=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+        )
+    # Il file linearizzato sostituisce sempre l'originale: la vista web veloce vale qualche byte in più
+    os.replace(tmp_path, output_path)
+
+def postprocess_pdf(output_path: str) -> None:
+    """
+    Optional post-processing of a generated PDF: Ghostscript font subsetting,
+    stream compression and linearization for fast web view.
+    Any failure keeps the original file.
+    """
+    if not config.PDF_POSTPROCESS:
+        return
+    size_before = os.path.getsize(output_path)
+    with span("pdf.postprocess", size_before=size_before, ghostscript=config.PDF_GHOSTSCRIPT) as current:
+        try:
+            if config.PDF_GHOSTSCRIPT:
+                _ghostscript_pass(output_path)
+            _compress_and_linearize(output_path)
+        except Exception as e:
+            print(f"⚠️  Post-processing PDF non riuscito, uso il file originale: {e}")
+            return
+        size_after = os.path.getsize(output_path)
+        current.set_attribute("size_after", size_after)
+    print(f"🗜️  Post-processing PDF: {size_before} -> {size_after} bytes ({(size_after - size_before) * 100 / size_before:+.0f}%)")
+
+def load_template(template_name: str) -> Optional[TemplateVersion]:
+    """
+    Current version of a template: source and compiled template (precompiled Python render function when
+    the template allows it, Jinja otherwise), compiled once and hot-swapped by the template store
+    """
+    return template_store.get(template_name)
+
+def render_pdf_from_template(template_name: str, template_data: Dict[str, Any], output_path: str, label: str) -> Optional[str]:
+    """
+    Render an HTML template from TEMPLATE_DIR with the prepared template data and convert it to PDF,
+    in the current tenant's fair share of the PDF slots. Returns the template version used, None on failure
+    """
+    with stage_slot('pdf'):
+        rendered = _render_pdf_from_template(template_name, template_data, output_path, label)
+    if rendered:
+        record_usage(documents=1)
+    return rendered
+
+def _render_pdf_from_template(template_name: str, template_data: Dict[str, Any], output_path: str, label: str) -> Optional[str]:
+    # Versione corrente del template: resta la stessa per tutto il documento anche se nel frattempo cambia
+    loaded = load_template(template_name)
+    if loaded is None:
+        return None
+    template_content, template = loaded.source, loaded.template
+
+    print(f"📄 Template {template_name} versione {loaded.version}")
+
+    # Ensure output directory exists
+    output_dir = os.path.dirname(output_path)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📁 Directory output: {output_dir}")
+
+    if config.PDF_RENDER_MODE == 'overlay':
+        from services.pdf_overlay import render_overlay_pdf
+        with span("pdf.overlay", template=template_name) as current:
+            overlay_ok = render_overlay_pdf(template_name, template_content, template_data, output_path)
+            current.set_attribute("overlay.applied", overlay_ok)
+        if overlay_ok:
+            postprocess_pdf(output_path)
+            print(f"✅ {label} generato (overlay): {output_path} ({os.path.getsize(output_path)} bytes)")
+            return loaded.version
+        print("↩️  Overlay non applicabile, uso il rendering HTML completo")
+
+    # Render template
+    with span("template.render", template=template_name, version=loaded.version, fast_path=not hasattr(template, 'environment')):
+        html_content = template.render(**template_data)
+
+    print("✅ Template renderizzato")
+
+    print("🔧 Generazione PDF in corso...")
+
+    # Generate PDF
+    html_to_pdf(html_content, output_path)
+
+    # Verify file was created
+    if os.path.exists(output_path):
+        postprocess_pdf(output_path)
+        file_size = os.path.getsize(output_path)
+        print(f"✅ {label} generato: {output_path} ({file_size} bytes)")
+        return loaded.version
+    else:
+        print(f"❌ PDF non creato: {output_path}")
+        return None
+
+def generate_aa912_pdf(data: Dict[str, Any], output_path: str) -> Optional[str]:
     """
     Generate AA9/12 PDF from HTML template with user data
     """
     try:
         print(f"🔧 Inizio generazione PDF: {output_path}")
-        
-        # Load HTML template
-        template_path = os.path.join("data", "aa912_template.html")
-        print(f"📄 Caricamento template: {template_path}")
-        
-        if not os.path.exists(template_path):
-            print(f"❌ Template non trovato: {template_path}")
-            return False
-            
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        print("✅ Template caricato")
-        
+
         # Prepare template data
         template_data = {
             **data,
@@ -32,47 +191,12 @@ def generate_aa912_pdf(data: Dict[str, Any], output_path: str) -> bool:
             'regime_ordinario_checked': 'checked' if data.get('regimeFiscale') == 'ordinario' else '',
             'data_inizio_formatted': format_date(data.get('dataInizio', '')),
         }
-        
-        # Render template
-        template = Template(template_content)
-        html_content = template.render(**template_data)
-        
-        print("✅ Template renderizzato")
-        
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"📁 Directory output: {output_dir}")
-        
-        # Configure PDF options
-        options = {
-            'page-size': 'A4',
-            'margin-top': '0.75in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None
-        }
-        
-        print("🔧 Generazione PDF in corso...")
-        
-        # Generate PDF
-        pdfkit.from_string(html_content, output_path, options=options)
-        
-        # Verify file was created
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"✅ PDF generato: {output_path} ({file_size} bytes)")
-            return True
-        else:
-            print(f"❌ PDF non creato: {output_path}")
-            return False
-        
+
+        return render_pdf_from_template("aa912_template.html", template_data, output_path, "PDF")
+
     except Exception as e:
         print(f"❌ Errore nella generazione PDF: {e}")
-        return False
+        return None
 
 def format_date(date_string: str) -> str:
     """
@@ -80,32 +204,19 @@ def format_date(date_string: str) -> str:
     """
     try:
         if date_string:
-            date_obj = datetime.strptime(date_string, '%Y-%m-%d')
+            date_obj = date.fromisoformat(date_string)
             return date_obj.strftime('%d/%m/%Y')
     except ValueError:
         pass
     return ''
 
-def generate_autocertificazione_pdf(data: Dict[str, Any], output_path: str) -> bool:
+def generate_autocertificazione_pdf(data: Dict[str, Any], output_path: str) -> Optional[str]:
     """
     Generate Autocertificazione di Residenza PDF from HTML template with user data
     """
     try:
         print(f"🔧 Inizio generazione PDF Autocertificazione: {output_path}")
-        
-        # Load HTML template
-        template_path = os.path.join("data", "autocertificazione_template.html")
-        print(f"📄 Caricamento template: {template_path}")
-        
-        if not os.path.exists(template_path):
-            print(f"❌ Template non trovato: {template_path}")
-            return False
-            
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        print("✅ Template caricato")
-        
+
         # Prepare template data
         template_data = {
             **data,
@@ -113,68 +224,20 @@ def generate_autocertificazione_pdf(data: Dict[str, Any], output_path: str) -> b
             'data_nascita_formatted': format_date(data.get('dataNascita', '')),
             'motivo_richiesta': data.get('motivoRichiesta', 'Uso generico')
         }
-        
-        # Render template
-        template = Template(template_content)
-        html_content = template.render(**template_data)
-        
-        print("✅ Template renderizzato")
-        
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"📁 Directory output: {output_dir}")
-        
-        # Configure PDF options
-        options = {
-            'page-size': 'A4',
-            'margin-top': '0.75in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None
-        }
-        
-        print("🔧 Generazione PDF in corso...")
-        
-        # Generate PDF
-        pdfkit.from_string(html_content, output_path, options=options)
-        
-        # Verify file was created
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"✅ PDF Autocertificazione generato: {output_path} ({file_size} bytes)")
-            return True
-        else:
-            print(f"❌ PDF non creato: {output_path}")
-            return False
-        
+
+        return render_pdf_from_template("autocertificazione_template.html", template_data, output_path, "PDF Autocertificazione")
+
     except Exception as e:
         print(f"❌ Errore nella generazione PDF Autocertificazione: {e}")
-        return False
+        return None
 
-def generate_autocertificazione_nascita_pdf(data: Dict[str, Any], output_path: str) -> bool:
+def generate_autocertificazione_nascita_pdf(data: Dict[str, Any], output_path: str) -> Optional[str]:
     """
     Generate Autocertificazione di Nascita PDF from HTML template with user data
     """
     try:
         print(f"🔧 Inizio generazione PDF Autocertificazione Nascita: {output_path}")
-        
-        # Load HTML template
-        template_path = os.path.join("data", "autocertificazione_nascita_template.html")
-        print(f"📄 Caricamento template: {template_path}")
-        
-        if not os.path.exists(template_path):
-            print(f"❌ Template non trovato: {template_path}")
-            return False
-            
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        print("✅ Template caricato")
-        
+
         # Prepare template data
         template_data = {
             **data,
@@ -183,134 +246,51 @@ def generate_autocertificazione_nascita_pdf(data: Dict[str, Any], output_path: s
             'motivo_richiesta': data.get('motivoRichiesta', 'Uso generico'),
             'ospedale': data.get('ospedale', 'Non specificato')
         }
-        
-        # Render template
-        template = Template(template_content)
-        html_content = template.render(**template_data)
-        
-        print("✅ Template renderizzato")
-        
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"📁 Directory output: {output_dir}")
-        
-        # Configure PDF options
-        options = {
-            'page-size': 'A4',
-            'margin-top': '0.75in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None
-        }
-        
-        print("🔧 Generazione PDF in corso...")
-        
-        # Generate PDF
-        pdfkit.from_string(html_content, output_path, options=options)
-        
-        # Verify file was created
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"✅ PDF Autocertificazione Nascita generato: {output_path} ({file_size} bytes)")
-            return True
-        else:
-            print(f"❌ PDF non creato: {output_path}")
-            return False
-        
+
+        return render_pdf_from_template("autocertificazione_nascita_template.html", template_data, output_path, "PDF Autocertificazione Nascita")
+
     except Exception as e:
         print(f"❌ Errore nella generazione PDF Autocertificazione Nascita: {e}")
-        return False
+        return None
 
-def generate_autocertificazione_stato_civile_pdf(data: Dict[str, Any], output_path: str) -> bool:
+def generate_autocertificazione_stato_civile_pdf(data: Dict[str, Any], output_path: str) -> Optional[str]:
     """
     Generate Autocertificazione di Stato Civile PDF from HTML template with user data
     """
     try:
         print(f"🔧 Inizio generazione PDF Autocertificazione Stato Civile: {output_path}")
-        
-        # Load HTML template
-        template_path = os.path.join("data", "autocertificazione_stato_civile_template.html")
-        print(f"📄 Caricamento template: {template_path}")
-        
-        if not os.path.exists(template_path):
-            print(f"❌ Template non trovato: {template_path}")
-            return False
-            
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template_content = f.read()
-        
-        print("✅ Template caricato")
-        
+
         # Prepare template data with stato civile specific fields
         stato_civile = data.get('statoCivile', '')
-        
+
         template_data = {
             **data,
             'data_compilazione': datetime.now().strftime('%d/%m/%Y'),
             'dataNascita_formatted': format_date(data.get('dataNascita', '')),
             'motivo_richiesta': data.get('motivoRichiesta', 'Uso generico'),
-            
+
             # Checkbox flags for stato civile
             'celibe_nubile_checked': 'checked' if stato_civile == 'celibe_nubile' else '',
             'coniugato_checked': 'checked' if stato_civile == 'coniugato' else '',
             'separato_checked': 'checked' if stato_civile == 'separato' else '',
             'divorziato_checked': 'checked' if stato_civile == 'divorziato' else '',
             'vedovo_checked': 'checked' if stato_civile == 'vedovo' else '',
-            
+
             # Formatted dates for conditional fields
             'dataMatrimonio_formatted': format_date(data.get('dataMatrimonio', '')) if data.get('dataMatrimonio') else '',
             'dataSeparazione_formatted': format_date(data.get('dataSeparazione', '')) if data.get('dataSeparazione') else '',
             'dataDivorzio_formatted': format_date(data.get('dataDivorzio', '')) if data.get('dataDivorzio') else '',
             'dataDecesso_formatted': format_date(data.get('dataDecesso', '')) if data.get('dataDecesso') else '',
-            
+
             # Other conditional fields with defaults
             'nomeConiuge': data.get('nomeConiuge', ''),
             'cognomeConiuge': data.get('cognomeConiuge', ''),
             'comuneMatrimonio': data.get('comuneMatrimonio', ''),
             'tribunaleCompetente': data.get('tribunaleCompetente', '')
         }
-        
-        # Render template
-        template = Template(template_content)
-        html_content = template.render(**template_data)
-        
-        print("✅ Template renderizzato")
-        
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_path)
-        os.makedirs(output_dir, exist_ok=True)
-        print(f"📁 Directory output: {output_dir}")
-        
-        # Configure PDF options
-        options = {
-            'page-size': 'A4',
-            'margin-top': '0.75in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None,
-            'enable-local-file-access': None
-        }
-        
-        print("🔧 Generazione PDF in corso...")
-        
-        # Generate PDF
-        pdfkit.from_string(html_content, output_path, options=options)
-        
-        # Verify file was created
-        if os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"✅ PDF Autocertificazione Stato Civile generato: {output_path} ({file_size} bytes)")
-            return True
-        else:
-            print(f"❌ PDF non creato: {output_path}")
-            return False
-        
+
+        return render_pdf_from_template("autocertificazione_stato_civile_template.html", template_data, output_path, "PDF Autocertificazione Stato Civile")
+
     except Exception as e:
         print(f"❌ Errore nella generazione PDF Autocertificazione Stato Civile: {e}")
-        return False
\ No newline at end of file
+        return None
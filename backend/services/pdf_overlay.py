@@ -0,0 +1,414 @@
+"""
+Overlay PDF rendering: each template's static layout is rendered once to a skeleton PDF,
+then per request only the field values are drawn at the calibrated coordinates.
+
+The template is split into static HTML and "slots" (text runs containing {{ }} expressions).
+For every layout variant (outcome of the {% if %} conditions and of the expressions inside
+tags, e.g. checkbox flags) four wkhtmltopdf renders are done once: the skeleton with empty
+slots, two calibration renders with marker tokens of different length, from which the
+position, font and alignment of each slot are measured, and one with a long wrapping text,
+from which the width each slot has before its box breaks the line is measured.
+Values are drawn with the same system font wkhtmltopdf used for the slot, embedded in the overlay.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from jinja2 import Environment
+
+import config
+
+# Margine destro/sinistro delle pagine generate (0.75in, vedi PDF_OPTIONS)
+PAGE_MARGIN = 54.0
+
+_MARKER_SHORT = "QXZ{:03d}QXZ"
+_MARKER_LONG = "QXZ{:03d}MMMMMMMMQXZ"
+_MARKER_RE = re.compile(r'QXZ(\d{3})M*QXZ')
+# Testo che va a capo in qualunque riquadro, con una fine riconoscibile
+_WRAP_END = "QXZEND"
+_MARKER_WRAP = "QXZ{:03d}QXZ" + " MMMM" * 60 + " " + _WRAP_END
+
+_SUBSET_PREFIX_RE = re.compile(r'^[A-Z]{6}\+')
+
+# Formato della cache degli scheletri su disco: cambiandolo le voci precedenti vengono ignorate
+_SKELETON_FORMAT = 2
+
+_TOKEN_RE = re.compile(r'(<[^>]*>|\{%.*?%\})', re.S)
+_IF_RE = re.compile(r'\{%\s*(?:el)?if\s+(.*?)\s*%\}', re.S)
+_EXPR_RE = re.compile(r'\{\{\s*(.*?)\s*\}\}', re.S)
+
+_env = Environment()
+
+# Frammento di testo estratto da un PDF: (text, x, y, size, font)
+_Chunk = Tuple[str, float, float, float, str]
+
+class SlotLayout(NamedTuple):
+    page: int
+    x: float
+    y: float
+    size: float
+    font: str  # nome PostScript del font usato da wkhtmltopdf
+    align: str  # 'left' | 'center' | 'right'
+    available: Optional[float]  # larghezza prima dell'a capo; None = limitata solo dalla pagina
+
+class _PreparedTemplate(NamedTuple):
+    source_hash: str
+    template: Any              # jinja2 Template with slots replaced by overlay_slots[n]
+    slots: List[Any]           # one jinja2 Template per slot
+    variant_exprs: List[Any]   # compiled expressions deciding the layout variant
+
+class _Skeleton(NamedTuple):
+    pdf: bytes
+    page_sizes: List[Tuple[float, float]]
+    visible: List[int]           # slot presenti in questa variante (fuori dai rami {% if %} falsi)
+    layout: Dict[int, SlotLayout]
+
+class _SlotRecorder:
+    """Empty slot values that record which slots the template actually renders"""
+    def __init__(self):
+        self.used = set()
+
+    def __getitem__(self, n: int) -> str:
+        self.used.add(n)
+        return ''
+
+_prepared: Dict[str, _PreparedTemplate] = {}
+_skeletons: Dict[Tuple[str, str, Tuple], _Skeleton] = {}
+_build_lock = threading.Lock()
+
+def _prepare_template(template_name: str, template_content: str) -> _PreparedTemplate:
+    source_hash = hashlib.sha256(template_content.encode('utf-8')).hexdigest()[:16]
+    cached = _prepared.get(template_name)
+    if cached and cached.source_hash == source_hash:
+        return cached
+
+    slots: List[str] = []
+    variant_sources: List[str] = []
+    parts = []
+    for i, token in enumerate(_TOKEN_RE.split(template_content)):
+        if i % 2 == 1:
+            # Tag HTML o blocco {% %}: restano a Jinja e definiscono la variante di layout
+            variant_sources += _IF_RE.findall(token) if token.startswith('{%') else _EXPR_RE.findall(token)
+            parts.append(token)
+            continue
+        start = token.find('{{')
+        if start == -1:
+            parts.append(token)
+            continue
+        # Il prefisso statico resta nello scheletro, dal primo {{ in poi è uno slot
+        slot = token[start:].rstrip()
+        parts.append(token[:start])
+        parts.append('{{ overlay_slots[%d] }}' % len(slots))
+        parts.append(token[start + len(slot):])
+        slots.append(slot)
+
+    prepared = _PreparedTemplate(
+        source_hash=source_hash,
+        template=_env.from_string(''.join(parts)),
+        slots=[_env.from_string(slot) for slot in slots],
+        variant_exprs=[_env.compile_expression(src) for src in variant_sources],
+    )
+    _prepared[template_name] = prepared
+    return prepared
+
+def _variant_key(prepared: _PreparedTemplate, data: Dict[str, Any]) -> Tuple:
+    return tuple(
+        value if isinstance(value, str) else bool(value)
+        for value in (expr(**data) for expr in prepared.variant_exprs)
+    )
+
+def _html_to_pdf_bytes(html: str) -> bytes:
+    from services.pdf_generator import html_to_pdf
+
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        html_to_pdf(html, path)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def _font_name(font_dict: Any) -> str:
+    """
+    PostScript name of a PDF font, without the subset prefix (ABCDEF+) added when embedding
+    """
+    base_font = str((font_dict or {}).get('/BaseFont', '')).lstrip('/')
+    return _SUBSET_PREFIX_RE.sub('', base_font)
+
+@lru_cache(maxsize=None)
+def _template_font(name: str) -> Optional[str]:
+    """
+    Register with reportlab the system font that wkhtmltopdf embedded under this PostScript name,
+    resolved through fontconfig like wkhtmltopdf does; None when it isn't available as TrueType
+    """
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if not name:
+        return None
+    try:
+        result = subprocess.run(
+            ['fc-match', '--format', '%{file}\n%{postscriptname}', f':postscriptname={name}'],
+            capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"⚠️  Font {name} del template non risolto: {e}")
+        return None
+    path, _, matched = result.stdout.partition('\n')
+    # fc-match restituisce sempre il font più vicino: uno diverso avrebbe altre metriche
+    if result.returncode != 0 or matched.strip() != name:
+        print(f"⚠️  Font {name} del template non trovato: i documenti che lo usano restano in HTML")
+        return None
+    try:
+        pdfmetrics.registerFont(TTFont(name, path))
+    except Exception as e:  # TTFError: font non TrueType (es. OpenType CFF)
+        print(f"⚠️  Font {name} non utilizzabile per l'overlay ({path}): {e}")
+        return None
+    return name
+
+def _metrics_font(name: str) -> str:
+    # Solo per le misure di calibrazione: Helvetica ha le metriche di Arial/Liberation Sans
+    return _template_font(name) or ('Helvetica-Bold' if 'Bold' in name else 'Helvetica')
+
+def _page_lines(pdf_bytes: bytes) -> Iterator[Tuple[int, List[_Chunk]]]:
+    """
+    Text lines of a PDF as (page, chunks sorted by x), rebuilt by joining the chunks on the same baseline
+    """
+    from pypdf import PdfReader
+
+    for page_index, page in enumerate(PdfReader(io.BytesIO(pdf_bytes)).pages):
+        chunks: List[_Chunk] = []
+
+        def visitor(text, cm, tm, font_dict, font_size):
+            if not text.strip():
+                return
+            scale = (tm[0] ** 2 + tm[1] ** 2) ** 0.5 * (cm[0] ** 2 + cm[1] ** 2) ** 0.5
+            x = cm[0] * tm[4] + cm[2] * tm[5] + cm[4]
+            y = cm[1] * tm[4] + cm[3] * tm[5] + cm[5]
+            chunks.append((text, x, y, font_size * scale, _font_name(font_dict)))
+
+        page.extract_text(visitor_text=visitor)
+
+        lines: Dict[float, List[_Chunk]] = {}
+        for chunk in chunks:
+            lines.setdefault(round(chunk[2], 1), []).append(chunk)
+        for line_chunks in lines.values():
+            line_chunks.sort(key=lambda c: c[1])
+            yield page_index, line_chunks
+
+def _locate(line_chunks: List[_Chunk], offset: int) -> Optional[_Chunk]:
+    """
+    The chunk containing the character at offset in the line, moved to start at that character
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    for text, x, y, size, font in line_chunks:
+        if offset < len(text):
+            return text[offset:], x + stringWidth(text[:offset], _metrics_font(font), size), y, size, font
+        offset -= len(text)
+    return None
+
+def _find_markers(pdf_bytes: bytes) -> Dict[int, Tuple[int, float, float, float, str]]:
+    """
+    Locate the marker tokens in a calibration PDF: slot -> (page, x, y, size, font)
+    """
+    found = {}
+    for page_index, line_chunks in _page_lines(pdf_bytes):
+        line_text = ''.join(c[0] for c in line_chunks)
+        for match in _MARKER_RE.finditer(line_text):
+            located = _locate(line_chunks, match.start())
+            if located:
+                _, x, y, size, font = located
+                found[int(match.group(1))] = (page_index, x, y, size, font)
+    return found
+
+def _find_available_widths(pdf_bytes: bytes) -> Dict[int, float]:
+    """
+    Width of the first line of each slot in the wrap calibration PDF, i.e. how wide a value can be
+    before its box (table cell, label, paragraph) breaks the line. Slots that didn't wrap are left out.
+    """
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    widths = {}
+    for _, line_chunks in _page_lines(pdf_bytes):
+        line_text = ''.join(c[0] for c in line_chunks)
+        line_end = max(
+            x + stringWidth(text.rstrip(), _metrics_font(font), size)
+            for text, x, _, size, font in line_chunks
+        )
+        for match in _MARKER_RE.finditer(line_text):
+            if _WRAP_END in line_text[match.end():]:
+                continue  # testo intero su una riga: il riquadro non limita lo slot
+            located = _locate(line_chunks, match.start())
+            if located:
+                widths[int(match.group(1))] = line_end - located[1]
+    return widths
+
+def _build_skeleton(prepared: _PreparedTemplate, data: Dict[str, Any]) -> _Skeleton:
+    from pypdf import PdfReader
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    count = len(prepared.slots)
+    recorder = _SlotRecorder()
+    skeleton_pdf = _html_to_pdf_bytes(prepared.template.render(**data, overlay_slots=recorder))
+    short = _find_markers(_html_to_pdf_bytes(
+        prepared.template.render(**data, overlay_slots=[_MARKER_SHORT.format(n) for n in range(count)])
+    ))
+    long = _find_markers(_html_to_pdf_bytes(
+        prepared.template.render(**data, overlay_slots=[_MARKER_LONG.format(n) for n in range(count)])
+    ))
+    available = _find_available_widths(_html_to_pdf_bytes(
+        prepared.template.render(**data, overlay_slots=[_MARKER_WRAP.format(n) for n in range(count)])
+    ))
+
+    layout = {}
+    for n, (page, x, y, size, font) in short.items():
+        if n not in long:
+            continue
+        # Lo spostamento dell'inizio con un marker più lungo rivela l'allineamento
+        extra = stringWidth('M' * 8, _metrics_font(font), size)
+        shift = (x - long[n][1]) / extra if extra else 0
+        align = 'left' if shift < 0.25 else 'center' if shift < 0.75 else 'right'
+        if align != 'left':
+            marker_width = stringWidth(_MARKER_SHORT.format(n), _metrics_font(font), size)
+            x += marker_width / 2 if align == 'center' else marker_width
+        layout[n] = SlotLayout(page, x, y, size, font, align, available.get(n))
+
+    page_sizes = [
+        (float(p.mediabox.width), float(p.mediabox.height))
+        for p in PdfReader(io.BytesIO(skeleton_pdf)).pages
+    ]
+    return _Skeleton(skeleton_pdf, page_sizes, sorted(recorder.used), layout)
+
+def _write_atomic(path: str, content: bytes) -> None:
+    """
+    Write to a temporary file in the same directory and rename it: readers never see a partial file
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path), dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _get_skeleton(template_name: str, prepared: _PreparedTemplate, data: Dict[str, Any]) -> _Skeleton:
+    variant = _variant_key(prepared, data)
+    key = (template_name, prepared.source_hash, variant)
+    skeleton = _skeletons.get(key)
+    if skeleton:
+        return skeleton
+
+    with _build_lock:
+        skeleton = _skeletons.get(key)
+        if skeleton:
+            return skeleton
+
+        # Cache su disco condivisa tra riavvii e worker
+        variant_hash = hashlib.sha256(repr((_SKELETON_FORMAT, key)).encode('utf-8')).hexdigest()[:16]
+        base_path = os.path.join(config.SKELETON_DIR, f"{template_name.rsplit('.', 1)[0]}_{variant_hash}")
+        if os.path.exists(base_path + '.json') and os.path.exists(base_path + '.pdf'):
+            with open(base_path + '.pdf', 'rb') as f:
+                pdf = f.read()
+            with open(base_path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            skeleton = _Skeleton(
+                pdf,
+                [tuple(size) for size in meta['page_sizes']],
+                meta['visible'],
+                {int(n): SlotLayout(*slot) for n, slot in meta['layout'].items()},
+            )
+        else:
+            print(f"🧱 Creazione scheletro PDF per {template_name} (variante {variant_hash})")
+            skeleton = _build_skeleton(prepared, data)
+            os.makedirs(config.SKELETON_DIR, exist_ok=True)
+            # Il .json per ultimo: un altro worker usa la cache solo quando ci sono entrambi, completi
+            _write_atomic(base_path + '.pdf', skeleton.pdf)
+            _write_atomic(base_path + '.json', json.dumps(
+                {'page_sizes': skeleton.page_sizes, 'visible': skeleton.visible, 'layout': skeleton.layout}
+            ).encode('utf-8'))
+
+        _skeletons[key] = skeleton
+        return skeleton
+
+def render_overlay_pdf(template_name: str, template_content: str, template_data: Dict[str, Any], output_path: str) -> bool:
+    """
+    Render a PDF by drawing the field values over the cached skeleton.
+    Returns False when the data doesn't fit the fixed layout, so the caller can fall back to HTML.
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+        from reportlab.pdfbase.pdfmetrics import getFont, stringWidth
+        from reportlab.pdfgen import canvas
+    except ImportError as e:
+        print(f"⚠️  Modalità overlay non disponibile: {e}")
+        return False
+
+    try:
+        prepared = _prepare_template(template_name, template_content)
+        skeleton = _get_skeleton(template_name, prepared, template_data)
+
+        # Valori degli slot visibili, con gli spazi normalizzati come farebbe l'HTML
+        draws: Dict[int, List] = {}
+        for n in skeleton.visible:
+            value = ' '.join(prepared.slots[n].render(**template_data).split())
+            if not value:
+                continue
+            layout = skeleton.layout.get(n)
+            if layout is None:
+                return False
+            # Stesso font dello scheletro, con tutti i caratteri del valore
+            font = _template_font(layout.font)
+            if font is None:
+                return False
+            glyphs = getFont(font).face.charToGlyph
+            if any(ord(c) not in glyphs for c in value):
+                return False
+
+            width = stringWidth(value, font, layout.size)
+            page_width = skeleton.page_sizes[layout.page][0]
+            if layout.align == 'left':
+                x, available = layout.x, page_width - PAGE_MARGIN - layout.x
+            elif layout.align == 'center':
+                x = layout.x - width / 2
+                available = 2 * min(layout.x - PAGE_MARGIN, page_width - PAGE_MARGIN - layout.x)
+            else:
+                x, available = layout.x - width, layout.x - PAGE_MARGIN
+            if layout.available is not None:
+                available = min(available, layout.available)
+            # Un testo che andrebbe a capo sposterebbe il resto del layout
+            if width > available:
+                return False
+            draws.setdefault(layout.page, []).append((font, layout.size, x, layout.y, value))
+
+        # Un solo PDF di overlay con una pagina per pagina dello scheletro
+        buffer = io.BytesIO()
+        overlay = canvas.Canvas(buffer)
+        for page_index, page_size in enumerate(skeleton.page_sizes):
+            overlay.setPageSize(page_size)
+            for font, size, x, y, value in draws.get(page_index, []):
+                overlay.setFont(font, size)
+                overlay.drawString(x, y, value)
+            overlay.showPage()
+        overlay.save()
+
+        writer = PdfWriter(clone_from=PdfReader(io.BytesIO(skeleton.pdf)))
+        for page, overlay_page in zip(writer.pages, PdfReader(buffer).pages):
+            page.merge_page(overlay_page)
+        with open(output_path, 'wb') as f:
+            writer.write(f)
+        return True
+
+    except Exception as e:
+        print(f"⚠️  Errore nel rendering overlay: {e}")
+        return False
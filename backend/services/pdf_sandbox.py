@@ -0,0 +1,105 @@
+"""
+Sandboxed wkhtmltopdf: every render is a fresh process in its own session, with rlimits on memory,
+CPU seconds and output size, a wall-clock timeout that kills the whole process group, and an
+atomic write of the result. Concurrency is bounded by the PDF slots of the fair scheduler.
+"""
+
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import config
+
+try:
+    import resource
+except ImportError:  # Windows: nessun rlimit, restano timeout e limiti sull'input
+    resource = None
+
+# prlimit (Linux) imposta i limiti di un altro processo: niente preexec_fn, che con i thread
+# del server può bloccarsi nel figlio su un lock preso da un altro thread al momento del fork
+_prlimit = getattr(resource, 'prlimit', None)
+
+class PdfRenderError(Exception):
+    """wkhtmltopdf failed, timed out or was killed for exceeding its limits"""
+
+def wkhtmltopdf_binary() -> Optional[str]:
+    binary = os.getenv("WKHTMLTOPDF_PATH")
+    if binary and os.access(binary, os.X_OK):
+        return binary
+    return shutil.which("wkhtmltopdf")
+
+def _option_args(options: Dict[str, Any]) -> List[str]:
+    args = []
+    for name, value in options.items():
+        args.append(f"--{name}")
+        if value is not None:
+            args.append(str(value))
+    return args
+
+def _apply_limits(pid: int) -> None:
+    # Chiamata subito dopo lo spawn: wkhtmltopdf resta in attesa dell'HTML su stdin,
+    # quindi il rendering parte sempre con i limiti già applicati
+    mb = 1024 * 1024
+    _prlimit(pid, resource.RLIMIT_AS, (config.PDF_MAX_MEMORY_MB * mb,) * 2)
+    _prlimit(pid, resource.RLIMIT_CPU, (config.PDF_MAX_CPU_SECONDS, config.PDF_MAX_CPU_SECONDS + 1))
+    _prlimit(pid, resource.RLIMIT_FSIZE, (config.PDF_MAX_OUTPUT_MB * mb,) * 2)
+    _prlimit(pid, resource.RLIMIT_CORE, (0, 0))
+
+def _kill_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+def render_html(html_content: str, output_path: str, options: Dict[str, Any]) -> None:
+    """
+    Render HTML to output_path in a limited wkhtmltopdf process; raises PdfRenderError
+    """
+    html_bytes = html_content.encode('utf-8')
+    if len(html_bytes) > config.PDF_MAX_HTML_KB * 1024:
+        raise PdfRenderError(f"HTML troppo grande ({len(html_bytes) // 1024} KB, massimo {config.PDF_MAX_HTML_KB} KB)")
+
+    binary = wkhtmltopdf_binary()
+    if binary is None:
+        raise PdfRenderError("wkhtmltopdf non trovato")
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.pdf', dir=os.path.dirname(output_path) or None)
+    os.close(fd)
+    process = subprocess.Popen(
+        [binary, '--quiet', *_option_args(options), '-', tmp_path],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        start_new_session=True,  # gruppo di processi proprio: il kill raggiunge anche i figli
+    )
+    try:
+        if _prlimit:
+            try:
+                _apply_limits(process.pid)
+            except OSError as e:
+                _kill_group(process)
+                raise PdfRenderError(f"limiti di wkhtmltopdf non applicati: {e}")
+        try:
+            _, stderr = process.communicate(html_bytes, timeout=config.PDF_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            _kill_group(process)
+            raise PdfRenderError(f"wkhtmltopdf interrotto dopo {config.PDF_TIMEOUT:.0f} s")
+
+        if process.returncode < 0:
+            reason = {
+                signal.SIGXCPU: f"limite di {config.PDF_MAX_CPU_SECONDS} s di CPU superato",
+                signal.SIGKILL: "processo terminato",
+                signal.SIGXFSZ: f"PDF oltre {config.PDF_MAX_OUTPUT_MB} MB",
+            }.get(-process.returncode, f"segnale {signal.Signals(-process.returncode).name}, probabile limite di memoria")
+            raise PdfRenderError(f"wkhtmltopdf terminato: {reason}")
+        # wkhtmltopdf esce con 1 anche per semplici avvisi: conta il PDF prodotto
+        if process.returncode != 0 and not os.path.getsize(tmp_path):
+            raise PdfRenderError(f"wkhtmltopdf fallito: {stderr.decode('utf-8', 'replace').strip()[-500:]}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,208 @@
+"""
+Opt-in profiling: a per-worker sampling profiler (flamegraph folded stacks / speedscope JSON)
+and per-request cProfile capture. Nothing runs unless it is explicitly started.
+"""
+
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+
+import config
+from services.auth import is_admin
+
+PROFILES_DIR = os.path.join(config.OUTPUT_DIR, "profiles")
+
+# Frame foglia di thread inattivi (event loop in attesa, pool senza lavoro): esclusi dai campioni
+_IDLE_FRAMES = {
+    ('selectors.py', 'select'),
+    ('threading.py', 'wait'),
+    ('queue.py', 'get'),
+    ('thread.py', '_worker'),
+}
+
+Frame = Tuple[str, str, int]
+
+class SamplingProfiler:
+    """Samples the stacks of every thread of this worker at a fixed interval"""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.samples: Counter = Counter()
+        self.interval = 0.01
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01) -> None:
+        if self.running:
+            return
+        self.samples = Counter()
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.monotonic() - self.started_at
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack and (os.path.basename(stack[0][1]), stack[0][0]) in _IDLE_FRAMES:
+                    continue
+                self.samples[tuple(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        Collapsed stacks, one "root;...;leaf count" per line (flamegraph.pl, speedscope, inferno)
+        """
+        return '\n'.join(
+            ';'.join(f"{name} ({os.path.basename(filename)}:{line})" for name, filename, line in stack) + f" {count}"
+            for stack, count in self.samples.most_common()
+        )
+
+    def speedscope(self) -> Dict[str, Any]:
+        """
+        Sampled profile in the speedscope file format
+        """
+        frames: List[Dict[str, Any]] = []
+        index: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.most_common():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples.append(ids)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"PraticAI worker {os.getpid()}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "exporter": "praticai",
+        }
+
+sampler = SamplingProfiler()
+
+# Profili cProfile della richiesta corrente (uno per thread che esegue lavoro della richiesta)
+_request_profiles: contextvars.ContextVar[Optional[List[cProfile.Profile]]] = contextvars.ContextVar(
+    "request_profiles", default=None
+)
+
+_request_profile_lock = threading.Lock()
+
+def profiled_call(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run blocking request work, under cProfile when the request asked for it
+    """
+    profiles = _request_profiles.get()
+    if profiles is None:
+        return func(*args)
+    profile = cProfile.Profile()
+    profiles.append(profile)
+    return profile.runcall(func, *args)
+
+def save_request_profile(profiles: List[cProfile.Profile]) -> str:
+    """
+    Merge the profiles of one request into a .prof file; returns the profile id
+    """
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(os.path.join(PROFILES_DIR, f"{profile_id}.prof"))
+    prune_profiles(config.PROFILES_KEEP)
+    return profile_id
+
+def prune_profiles(keep: int) -> None:
+    """
+    Delete all but the most recent keep profiles (0 = keep them all)
+    """
+    if keep <= 0:
+        return
+    profiles = []
+    for entry in os.scandir(PROFILES_DIR):
+        if entry.name.endswith('.prof'):
+            try:
+                profiles.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass  # già cancellato da un altro worker
+    for _, path in sorted(profiles, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def profile_summary(prof_path: str, limit: int = 40) -> str:
+    """
+    Text summary sorted by cumulative time
+    """
+    out = io.StringIO()
+    pstats.Stats(prof_path, stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+async def request_profiling_middleware(request: Request, call_next):
+    """
+    Capture a cProfile of the request when it carries X-Debug-Profile and a valid admin token
+    """
+    if not request.headers.get("x-debug-profile") or not is_admin(request.headers.get("x-admin-token")):
+        return await call_next(request)
+
+    # Un solo profilo per volta: cProfile non supporta profiler concorrenti sullo stesso thread
+    if not _request_profile_lock.acquire(blocking=False):
+        print("⚠️  Profilo già in corso, richiesta non profilata")
+        return await call_next(request)
+
+    loop_profile = cProfile.Profile()
+    profiles = [loop_profile]
+    token = _request_profiles.set(profiles)
+    loop_profile.enable()
+    try:
+        response = await call_next(request)
+    finally:
+        loop_profile.disable()
+        _request_profiles.reset(token)
+        _request_profile_lock.release()
+
+    profile_id = save_request_profile(profiles)
+    print(f"🔬 Profilo richiesta salvato: {profile_id}")
+    response.headers["X-Profile-Id"] = profile_id
+    return response
@@ -0,0 +1,35 @@
+"""
+Fixed-window rate limiting for the generation endpoints, shared across workers
+"""
+
+import time
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+import config
+from services.state import get_store
+
+async def rate_limit_middleware(request: Request, call_next):
+    """
+    Limit POST requests under /api to RATE_LIMIT_PER_MINUTE per client
+    """
+    if config.RATE_LIMIT_PER_MINUTE <= 0 or request.method != "POST" or not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    # Indirizzo già risolto da uvicorn (proxy_headers) solo per i proxy fidati: X-Forwarded-For
+    # letto qui direttamente sarebbe scelto dal client, con un contatore nuovo a ogni richiesta
+    client = request.client.host if request.client else "unknown"
+    window = int(time.time() // 60)
+    # SQLite/Redis sono chiamate bloccanti: fuori dall'event loop
+    count = await run_in_threadpool(get_store().incr, f"ratelimit:{client}:{window}", ttl=120)
+
+    if count > config.RATE_LIMIT_PER_MINUTE:
+        print(f"⛔ Rate limit superato per {client}")
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Troppe richieste. Riprova tra qualche istante."},
+            headers={"Retry-After": str(60 - int(time.time() % 60))}
+        )
+    return await call_next(request)
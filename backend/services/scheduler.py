@@ -0,0 +1,171 @@
+"""
+Weighted fair queueing for the expensive stages (wkhtmltopdf and LLM calls): each stage has a fixed
+number of slots, and waiting requests are served interactive-first, then by weighted finish time
+per tenant, so one bulk consumer can't starve the others.
+
+Generations are first admitted by an async fair queue, before they take a thread of the shared
+threadpool: requests waiting for their turn hold no thread, so the threadpool always has room for
+the other tenants and for the short blocking calls (quotas, rate limit, shared store).
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+import config
+from services.tenants import current_tenant
+from services.tracing import set_attributes
+
+T = TypeVar("T")
+
+PRIORITIES = {'interactive': 0, 'batch': 1}
+
+Entry = Tuple[int, float, int]  # (priorità, finish time virtuale, ordine di arrivo)
+
+class _FairQueue:
+    """Start-time fair queueing tags and counters, shared by the thread and the async schedulers"""
+
+    def __init__(self, name: str, slots: int):
+        self.name = name
+        self.slots = slots
+        self._free = slots
+        self._queue: List[Entry] = []
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    def _tag(self, tenant: str, weight: float, priority: str, cost: float) -> Tuple[float, Entry]:
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + cost / max(weight, 0.01)
+        self._last_finish[tenant] = finish
+        return start, (PRIORITIES.get(priority, 0), finish, next(self._seq))
+
+    def _record_wait(self, waited_from: float) -> None:
+        set_attributes(**{f"{self.name}.queue_ms": round((time.monotonic() - waited_from) * 1000, 1)})
+
+    def stats(self) -> Dict[str, int]:
+        return {"slots": self.slots, "busy": self.slots - self._free, "waiting": len(self._queue)}
+
+class FairScheduler(_FairQueue):
+    """Start-time fair queueing over a fixed number of slots, shared by the threads of one worker"""
+
+    def __init__(self, name: str, slots: int):
+        super().__init__(name, slots)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, tenant: str, weight: float = 1.0, priority: str = 'interactive', cost: float = 1.0) -> Iterator[None]:
+        """
+        Wait for a slot of this stage; a tenant with weight 2 gets twice the slots of one with weight 1
+        """
+        waited_from = time.monotonic()
+        with self._cond:
+            start, entry = self._tag(tenant, weight, priority, cost)
+            heapq.heappush(self._queue, entry)
+            while self._free == 0 or self._queue[0] is not entry:
+                self._cond.wait()
+            heapq.heappop(self._queue)
+            self._free -= 1
+            self._virtual_time = max(self._virtual_time, start)
+            if self._free and self._queue:
+                self._cond.notify_all()
+        self._record_wait(waited_from)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free += 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return super().stats()
+
+class AsyncFairScheduler(_FairQueue):
+    """The same fair queueing for coroutines of one event loop: a waiting request is only a future"""
+
+    def __init__(self, name: str, slots: int):
+        super().__init__(name, slots)
+        self._waiters: Dict[Entry, Tuple[asyncio.Future, float]] = {}
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, weight: float = 1.0, priority: str = 'interactive', cost: float = 1.0) -> AsyncIterator[None]:
+        waited_from = time.monotonic()
+        start, entry = self._tag(tenant, weight, priority, cost)
+        if self._free and not self._queue:
+            self._grant(start)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, entry)
+            self._waiters[entry] = (future, start)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # Richiesta annullata in coda (client disconnesso): lascia il posto
+                    self._waiters.pop(entry, None)
+                    if entry in self._queue:
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                else:
+                    # Slot assegnato proprio mentre veniva annullata
+                    self._release()
+                raise
+        self._record_wait(waited_from)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _grant(self, start: float) -> None:
+        self._free -= 1
+        self._virtual_time = max(self._virtual_time, start)
+
+    def _release(self) -> None:
+        self._free += 1
+        while self._free and self._queue:
+            entry = heapq.heappop(self._queue)
+            future, start = self._waiters.pop(entry)
+            if future.cancelled():
+                continue
+            self._grant(start)
+            future.set_result(None)
+
+SCHEDULERS = {
+    'pdf': FairScheduler('pdf', config.PDF_CONCURRENCY),
+    'llm': FairScheduler('llm', config.LLM_CONCURRENCY),
+}
+
+# Generazioni che occupano thread del threadpool nello stesso momento (ammesse in ordine fair)
+ADMISSION = AsyncFairScheduler('generation', config.GENERATION_CONCURRENCY)
+
+@contextmanager
+def stage_slot(stage: str, cost: float = 1.0) -> Iterator[None]:
+    """
+    Run a block of the pdf or llm stage in the current tenant's fair share
+    """
+    tenant, priority = current_tenant()
+    with SCHEDULERS[stage].slot(tenant.name, tenant.weight, priority, cost):
+        yield
+
+@asynccontextmanager
+async def admitted() -> AsyncIterator[None]:
+    """
+    Wait, without holding a thread, for the current tenant's turn to run a generation
+    """
+    tenant, priority = current_tenant()
+    async with ADMISSION.slot(tenant.name, tenant.weight, priority):
+        yield
+
+async def run_admitted(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run blocking generation work in the threadpool once the fair queue admits it
+    """
+    async with admitted():
+        return await run_in_threadpool(func, *args)
@@ -0,0 +1,74 @@
+"""
+Startup phase: explicit warm-up of the lazily loaded dependencies, so that a new worker
+is ready before serving and the first real request doesn't pay the import and compile costs
+"""
+
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict
+
+import config
+
+# Stato dell'avvio del processo corrente (letto da /health)
+STARTUP: Dict[str, Any] = {
+    'ready': False,
+    'seconds': None,
+    'steps': {},
+}
+
+def _load_indexes() -> str:
+    from services.ateco import load_ateco_index
+    from services.codice_fiscale import load_belfiore_index
+    return f"{load_belfiore_index()} codici Belfiore, {load_ateco_index()} codici ATECO"
+
+def _compile_templates() -> str:
+    from services.pdf_generator import TEMPLATE_NAMES, load_template
+    compiled = sum(1 for name in TEMPLATE_NAMES if load_template(name) is not None)
+    return f"{compiled}/{len(TEMPLATE_NAMES)} template"
+
+def _open_llm_client() -> str:
+    # Importa anche i prompt e openai (ai.pipeline)
+    from ai.pipeline import get_openai_client
+    return "client pronto" if get_openai_client() else "API key mancante"
+
+def _dry_render() -> str:
+    from services.pdf_generator import html_to_pdf
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    try:
+        html_to_pdf("<html><body><p>PraticAI warm-up</p></body></html>", path)
+        return f"{os.path.getsize(path)} bytes"
+    finally:
+        os.remove(path)
+
+WARM_UP_STEPS: Dict[str, Callable[[], str]] = {
+    'indici': _load_indexes,
+    'template': _compile_templates,
+    'llm': _open_llm_client,
+    'pdf': _dry_render,
+}
+
+def warm_up(started_at: float) -> Dict[str, Any]:
+    """
+    Run the warm-up steps and mark the process as ready.
+    A failing step is reported but doesn't prevent startup: the request will retry it lazily.
+    """
+    if config.WARM_UP:
+        for name, step in WARM_UP_STEPS.items():
+            step_start = time.perf_counter()
+            try:
+                detail = step()
+                print(f"🔥 Warm-up {name}: {detail} ({(time.perf_counter() - step_start) * 1000:.0f} ms)")
+            except Exception as e:
+                detail = f"errore: {e}"
+                print(f"⚠️  Warm-up {name} non riuscito: {e}")
+            STARTUP['steps'][name] = {
+                'detail': detail,
+                'ms': round((time.perf_counter() - step_start) * 1000),
+            }
+
+    STARTUP['seconds'] = round(time.perf_counter() - started_at, 3)
+    STARTUP['ready'] = True
+    print(f"🚀 Worker {os.getpid()} pronto in {STARTUP['seconds']:.2f} s")
+    return STARTUP
@@ -0,0 +1,162 @@
+"""
+Shared key-value state (file registry, caches, rate limits) visible to every worker
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import config
+
+# Ogni quante scritture cancellare le chiavi scadute (get le ignora, ma resterebbero per sempre)
+_PURGE_EVERY = 1000
+
+class MemoryStore:
+    """In-process store: only correct with a single worker"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._writes = itertools.count(1)
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.time():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+        if next(self._writes) % _PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        expired = [key for key, (_, expires_at) in list(self._data.items()) if expires_at is not None and expires_at < now]
+        for key in expired:
+            self._data.pop(key, None)
+        return len(expired)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            value = (self.get(key) or 0) + 1
+            if value == 1:
+                self.set(key, value, ttl)
+            else:
+                self._data[key] = (value, self._data[key][1])
+            return value
+
+class SqliteStore:
+    """SQLite store in WAL mode: shared by all the workers on one node"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = itertools.count(1)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at)")
+        # Righe scadute lasciate dai worker precedenti
+        self.purge_expired()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl if ttl else None)
+        )
+        self._count_write()
+
+    def purge_expired(self) -> int:
+        return self._connect().execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def _count_write(self) -> None:
+        if next(self._writes) % _PURGE_EVERY == 0:
+            self.purge_expired()
+
+    def delete(self, key: str) -> None:
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at < ?", (key, now))
+            conn.execute(
+                "INSERT INTO kv (key, value, expires_at) VALUES (?, '1', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1",
+                (key, now + ttl if ttl else None)
+            )
+            value = int(conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()[0])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count_write()
+        return value
+
+class RedisStore:
+    """Redis store: shared by workers on several nodes"""
+
+    def __init__(self, url: str):
+        import redis  # opzionale, richiesto solo con STATE_BACKEND=redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Any:
+        value = self._redis.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._redis.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self._redis.delete(key)
+
+    def incr(self, key: str, ttl: Optional[float] = None) -> int:
+        pipe = self._redis.pipeline()
+        pipe.incr(key)
+        if ttl:
+            pipe.pexpire(key, int(ttl * 1000), nx=True)
+        return int(pipe.execute()[0])
+
+@lru_cache(maxsize=1)
+def get_store():
+    """
+    Return the configured shared store (one per process)
+    """
+    if config.STATE_BACKEND == 'redis':
+        return RedisStore(config.STATE_URL)
+    if config.STATE_BACKEND == 'memory':
+        return MemoryStore()
+    return SqliteStore(config.STATE_URL)
@@ -0,0 +1,66 @@
+"""
+Generated files storage: output paths and the file_id -> file registry shared by all workers
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+import config
+from services.archive import archive_document, get_archive
+from services.state import get_store
+from services.tracing import span
+
+def output_path(filename: str) -> str:
+    """
+    Absolute path of a generated file in the configured output directory
+    """
+    return os.path.join(config.OUTPUT_DIR, filename)
+
+def register_file(
+    file_id: str,
+    path: str,
+    document_type: Optional[str] = None,
+    data: Optional[Dict[str, Any]] = None,
+    template_version: Optional[str] = None,
+) -> None:
+    """
+    Record the file generated for file_id; only the storage key (file name) is stored,
+    so every worker and node resolves it against its own OUTPUT_DIR.
+    With a document type the file is also added to the searchable archive, with its template version.
+    """
+    with span("storage.register", file_id=file_id, size=os.path.getsize(path) if os.path.exists(path) else None):
+        get_store().set(f"file:{file_id}", os.path.basename(path))
+        if document_type:
+            archive_document(path, document_type, data or {}, template_version)
+    print(f"💾 File mappato: {file_id} -> {path}")
+
+def resolve_file(file_id: str) -> Optional[str]:
+    """
+    Return the path of the file generated for file_id, or None if it doesn't exist
+    """
+    with span("storage.resolve", file_id=file_id) as current:
+        file_path = _resolve_file(file_id)
+        current.set_attribute("found", file_path is not None)
+        return file_path
+
+def _resolve_file(file_id: str) -> Optional[str]:
+    # Solo corrispondenza esatta nel registro: niente ricerche per sottostringa nella directory
+    storage_key = get_store().get(f"file:{file_id}")
+    if not storage_key:
+        print("❌ File_id non trovato nel registro")
+        return None
+    file_path = output_path(storage_key)
+    if not os.path.exists(file_path):
+        print(f"❌ File non esiste nel filesystem: {file_path}")
+        return None
+    return file_path
+
+def delete_file(file_id: str) -> None:
+    """
+    Remove a generated file and its registry entry
+    """
+    file_path = resolve_file(file_id)
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
+        get_archive().remove(os.path.basename(file_path))
+    get_store().delete(f"file:{file_id}")
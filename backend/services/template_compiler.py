@@ -0,0 +1,180 @@
+"""
+Ahead-of-time compilation of the document templates into plain Python render functions.
+
+The templates only use {{ variable|filter }} and {% if %}/{% elif %}/{% else %}/{% endif %}:
+each one is split once into static string segments and dynamic slots, and rendering becomes
+a list of segments joined with str.join. Templates using anything else are rejected and
+rendered by Jinja as before.
+"""
+
+import ast
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from jinja2.filters import do_capitalize, do_lower, do_title, do_trim, do_upper
+
+_TOKEN_RE = re.compile(r'({{.*?}}|{%.*?%}|{#.*?#})', re.S)
+_BLOCK_RE = re.compile(r'^{%\s*(if|elif|else|endif)\b\s*(.*?)\s*%}$', re.S)
+
+# Filtri supportati: le stesse funzioni usate da Jinja, per un output identico
+FILTERS: Dict[str, Callable[[str], str]] = {
+    'upper': do_upper,
+    'lower': do_lower,
+    'title': do_title,
+    'capitalize': do_capitalize,
+    'trim': do_trim,
+}
+
+_CONSTANTS = {'true': True, 'false': False, 'none': None, 'True': True, 'False': False, 'None': None}
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.Compare,
+    ast.Eq, ast.NotEq, ast.In, ast.NotIn, ast.Lt, ast.LtE, ast.Gt, ast.GtE,
+    ast.Name, ast.Load, ast.Constant,
+)
+
+class UnsupportedTemplate(Exception):
+    """The template uses a construct the compiler doesn't handle"""
+
+class _Undefined:
+    """Missing variable: empty when printed, falsy in conditions (like jinja2.Undefined)"""
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __str__(self) -> str:
+        return ''
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _Undefined)
+
+    def __hash__(self) -> int:
+        return 0
+
+UNDEFINED = _Undefined()
+
+class _NameRewriter(ast.NodeTransformer):
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in _CONSTANTS:
+            return ast.copy_location(ast.Constant(_CONSTANTS[node.id]), node)
+        call = ast.Call(
+            func=ast.Name('_g', ast.Load()),
+            args=[ast.Constant(node.id), ast.Name('_U', ast.Load())],
+            keywords=[],
+        )
+        return ast.copy_location(call, node)
+
+def _expression(source: str) -> str:
+    """
+    Translate a Jinja test/variable expression into Python reading from the context
+    """
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError:
+        raise UnsupportedTemplate(f"Espressione non supportata: {source!r}")
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise UnsupportedTemplate(f"Espressione non supportata: {source!r}")
+    return ast.unparse(ast.fix_missing_locations(_NameRewriter().visit(tree)))
+
+def _output(source: str) -> str:
+    expr, *filters = [part.strip() for part in source.split('|')]
+    code = f"_s({_expression(expr)})"
+    for name in filters:
+        if name not in FILTERS:
+            raise UnsupportedTemplate(f"Filtro non supportato: {name!r}")
+        code = f"_f_{name}({code})"
+    return code
+
+def _generate_source(template_source: str) -> str:
+    # Come Jinja con keep_trailing_newline=False
+    if template_source.endswith('\n'):
+        template_source = template_source[:-1]
+
+    lines = ["def render(_ctx):", "    _g = _ctx.get", "    _o = []"]
+    pending: List[str] = []
+    depth = 1
+    branch_open: List[bool] = []
+
+    def flush() -> None:
+        if pending:
+            lines.append("    " * depth + f"_o += [{', '.join(pending)}]")
+            pending.clear()
+
+    for i, token in enumerate(_TOKEN_RE.split(template_source)):
+        if i % 2 == 0:
+            if token:
+                pending.append(repr(token))
+            continue
+        if token.startswith('{#'):
+            continue
+        if token.startswith('{{'):
+            pending.append(_output(token[2:-2]))
+            continue
+
+        match = _BLOCK_RE.match(token)
+        if not match or token.startswith(('{%-', '{%+')) or token.endswith(('-%}', '+%}')):
+            raise UnsupportedTemplate(f"Blocco non supportato: {token!r}")
+        keyword, expr = match.groups()
+        flush()
+        if keyword == 'if':
+            lines.append("    " * depth + f"if {_expression(expr)}:")
+            depth += 1
+            branch_open.append(True)
+        elif keyword in ('elif', 'else'):
+            if not branch_open:
+                raise UnsupportedTemplate(f"{keyword} senza if")
+            lines.append("    " * depth + "pass")
+            depth -= 1
+            lines.append("    " * depth + (f"elif {_expression(expr)}:" if keyword == 'elif' else "else:"))
+            depth += 1
+        else:
+            if not branch_open:
+                raise UnsupportedTemplate("endif senza if")
+            lines.append("    " * depth + "pass")
+            depth -= 1
+            branch_open.pop()
+
+    if branch_open:
+        raise UnsupportedTemplate("if non chiuso")
+    flush()
+    lines.append("    return ''.join(_o)")
+    return '\n'.join(lines)
+
+def _to_str(value: Any) -> str:
+    return value if type(value) is str else str(value)
+
+def compile_template(template_source: str, name: str = '<template>') -> Callable[[Dict[str, Any]], str]:
+    """
+    Compile a template into render(context_dict) -> str.
+    Raises UnsupportedTemplate if the template needs the full Jinja engine.
+    """
+    namespace: Dict[str, Any] = {
+        '_U': UNDEFINED,
+        '_s': _to_str,
+        **{f"_f_{filter_name}": f for filter_name, f in FILTERS.items()},
+    }
+    exec(compile(_generate_source(template_source), f"<compiled {name}>", 'exec'), namespace)
+    return namespace['render']
+
+class CompiledTemplate:
+    """Drop-in replacement for jinja2.Template.render backed by a compiled render function"""
+    __slots__ = ('name', '_render')
+
+    def __init__(self, name: str, render: Callable[[Dict[str, Any]], str]):
+        self.name = name
+        self._render = render
+
+    def render(self, **data: Any) -> str:
+        return self._render(data)
+
+def try_compile_template(template_source: str, name: str = '<template>') -> Optional[CompiledTemplate]:
+    """
+    Compile the template, or return None when it must be rendered by Jinja
+    """
+    try:
+        return CompiledTemplate(name, compile_template(template_source, name))
+    except UnsupportedTemplate as e:
+        print(f"ℹ️  Template {name} renderizzato con Jinja: {e}")
+        return None
@@ -0,0 +1,145 @@
+"""
+Versioned store of the compiled document templates: each template is read and compiled once, requests
+never touch the filesystem, and a change on disk (watcher) or an admin reload compiles the new version
+in the background and swaps it in atomically. The version is the hash of the template source.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import config
+
+_HISTORY = 10
+
+class TemplateVersion(NamedTuple):
+    name: str
+    version: str
+    source: str
+    template: Any  # CompiledTemplate o jinja2.Template
+    mtime: float  # ultimo mtime visto sul disco, anche di una modifica non compilabile
+    loaded_at: float
+
+def _template_path(name: str) -> str:
+    return os.path.join(config.TEMPLATE_DIR, name)
+
+def _mtime(name: str) -> float:
+    try:
+        return os.path.getmtime(_template_path(name))
+    except OSError:
+        return 0.0
+
+def _compile(name: str) -> Optional[TemplateVersion]:
+    from jinja2 import Template
+    from services.template_compiler import try_compile_template
+    template_path = _template_path(name)
+    try:
+        mtime = os.path.getmtime(template_path)
+        with open(template_path, 'r', encoding='utf-8') as f:
+            source = f.read()
+    except FileNotFoundError:
+        print(f"❌ Template non trovato: {template_path}")
+        return None
+    template = None
+    if config.TEMPLATE_FAST_PATH:
+        # Funzione di render Python precompilata: segmenti statici uniti con str.join
+        template = try_compile_template(source, name)
+    return TemplateVersion(
+        name=name,
+        version=hashlib.sha256(source.encode('utf-8')).hexdigest()[:12],
+        source=source,
+        template=template or Template(source),
+        mtime=mtime,
+        loaded_at=time.time(),
+    )
+
+class TemplateStore:
+    """Current compiled version of each template, plus a short history of the previous ones"""
+
+    def __init__(self):
+        self._current: Dict[str, TemplateVersion] = {}
+        self._history: Dict[str, Deque[Tuple[str, float]]] = {}
+        self._lock = threading.Lock()  # serializza le compilazioni, non le letture
+        self._watcher: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Optional[TemplateVersion]:
+        """
+        Current version of a template, compiled on first use; no filesystem access afterwards
+        """
+        current = self._current.get(name)
+        if current is not None:
+            return current
+        return self.reload(name)
+
+    def reload(self, name: str) -> Optional[TemplateVersion]:
+        """
+        Recompile a template from disk and swap it in if its source changed.
+        A template that fails to compile leaves the current version in place.
+        """
+        with self._lock:
+            current = self._current.get(name)
+            try:
+                loaded = _compile(name)
+            except Exception as e:
+                print(f"⚠️  Template {name} non compilato, resta la versione {current.version if current else '-'}: {e}")
+                if current is not None:
+                    # Il watcher non riprova finché il file non cambia di nuovo
+                    self._current[name] = current._replace(mtime=_mtime(name))
+                return self._current.get(name)
+            if loaded is None:
+                return current
+            if current is not None and current.version == loaded.version:
+                # Solo l'mtime è cambiato: nessuna nuova versione
+                self._current[name] = current._replace(mtime=loaded.mtime)
+                return self._current[name]
+            # Assegnazione di un solo riferimento: le richieste in corso finiscono con la versione precedente
+            self._current[name] = loaded
+            self._history.setdefault(name, deque(maxlen=_HISTORY)).appendleft((loaded.version, loaded.loaded_at))
+            if current is not None:
+                print(f"🔄 Template {name} aggiornato: {current.version} -> {loaded.version}")
+            return loaded
+
+    def reload_all(self, names: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {name: getattr(self.reload(name), 'version', None) for name in names}
+
+    def _changed(self) -> List[str]:
+        changed = []
+        for name, current in list(self._current.items()):
+            mtime = _mtime(name)
+            # File rimosso (mtime 0): resta la versione corrente
+            if mtime and mtime != current.mtime:
+                changed.append(name)
+        return changed
+
+    def _watch(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            for name in self._changed():
+                self.reload(name)
+
+    def start_watcher(self, interval: float) -> None:
+        """
+        Poll the loaded templates for changes in a daemon thread (one per worker process)
+        """
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="template-watcher", daemon=True)
+        self._watcher.start()
+        print(f"👀 Controllo modifiche ai template ogni {interval:g} s")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": name,
+                "version": current.version,
+                "compiled": not hasattr(current.template, 'environment'),
+                "loaded_at": current.loaded_at,
+                "history": [{"version": v, "loaded_at": t} for v, t in self._history.get(name, ())],
+            }
+            for name, current in sorted(self._current.items())
+        ]
+
+template_store = TemplateStore()
@@ -0,0 +1,155 @@
+"""
+API-key tenants with daily document and token quotas, accounted in an embedded SQLite database.
+
+Without a TENANTS_FILE every request belongs to the "default" tenant and no key or quota is enforced.
+"""
+
+import contextvars
+import hmac
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+import config
+
+class Tenant(NamedTuple):
+    name: str
+    api_key: str = ""
+    weight: float = 1.0
+    priority: str = 'interactive'
+    documents_per_day: int = 0  # 0 = illimitato
+    tokens_per_day: int = 0
+
+DEFAULT_TENANT = Tenant("default")
+
+@lru_cache(maxsize=1)
+def load_tenants() -> Tuple[Tenant, ...]:
+    """
+    Tenants from TENANTS_FILE: [{"name", "api_key", "weight", "priority", "documents_per_day", "tokens_per_day"}]
+    """
+    if not os.path.exists(config.TENANTS_FILE):
+        return ()
+    with open(config.TENANTS_FILE, 'r', encoding='utf-8') as f:
+        tenants = tuple(Tenant(**entry) for entry in json.load(f))
+    print(f"👥 {len(tenants)} tenant configurati da {config.TENANTS_FILE}")
+    return tenants
+
+def tenant_for_key(api_key: Optional[str]) -> Optional[Tenant]:
+    if not api_key:
+        return None
+    for tenant in load_tenants():
+        if hmac.compare_digest(api_key, tenant.api_key):
+            return tenant
+    return None
+
+# Tenant e priorità della richiesta corrente (propagati anche ai thread del threadpool)
+_current: contextvars.ContextVar[Tuple[Tenant, str]] = contextvars.ContextVar(
+    "tenant", default=(DEFAULT_TENANT, 'interactive')
+)
+
+def current_tenant() -> Tuple[Tenant, str]:
+    return _current.get()
+
+class UsageDB:
+    """Daily usage per tenant, shared by all the workers on one node"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "tenant TEXT NOT NULL, day TEXT NOT NULL, requests INTEGER NOT NULL DEFAULT 0, "
+            "documents INTEGER NOT NULL DEFAULT 0, tokens INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (tenant, day))"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, tenant: str, requests: int = 0, documents: int = 0, tokens: int = 0) -> None:
+        self._connect().execute(
+            "INSERT INTO usage (tenant, day, requests, documents, tokens) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (tenant, day) DO UPDATE SET requests = requests + excluded.requests, "
+            "documents = documents + excluded.documents, tokens = tokens + excluded.tokens",
+            (tenant, date.today().isoformat(), requests, documents, tokens)
+        )
+
+    def today(self, tenant: str) -> Dict[str, int]:
+        row = self._connect().execute(
+            "SELECT requests, documents, tokens FROM usage WHERE tenant = ? AND day = ?",
+            (tenant, date.today().isoformat())
+        ).fetchone()
+        return dict(zip(("requests", "documents", "tokens"), row or (0, 0, 0)))
+
+    def report(self, days: int = 7) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT tenant, day, requests, documents, tokens FROM usage "
+            "WHERE day >= ? ORDER BY day DESC, tenant",
+            ((date.today() - timedelta(days=days - 1)).isoformat(),)
+        ).fetchall()
+        return [dict(zip(("tenant", "day", "requests", "documents", "tokens"), row)) for row in rows]
+
+@lru_cache(maxsize=1)
+def get_usage_db() -> UsageDB:
+    return UsageDB(config.USAGE_DB)
+
+def record_usage(documents: int = 0, tokens: int = 0) -> None:
+    """
+    Account documents or LLM tokens to the current tenant
+    """
+    try:
+        get_usage_db().add(current_tenant()[0].name, documents=documents, tokens=tokens)
+    except sqlite3.Error as e:
+        print(f"⚠️  Contabilizzazione uso non riuscita: {e}")
+
+def quota_exceeded(tenant: Tenant) -> Optional[str]:
+    usage = get_usage_db().today(tenant.name)
+    if tenant.documents_per_day and usage["documents"] >= tenant.documents_per_day:
+        return f"Quota giornaliera di documenti esaurita ({tenant.documents_per_day})"
+    if tenant.tokens_per_day and usage["tokens"] >= tenant.tokens_per_day:
+        return f"Quota giornaliera di token AI esaurita ({tenant.tokens_per_day})"
+    return None
+
+async def tenant_middleware(request: Request, call_next):
+    """
+    Resolve the tenant from X-API-Key for the generation endpoints, enforce its quotas and set the
+    priority (X-Priority: batch lowers it; a tenant configured as batch can't raise it)
+    """
+    if request.method != "POST" or not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    tenant = DEFAULT_TENANT
+    if load_tenants():
+        tenant = tenant_for_key(request.headers.get("x-api-key"))
+        if tenant is None:
+            return JSONResponse(status_code=401, content={"detail": "API key mancante o non valida"})
+        exceeded = await run_in_threadpool(quota_exceeded, tenant)
+        if exceeded:
+            print(f"⛔ {exceeded} per il tenant {tenant.name}")
+            # Le quote ripartono a mezzanotte
+            now = datetime.now()
+            retry_after = int((datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds()) + 1
+            return JSONResponse(status_code=429, content={"detail": exceeded}, headers={"Retry-After": str(retry_after)})
+
+    priority = 'batch' if 'batch' in (tenant.priority, request.headers.get("x-priority", "").lower()) else 'interactive'
+    token = _current.set((tenant, priority))
+    try:
+        await run_in_threadpool(get_usage_db().add, tenant.name, requests=1)
+        return await call_next(request)
+    finally:
+        _current.reset(token)
@@ -0,0 +1,136 @@
+"""
+Per-request tracing with OpenTelemetry spans (optional dependency).
+
+With TRACING_EXPORTER=none (default) or without the opentelemetry packages installed,
+span() is a no-op and the requests only get an X-Trace-Id for log correlation.
+"""
+
+import json
+import os
+import re
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from fastapi import Request
+
+import config
+
+_tracer = None
+
+# Formato di un trace ID W3C: un X-Trace-Id del client in altro formato viene sostituito,
+# non rimandato tale e quale nella risposta
+_TRACE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+class _NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    # Gli attributi OTel accettano solo tipi primitivi e non ammettono None
+    return {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in attributes.items() if v is not None}
+
+def _file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class JsonLinesSpanExporter(SpanExporter):
+        """One JSON span per line, readable without a collector"""
+
+        def export(self, spans) -> SpanExportResult:
+            with open(path, 'a', encoding='utf-8') as f:
+                for s in spans:
+                    f.write(json.dumps(json.loads(s.to_json()), ensure_ascii=False) + '\n')
+            return SpanExportResult.SUCCESS
+
+    return JsonLinesSpanExporter()
+
+def setup_tracing() -> bool:
+    """
+    Configure the tracer provider for TRACING_EXPORTER (otlp, file, console)
+    """
+    global _tracer
+    if config.TRACING_EXPORTER == 'none':
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError as e:
+        print(f"⚠️  Tracing non disponibile ({e}): installa opentelemetry-sdk")
+        return False
+
+    if config.TRACING_EXPORTER == 'otlp':
+        # Endpoint da OTEL_EXPORTER_OTLP_ENDPOINT (default http://localhost:4318)
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    elif config.TRACING_EXPORTER == 'file':
+        os.makedirs(os.path.dirname(config.TRACING_FILE), exist_ok=True)
+        exporter = _file_exporter(config.TRACING_FILE)
+    else:
+        exporter = ConsoleSpanExporter()
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "praticai-api"}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("praticai")
+    print(f"🔭 Tracing attivo: exporter {config.TRACING_EXPORTER}")
+    return True
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Child span of the current request span, e.g. with span("pdf.render", documento="aa912"):
+    """
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+def set_attributes(**attributes: Any) -> None:
+    """
+    Add attributes to the current span (no-op when tracing is off)
+    """
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+async def tracing_middleware(request: Request, call_next):
+    """
+    Root span per request, continuing an incoming W3C traceparent; the trace ID goes back
+    in X-Trace-Id (and traceparent) so a slow response can be found in the collector
+    """
+    if _tracer is None:
+        trace_id = request.headers.get("x-trace-id", "")
+        response = await call_next(request)
+        response.headers["X-Trace-Id"] = trace_id if _TRACE_ID_RE.fullmatch(trace_id) else uuid.uuid4().hex
+        return response
+
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract, inject
+
+    with _tracer.start_as_current_span(
+        f"{request.method} {request.url.path}",
+        context=extract(request.headers),
+        kind=trace.SpanKind.SERVER,
+        attributes=_clean({
+            "http.method": request.method,
+            "http.target": request.url.path,
+            "http.request_content_length": request.headers.get("content-length"),
+        }),
+    ) as current:
+        response = await call_next(request)
+        current.set_attribute("http.status_code", response.status_code)
+        response.headers["X-Trace-Id"] = format(current.get_span_context().trace_id, '032x')
+        carrier: Dict[str, str] = {}
+        inject(carrier)
+        if "traceparent" in carrier:
+            response.headers["traceparent"] = carrier["traceparent"]
+        return response
@@ -0,0 +1,78 @@
+'use client'
+
+import { useState } from 'react'
+import { ChevronDown, ChevronRight, Loader2 } from 'lucide-react'
+
+import { apiClient } from '@/lib/api'
+import { GuideSectionSummary } from '@/types/api'
+
+interface GuideSectionsProps {
+  guida?: string
+  guidaId?: string
+  sezioni?: GuideSectionSummary[]
+}
+
+/**
+ * Guida AI divisa in sezioni: la prima arriva con la risposta,
+ * le altre vengono scaricate solo quando l'utente le apre
+ */
+export function GuideSections({ guida, guidaId, sezioni }: GuideSectionsProps) {
+  const [open, setOpen] = useState<Record<string, boolean>>(
+    sezioni?.length ? { [sezioni[0].id]: true } : {}
+  )
+  const [html, setHtml] = useState<Record<string, string>>(
+    Object.fromEntries((sezioni || []).filter(s => s.html).map(s => [s.id, s.html as string]))
+  )
+  const [loading, setLoading] = useState<string | null>(null)
+  const [error, setError] = useState<string | null>(null)
+
+  // Risposta senza sezioni: testo completo della guida
+  if (!guidaId || !sezioni?.length) {
+    return (
+      <div className="whitespace-pre-wrap text-sm leading-relaxed">
+        {guida || 'Guida non disponibile.'}
+      </div>
+    )
+  }
+
+  const toggle = async (sectionId: string) => {
+    const isOpen = !open[sectionId]
+    setOpen(prev => ({ ...prev, [sectionId]: isOpen }))
+    if (!isOpen || html[sectionId]) return
+
+    setLoading(sectionId)
+    setError(null)
+    try {
+      const section = await apiClient.getGuideSection(guidaId, sectionId)
+      setHtml(prev => ({ ...prev, [sectionId]: section.html }))
+    } catch {
+      setError('Impossibile caricare questa sezione. Riprova.')
+      setOpen(prev => ({ ...prev, [sectionId]: false }))
+    } finally {
+      setLoading(null)
+    }
+  }
+
+  return (
+    <div className="divide-y divide-gray-200">
+      {sezioni.map(section => (
+        <div key={section.id} className="py-2">
+          <button
+            type="button"
+            onClick={() => toggle(section.id)}
+            className="flex w-full items-center gap-2 py-2 text-left font-semibold text-gray-900 hover:text-purple-700"
+          >
+            {open[section.id] ? <ChevronDown className="w-4 h-4" /> : <ChevronRight className="w-4 h-4" />}
+            {section.title}
+            {loading === section.id && <Loader2 className="w-4 h-4 animate-spin" />}
+          </button>
+          {open[section.id] && html[section.id] && (
+            // HTML generato dal backend con escape del testo del modello
+            <div className="ai-guide text-sm pl-6" dangerouslySetInnerHTML={{ __html: html[section.id] }} />
+          )}
+        </div>
+      ))}
+      {error && <p className="pt-2 text-sm text-red-600">{error}</p>}
+    </div>
+  )
+}
@@ -8,6 +8,7 @@ import { Label } from '@/components/ui/label'
 import { Textarea } from '@/components/ui/textarea'
 import { AlertCircle, Download, FileText, Loader2, CheckCircle, User, MapPin, Calendar, Bot, Check, AlertTriangle, Info } from 'lucide-react'
 import { Alert, AlertDescription } from '@/components/ui/alert'
+import { GuideSections } from '@/components/common/GuideSections'
 
 // Import dei nostri tipi e hooks
 import { AutocertificazioneFormData } from '@/lib/validations'
@@ -111,11 +112,8 @@ export default function AutocertificazioneForm() {
 
   const handleDownload = async () => {
     if (result?.pdfUrl) {
-      const fileId = result.pdfUrl.split('/').pop()
-      if (fileId) {
-        const filename = `autocertificazione_residenza_${formData.cognome}_${formData.nome}.pdf`
-        await downloadPdf(fileId, filename)
-      }
+      const filename = `autocertificazione_residenza_${formData.cognome}_${formData.nome}.pdf`
+      await downloadPdf(result.pdfUrl, filename)
     }
   }
 
@@ -208,11 +206,7 @@ export default function AutocertificazioneForm() {
                 </p>
               </CardHeader>
               <CardContent className="p-6">
-                <div className="ai-guide">
-                  <div className="whitespace-pre-wrap text-sm leading-relaxed">
-                    {result.guida}
-                  </div>
-                </div>
+                <GuideSections guida={result.guida} guidaId={result.guidaId} sezioni={result.sezioni} />
               </CardContent>
             </Card>
           </div>
@@ -8,6 +8,7 @@ import { Label } from '@/components/ui/label'
 import { Textarea } from '@/components/ui/textarea'
 import { AlertCircle, Download, FileText, Loader2, CheckCircle, User, Bot, Check, AlertTriangle, Info, Baby } from 'lucide-react'
 import { Alert, AlertDescription } from '@/components/ui/alert'
+import { GuideSections } from '@/components/common/GuideSections'
 
 // Import dei nostri tipi e hooks
 import { AutocertificazioneNascitaFormData } from '@/lib/validations'
@@ -118,11 +119,8 @@ export default function AutocertificazioneNascitaForm() {
 
   const handleDownload = async () => {
     if (result?.pdfUrl) {
-      const fileId = result.pdfUrl.split('/').pop()
-      if (fileId) {
-        const filename = `autocertificazione_nascita_${formData.cognomeNato}_${formData.nomeNato}.pdf`
-        await downloadPdf(fileId, filename)
-      }
+      const filename = `autocertificazione_nascita_${formData.cognomeNato}_${formData.nomeNato}.pdf`
+      await downloadPdf(result.pdfUrl, filename)
     }
   }
 
@@ -212,20 +210,7 @@ export default function AutocertificazioneNascitaForm() {
                 </CardTitle>
               </CardHeader>
               <CardContent className="p-6">
-                <div className="prose prose-sm max-w-none">
-                  {result.guida ? (
-                    <div 
-                      className="whitespace-pre-wrap text-gray-700 leading-relaxed"
-                      dangerouslySetInnerHTML={{ 
-                        __html: result.guida.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>') 
-                      }}
-                    />
-                  ) : (
-                    <p className="text-gray-600">
-                      Nessuna guida disponibile al momento. Il PDF è stato generato correttamente.
-                    </p>
-                  )}
-                </div>
+                <GuideSections guida={result.guida} guidaId={result.guidaId} sezioni={result.sezioni} />
               </CardContent>
             </Card>
           </div>
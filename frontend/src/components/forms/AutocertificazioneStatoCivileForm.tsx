@@ -9,6 +9,7 @@ import { Textarea } from '@/components/ui/textarea'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
 import { AlertCircle, Download, FileText, Loader2, CheckCircle, User, MapPin, Calendar, Bot, Check, AlertTriangle, Info, Heart } from 'lucide-react'
 import { Alert, AlertDescription } from '@/components/ui/alert'
+import { GuideSections } from '@/components/common/GuideSections'
 
 // Import dei nostri tipi e hooks
 import type { AutocertificazioneStatoCivileRequest } from '@/types/api'
@@ -146,11 +147,8 @@ export default function AutocertificazioneStatoCivileForm() {
 
   const handleDownload = async () => {
     if (result?.pdfUrl) {
-      const fileId = result.pdfUrl.split('/').pop()
-      if (fileId) {
-        const filename = `autocertificazione_stato_civile_${formData.cognome}_${formData.nome}.pdf`
-        await downloadPdf(fileId, filename)
-      }
+      const filename = `autocertificazione_stato_civile_${formData.cognome}_${formData.nome}.pdf`
+      await downloadPdf(result.pdfUrl, filename)
     }
   }
 
@@ -406,11 +404,7 @@ export default function AutocertificazioneStatoCivileForm() {
                 </CardTitle>
               </CardHeader>
               <CardContent className="p-6">
-                <div className="prose prose-sm max-w-none">
-                  <div className="whitespace-pre-wrap text-gray-700 leading-relaxed">
-                    {result.guida || 'Guida non disponibile.'}
-                  </div>
-                </div>
+                <GuideSections guida={result.guida} guidaId={result.guidaId} sezioni={result.sezioni} />
               </CardContent>
             </Card>
           </div>
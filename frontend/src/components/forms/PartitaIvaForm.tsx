@@ -9,6 +9,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { Textarea } from '@/components/ui/textarea'
 import { AlertCircle, Download, FileText, Loader2, CheckCircle, User, MapPin, Mail, Briefcase, Calendar, Bot, ExternalLink, Info, AlertTriangle, Check } from 'lucide-react'
 import { Alert, AlertDescription } from '@/components/ui/alert'
+import { GuideSections } from '@/components/common/GuideSections'
 
 // Import dei nostri nuovi tipi e hooks
 import { PartitaIvaFormData } from '@/lib/validations'
@@ -119,11 +120,8 @@ export default function PartitaIvaForm() {
 
   const handleDownload = async () => {
     if (result?.pdfUrl) {
-      const fileId = result.pdfUrl.split('/').pop()
-      if (fileId) {
-        const filename = `modulo_aa912_${formData.cognome}_${formData.nome}.pdf`
-        await downloadPdf(fileId, filename)
-      }
+      const filename = `modulo_aa912_${formData.cognome}_${formData.nome}.pdf`
+      await downloadPdf(result.pdfUrl, filename)
     }
   }
 
@@ -216,11 +214,7 @@ export default function PartitaIvaForm() {
                 </p>
               </CardHeader>
               <CardContent className="p-6">
-                <div className="ai-guide">
-                  <div className="whitespace-pre-wrap text-sm leading-relaxed">
-                    {result.guida}
-                  </div>
-                </div>
+                <GuideSections guida={result.guida} guidaId={result.guidaId} sezioni={result.sezioni} />
               </CardContent>
             </Card>
           </div>
@@ -78,12 +78,12 @@ export function usePartitaIva() {
 export function useDownload() {
   const [downloading, setDownloading] = useState(false)
 
-  const downloadPdf = useCallback(async (fileId: string, filename: string) => {
+  const downloadPdf = useCallback(async (pdfUrl: string, filename: string) => {
     try {
       setDownloading(true)
       const { apiClient } = await import('@/lib/api')
       
-      const blob = await apiClient.downloadPdf(fileId)
+      const blob = await apiClient.downloadPdf(pdfUrl)
       
       // Crea link temporaneo per download
       const url = window.URL.createObjectURL(blob)
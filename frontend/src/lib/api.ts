@@ -11,7 +11,8 @@ import {
   AutocertificazioneStatoCivileResponse,
   ApiError, 
   ApiCallOptions,
-  BaseApiResponse 
+  BaseApiResponse,
+  GuideSection 
 } from '@/types/api'
 
 /**
@@ -124,14 +125,38 @@ class PraticAIApiClient {
     return new Promise(resolve => setTimeout(resolve, ms))
   }
 
+  /**
+   * Header Idempotency-Key: una chiave per ogni invio del form, riusata dai retry
+   * così il backend non rigenera PDF e guida per la stessa richiesta
+   */
+  private idempotencyHeaders(): Record<string, string> {
+    return { 'Idempotency-Key': this.randomKey() }
+  }
+
+  /**
+   * UUID v4 casuale: crypto.randomUUID esiste solo nei contesti sicuri (https o localhost),
+   * crypto.getRandomValues anche su http
+   */
+  private randomKey(): string {
+    if (typeof crypto.randomUUID === 'function') {
+      return crypto.randomUUID()
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16))
+    bytes[6] = (bytes[6] & 0x0f) | 0x40 // versione 4
+    bytes[8] = (bytes[8] & 0x3f) | 0x80 // variante RFC 4122
+    const hex = Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('')
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`
+  }
+
   // ===== METODI API SPECIFICI =====
 
   /**
    * Genera documenti per Partita IVA
    */
   async generatePartitaIva(data: PartitaIvaRequest): Promise<PartitaIvaResponse> {
-    return this.request<PartitaIvaResponse>('/api/generate', {
+    return this.request<PartitaIvaResponse>('/api/generate?guida=sezioni', {
       method: 'POST',
+      headers: this.idempotencyHeaders(),
       body: JSON.stringify(data),
     })
   }
@@ -140,8 +165,9 @@ class PraticAIApiClient {
    * Genera autocertificazione di residenza
    */
   async generateAutocertificazione(data: AutocertificazioneRequest): Promise<AutocertificazioneResponse> {
-    return this.request<AutocertificazioneResponse>('/api/autocertificazione', {
+    return this.request<AutocertificazioneResponse>('/api/autocertificazione?guida=sezioni', {
       method: 'POST',
+      headers: this.idempotencyHeaders(),
       body: JSON.stringify(data),
     })
   }
@@ -150,8 +176,9 @@ class PraticAIApiClient {
    * Genera autocertificazione di nascita
    */
   async generateAutocertificazioneNascita(data: AutocertificazioneNascitaRequest): Promise<AutocertificazioneNascitaResponse> {
-    return this.request<AutocertificazioneNascitaResponse>('/api/autocertificazione-nascita', {
+    return this.request<AutocertificazioneNascitaResponse>('/api/autocertificazione-nascita?guida=sezioni', {
       method: 'POST',
+      headers: this.idempotencyHeaders(),
       body: JSON.stringify(data),
     })
   }
@@ -160,17 +187,26 @@ class PraticAIApiClient {
    * Genera autocertificazione di stato civile
    */
   async generateAutocertificazioneStatoCivile(data: AutocertificazioneStatoCivileRequest): Promise<AutocertificazioneStatoCivileResponse> {
-    return this.request<AutocertificazioneStatoCivileResponse>('/api/autocertificazione-stato-civile', {
+    return this.request<AutocertificazioneStatoCivileResponse>('/api/autocertificazione-stato-civile?guida=sezioni', {
       method: 'POST',
+      headers: this.idempotencyHeaders(),
       body: JSON.stringify(data),
     })
   }
 
   /**
-   * Scarica PDF generato
+   * Sezione della guida, caricata solo quando l'utente la apre
+   */
+  async getGuideSection(guideId: string, sectionId: string): Promise<GuideSection> {
+    return this.request<GuideSection>(`/api/guide/${guideId}/${sectionId}`)
+  }
+
+  /**
+   * Scarica PDF generato dal link firmato restituito in pdfUrl (relativo o assoluto, es. CDN)
    */
-  async downloadPdf(fileId: string): Promise<Blob> {
-    const response = await fetch(`${this.baseUrl}/api/download/${fileId}`)
+  async downloadPdf(pdfUrl: string): Promise<Blob> {
+    const url = /^https?:\/\//.test(pdfUrl) ? pdfUrl : `${this.baseUrl}${pdfUrl}`
+    const response = await fetch(url)
     
     if (!response.ok) {
       throw new ApiError(`Errore download: ${response.status}`, response.status)
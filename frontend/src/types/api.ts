@@ -87,22 +87,41 @@ export interface BaseApiResponse {
   error?: string
 }
 
-export interface PartitaIvaResponse extends BaseApiResponse {
+// Guida resa lato server e divisa in sezioni (richieste con ?guida=sezioni)
+export interface GuideSectionSummary {
+  id: string
+  title: string
+  size: number
+  html?: string // presente solo per la prima sezione
+}
+
+export interface GuideSection {
+  id: string
+  title: string
+  html: string
+}
+
+export interface GuideSectionsResponse {
+  guidaId?: string
+  sezioni?: GuideSectionSummary[]
+}
+
+export interface PartitaIvaResponse extends BaseApiResponse, GuideSectionsResponse {
   guida?: string
   pdfUrl?: string
 }
 
-export interface AutocertificazioneResponse extends BaseApiResponse {
+export interface AutocertificazioneResponse extends BaseApiResponse, GuideSectionsResponse {
   guida?: string
   pdfUrl?: string
 }
 
-export interface AutocertificazioneNascitaResponse extends BaseApiResponse {
+export interface AutocertificazioneNascitaResponse extends BaseApiResponse, GuideSectionsResponse {
   guida?: string
   pdfUrl?: string
 }
 
-export interface AutocertificazioneStatoCivileResponse extends BaseApiResponse {
+export interface AutocertificazioneStatoCivileResponse extends BaseApiResponse, GuideSectionsResponse {
   guida?: string
   pdfUrl?: string
 }
@@ -0,0 +1,25 @@
+"""
+Unit tests of the backend services (run with `python -m pytest test`): the backend modules are imported
+from backend/, with all the state files in a temporary directory
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp = tempfile.mkdtemp(prefix='praticai-test-')
+os.environ.update({
+    'OUTPUT_DIR': _tmp,
+    'STATE_BACKEND': 'memory',
+    'ARCHIVE_DB': os.path.join(_tmp, 'archive.db'),
+    'USAGE_DB': os.path.join(_tmp, 'usage.db'),
+    'TENANTS_FILE': os.path.join(_tmp, 'tenants.json'),
+    'TRACING_EXPORTER': 'none',
+    'WARM_UP': 'false',
+})
+
+# test_api.py chiama un server in esecuzione: non fa parte dei test unitari
+collect_ignore = ['test_api.py', 'benchmark_templates.py', 'fake_batch_api.py']
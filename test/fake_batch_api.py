@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Stand-in locale della Batch API del provider (files + batches), per provare le guide differite
+senza API key reale né costi. Ogni batch viene completato subito con una guida finta per riga;
+le righe il cui prompt contiene "FAIL" tornano come errore.
+
+Uso:
+    python test/fake_batch_api.py [porta]
+    OPENAI_API_KEY=test OPENAI_BASE_URL=http://127.0.0.1:8900/v1 \\
+        python backend/bulk.py richieste.jsonl --tipo partita_iva --guide --guide-mode batch --batch-poll-interval 1
+"""
+
+import json
+import sys
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+
+app = FastAPI()
+
+FILES = {}
+BATCHES = {}
+
+def _file_object(file_id: str, purpose: str, size: int):
+    return {
+        "id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+        "filename": f"{file_id}.jsonl", "purpose": purpose, "status": "processed",
+    }
+
+def _store_file(content: str, purpose: str) -> str:
+    file_id = f"file-{uuid.uuid4().hex[:12]}"
+    FILES[file_id] = (content, purpose)
+    return file_id
+
+def _run_batch(content: str):
+    output, errors = [], []
+    for line in content.splitlines():
+        request = json.loads(line)
+        prompt = request["body"]["messages"][-1]["content"]
+        if "FAIL" in prompt:
+            errors.append({
+                "id": f"req-{uuid.uuid4().hex[:8]}", "custom_id": request["custom_id"],
+                "response": {"status_code": 400, "body": {"error": {"message": "richiesta rifiutata dallo stand-in"}}},
+                "error": None,
+            })
+            continue
+        output.append({
+            "id": f"req-{uuid.uuid4().hex[:8]}", "custom_id": request["custom_id"],
+            "response": {"status_code": 200, "body": {
+                "object": "chat.completion", "model": request["body"]["model"],
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                    "role": "assistant", "content": f"# Guida ({request['custom_id']})\n\nGuida di prova.",
+                }}],
+            }},
+            "error": None,
+        })
+    return output, errors
+
+@app.post("/v1/files")
+async def create_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    content = (await file.read()).decode("utf-8")
+    file_id = _store_file(content, purpose)
+    return _file_object(file_id, purpose, len(content))
+
+@app.get("/v1/files/{file_id}/content", response_class=PlainTextResponse)
+def file_content(file_id: str):
+    if file_id not in FILES:
+        raise HTTPException(status_code=404, detail="file non trovato")
+    return FILES[file_id][0]
+
+@app.post("/v1/batches")
+def create_batch(body: dict):
+    if body.get("input_file_id") not in FILES:
+        raise HTTPException(status_code=400, detail="input_file_id non valido")
+    output, errors = _run_batch(FILES[body["input_file_id"]][0])
+    batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+    now = int(time.time())
+    BATCHES[batch_id] = {
+        "id": batch_id, "object": "batch", "endpoint": body["endpoint"], "errors": None,
+        "input_file_id": body["input_file_id"], "completion_window": body["completion_window"],
+        "status": "completed", "created_at": now, "completed_at": now,
+        "output_file_id": _store_file('\n'.join(json.dumps(o) for o in output), "batch_output") if output else None,
+        "error_file_id": _store_file('\n'.join(json.dumps(e) for e in errors), "batch_output") if errors else None,
+        "request_counts": {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)},
+    }
+    return BATCHES[batch_id]
+
+@app.get("/v1/batches/{batch_id}")
+def retrieve_batch(batch_id: str):
+    if batch_id not in BATCHES:
+        raise HTTPException(status_code=404, detail="batch non trovato")
+    return BATCHES[batch_id]
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8900)
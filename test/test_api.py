@@ -7,7 +7,7 @@ def test_generate_endpoint():
     test_data = {
         "nome": "Mario",
         "cognome": "Rossi",
-        "codiceFiscale": "RSSMRA80A01H501X",
+        "codiceFiscale": "RSSMRA80A01H501U",
         "indirizzo": "Via Roma",
         "civico": "123",
         "cap": "20100",
@@ -32,5 +32,41 @@ def test_generate_endpoint():
         print(f"❌ Test fallito: {response.status_code}")
         print(response.text)
 
+def test_bundle_endpoint():
+    url = "http://localhost:8000/api/bundle"
+    
+    test_data = {
+        "documenti": ["partita_iva", "autocertificazione", "stato_civile"],
+        "formato": "pdf",
+        "nome": "Mario",
+        "cognome": "Rossi",
+        "codiceFiscale": "RSSMRA80A01H501U",
+        "luogoNascita": "Roma",
+        "dataNascita": "1980-01-01",
+        "indirizzo": "Via Roma",
+        "civico": "123",
+        "cap": "20100",
+        "comune": "Milano",
+        "provincia": "MI",
+        "email": "mario.rossi@email.com",
+        "codiceAteco": "62.01.00",
+        "descrizioneAttivita": "Sviluppo software e applicazioni web",
+        "regimeFiscale": "forfettario",
+        "dataInizio": "2024-01-15",
+        "statoCivile": "celibe_nubile"
+    }
+    
+    response = requests.post(url, json=test_data)
+    
+    if response.status_code == 200:
+        result = response.json()
+        print("✅ Test bundle superato!")
+        print(f"Guida unica generata: {len(result.get('guida', ''))} caratteri")
+        print(f"Bundle URL: {result.get('pdfUrl')}")
+    else:
+        print(f"❌ Test bundle fallito: {response.status_code}")
+        print(response.text)
+
 if __name__ == "__main__":
-    test_generate_endpoint()
\ No newline at end of file
+    test_generate_endpoint()
+    test_bundle_endpoint()
\ No newline at end of file
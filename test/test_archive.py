@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+from services.archive import DocumentArchive
+
+CF = 'RSSMRA80A01H501U'
+
+# Dati minimi di ciascun tipo di documento archiviato, con i campi identificativi del suo modello
+DOCUMENTS = {
+    'aa912': {'nome': 'Mario', 'cognome': 'Rossi', 'codiceFiscale': CF},
+    'autocertificazione': {'nome': 'Mario', 'cognome': 'Rossi', 'codiceFiscale': CF},
+    'autocertificazione_nascita': {
+        'nomeDichiarante': 'Mario', 'cognomeDichiarante': 'Rossi', 'codiceFiscaleDichiarante': CF,
+        'nomeNato': 'Luca', 'cognomeNato': 'Rossi',
+    },
+    'stato_civile': {'nome': 'Mario', 'cognome': 'Rossi', 'codiceFiscale': CF},
+    'bundle': {'nome': 'Mario', 'cognome': 'Rossi', 'codiceFiscale': CF, 'documenti': ['partita_iva']},
+}
+
+@pytest.fixture
+def archive(tmp_path):
+    return DocumentArchive(str(tmp_path / 'archive.db'))
+
+def _add(archive, tmp_path, document_type, data, name=None):
+    path = tmp_path / (name or f"{document_type}_test.pdf")
+    path.write_bytes(b'%PDF-1.4 test')
+    archive.add(str(path), document_type, data, template_version='abc123')
+    return os.path.basename(path)
+
+@pytest.mark.parametrize('document_type', DOCUMENTS)
+def test_search_by_identity_for_each_document_type(archive, tmp_path, document_type):
+    storage_key = _add(archive, tmp_path, document_type, DOCUMENTS[document_type])
+
+    by_cf, _ = archive.search(codice_fiscale=CF.lower())
+    by_name, _ = archive.search(nome='  rossi   MARIO ')
+    by_type, _ = archive.search(document_type=document_type)
+
+    for documents in (by_cf, by_name, by_type):
+        assert [d['storage_key'] for d in documents] == [storage_key]
+    assert by_cf[0]['template_version'] == 'abc123'
+    assert by_cf[0]['size'] == len(b'%PDF-1.4 test')
+
+def test_search_doesnt_match_other_identities(archive, tmp_path):
+    _add(archive, tmp_path, 'autocertificazione', DOCUMENTS['autocertificazione'])
+    assert archive.search(codice_fiscale='VRDGPP80A01H501X')[0] == []
+    assert archive.search(document_type='stato_civile')[0] == []
+
+def test_keyset_pagination(archive, tmp_path):
+    keys = [_add(archive, tmp_path, 'aa912', DOCUMENTS['aa912'], f"aa912_{i}.pdf") for i in range(5)]
+
+    pages, cursor = [], None
+    while True:
+        documents, cursor = archive.search(codice_fiscale=CF, limit=2, cursor=cursor)
+        pages.append([d['storage_key'] for d in documents])
+        if cursor is None:
+            break
+
+    assert pages == [keys[4:2:-1], keys[2:0:-1], keys[:1]]
+
+def test_date_range_and_remove(archive, tmp_path):
+    storage_key = _add(archive, tmp_path, 'aa912', DOCUMENTS['aa912'])
+    created_at = archive.search()[0][0]['created_at']
+
+    assert archive.search(since=created_at + 1)[0] == []
+    assert len(archive.search(since=created_at - 1, until=created_at + 1)[0]) == 1
+
+    archive.remove(storage_key)
+    assert archive.search()[0] == []
@@ -0,0 +1,31 @@
+import pytest
+
+from services.ateco import lookup_ateco, normalize_ateco_code, search_ateco, validate_codice_ateco
+
+@pytest.mark.parametrize('query', ['62', '62.', '62 1', '6210'])
+def test_code_prefix_search(query):
+    results = search_ateco(query, limit=50)
+    prefix = normalize_ateco_code(query)
+    assert results
+    assert all(e.codice.startswith(prefix) for e in results)
+    assert [e.codice for e in results] == sorted(e.codice for e in results)
+
+def test_code_prefix_search_filters_edition_and_limit():
+    assert search_ateco('62.01') == [lookup_ateco('62.01.00')]
+    assert all(e.edizione == '2025' for e in search_ateco('62', edizione='2025'))
+    assert len(search_ateco('01', limit=3)) == 3
+    assert search_ateco('99.99') == []
+
+def test_text_search_matches_word_prefixes():
+    results = search_ateco('softw ediz', limit=50)
+    assert {e.codice for e in results} == {'58.19.00', '58.29.00', '62.01.00'}
+    assert all('softw' in e.descrizione.lower() for e in results)
+    assert search_ateco('maniscalc')[0].codice == '01.62.01'
+    assert search_ateco('xyzxyz') == []
+
+def test_lookup_prefers_the_latest_edition():
+    assert lookup_ateco('016201').edizione == '2025'
+    assert lookup_ateco('01.62.01', edizione='2007').edizione == '2007'
+    assert validate_codice_ateco('621000') == '62.10.00'
+    with pytest.raises(ValueError):
+        validate_codice_ateco('62.01')
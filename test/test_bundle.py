@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from models.schemas import BundleRequest
+from routes import bundle as bundle_route
+from services import bundle
+
+DATA = {
+    "nome": "Mario",
+    "cognome": "Rossi",
+    "codiceFiscale": "RSSMRA80A01H501U",
+    "indirizzo": "Via Roma",
+    "civico": "123",
+    "cap": "20100",
+    "comune": "Milano",
+    "provincia": "MI",
+    "codiceAteco": "62.01.00",
+    "descrizioneAttivita": "Sviluppo software e applicazioni web",
+    "regimeFiscale": "forfettario",
+    "dataInizio": "2024-01-15",
+    "email": "mario.rossi@email.com",
+    "luogoNascita": "Roma",
+    "dataNascita": "1980-01-01",
+}
+
+def test_bundle_accepts_known_documents():
+    request = BundleRequest(documenti=["partita_iva", "autocertificazione"], **DATA)
+    assert request.documenti == ["partita_iva", "autocertificazione"]
+
+@pytest.mark.parametrize("documenti", [[], ["partita_iva", "isee"], ["autocertificazione", "autocertificazione"]])
+def test_bundle_rejects_empty_unknown_or_duplicate_documents(documenti):
+    with pytest.raises(ValidationError):
+        BundleRequest(documenti=documenti, **DATA)
+
+def test_partial_render_failure_removes_written_pdfs(monkeypatch, tmp_path):
+    def fake_render(documento, data, output_path):
+        if documento == "autocertificazione":
+            return None
+        with open(output_path, "wb") as f:
+            f.write(b"%PDF-1.4")
+        return "v1"
+
+    monkeypatch.setattr(bundle, "_render_pdf", fake_render)
+    monkeypatch.setattr(bundle_route, "cached_guide", lambda *args: "guida")
+    monkeypatch.setattr(bundle_route.config, "OUTPUT_DIR", str(tmp_path))
+    request = BundleRequest(documenti=["partita_iva", "autocertificazione"], **DATA)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(bundle_route.build_bundle_documents(request))
+    assert exc.value.status_code == 500
+    assert "autocertificazione" in exc.value.detail
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,136 @@
+import types
+
+import httpx
+import openai
+import pytest
+
+from ai import pipeline
+from services import circuit_breaker
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(circuit_breaker, 'time', types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def _breaker() -> CircuitBreaker:
+    return CircuitBreaker("test", failure_rate=0.5, min_calls=4, window_seconds=60, slow_call_seconds=5, open_seconds=30)
+
+def test_opens_on_failure_rate_after_min_calls(clock):
+    breaker = _breaker()
+    for failed in (True, True, False):
+        breaker.before_call()
+        breaker.record(0.1, failed=failed)
+    assert breaker.state == CLOSED  # meno di min_calls chiamate
+
+    breaker.before_call()
+    breaker.record(0.1, failed=True)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(6.0, failed=False)
+    assert breaker.state == OPEN
+
+def test_old_calls_leave_the_window(clock):
+    breaker = _breaker()
+    for _ in range(3):
+        breaker.record(0.1, failed=True)
+    clock.value += 61
+    breaker.record(0.1, failed=True)
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {"state": CLOSED, "calls": 1, "failures": 1}
+
+@pytest.mark.parametrize("probe_failed, state", [(False, CLOSED), (True, OPEN)])
+def test_half_open_lets_one_probe_through(clock, probe_failed, state):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(0.1, failed=True)
+
+    clock.value += 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # la prova è ancora in corso
+
+    breaker.record(0.1, failed=probe_failed)
+    assert breaker.state == state
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+def _status_error(cls, status: int) -> openai.APIStatusError:
+    return cls("error", response=httpx.Response(status, request=_REQUEST), body=None)
+
+@pytest.mark.parametrize("error, failure", [
+    (openai.APITimeoutError(request=_REQUEST), True),
+    (openai.APIConnectionError(request=_REQUEST), True),
+    (_status_error(openai.RateLimitError, 429), True),
+    (_status_error(openai.InternalServerError, 503), True),
+    (_status_error(openai.BadRequestError, 400), False),
+    (_status_error(openai.AuthenticationError, 401), False),
+    (ValueError("risposta non valida"), False),
+])
+def test_only_provider_failures_count(error, failure):
+    assert pipeline._provider_failure(error) is failure
+
+def test_rejected_requests_dont_open_the_circuit(clock, monkeypatch):
+    breaker = _breaker()
+    monkeypatch.setattr(pipeline, 'llm_breaker', breaker)
+
+    def create(**kwargs):
+        raise _status_error(openai.BadRequestError, 400)
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    for _ in range(5):
+        with pytest.raises(openai.BadRequestError):
+            pipeline._complete(client, "system", "user", 10)
+    assert breaker.stats() == {"state": CLOSED, "calls": 5, "failures": 0}
+
+def _half_open(breaker: CircuitBreaker, clock) -> None:
+    for _ in range(4):
+        breaker.record(0.1, failed=True)
+    clock.value += 30
+
+def test_probe_released_when_the_call_fails_before_the_provider(clock, monkeypatch):
+    breaker = _breaker()
+    monkeypatch.setattr(pipeline, 'llm_breaker', breaker)
+    _half_open(breaker, clock)
+
+    def broken_body(*args):
+        raise KeyError("max_tokens")
+
+    monkeypatch.setattr(pipeline, '_completion_body', broken_body)
+    with pytest.raises(KeyError):
+        pipeline._complete(types.SimpleNamespace(), "system", "user", 10)
+
+    # La prova non è stata consumata: la prossima chiamata può farla
+    assert breaker.state == HALF_OPEN
+    assert breaker.before_call() is True
+
+def test_probe_taken_after_waiting_for_the_llm_slot(clock, monkeypatch):
+    from contextlib import contextmanager
+
+    breaker = _breaker()
+    monkeypatch.setattr(pipeline, 'llm_breaker', breaker)
+    _half_open(breaker, clock)
+    seen = []
+
+    @contextmanager
+    def slot(stage):
+        seen.append(breaker._probe_in_flight)
+        yield
+
+    monkeypatch.setattr(pipeline, 'stage_slot', slot)
+    response = types.SimpleNamespace(
+        usage=None,
+        choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=" guida "))],
+    )
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=lambda **kw: response)))
+
+    assert pipeline._complete(client, "system", "user", 10) == "guida"
+    assert seen == [False]
+    assert breaker.state == CLOSED
@@ -0,0 +1,39 @@
+import pytest
+
+from services.codice_fiscale import (
+    check_codice_fiscale_matches,
+    compute_check_character,
+    decode_omocodia,
+    validate_codice_fiscale,
+)
+
+# Mario Rossi, nato a Roma (H501) il 1° gennaio 1980
+CF = 'RSSMRA80A01H501U'
+# Stessa persona in caso di omocodia: prima solo l'ultima cifra, poi tutte le cifre sostituite
+CF_OMOCODICO = 'RSSMRA80A01H50MM'
+CF_OMOCODICO_PIENO = 'RSSMRAULALMH5LMI'
+
+def test_check_character():
+    assert compute_check_character(CF[:15]) == 'U'
+    assert validate_codice_fiscale(CF.lower()) == CF
+
+def test_wrong_check_character_is_rejected():
+    with pytest.raises(ValueError, match='carattere di controllo'):
+        validate_codice_fiscale(CF[:15] + 'A')
+
+@pytest.mark.parametrize('cf', [CF_OMOCODICO, CF_OMOCODICO_PIENO])
+def test_omocodia(cf):
+    assert validate_codice_fiscale(cf) == cf
+    assert decode_omocodia(cf) == CF[:15] + cf[15]
+    check_codice_fiscale_matches(cf, 'Roma (RM)', '1980-01-01')
+
+def test_unknown_comune_is_rejected():
+    cf = 'RSSMRA80A01Z999'
+    with pytest.raises(ValueError, match='codice catastale'):
+        validate_codice_fiscale(cf + compute_check_character(cf))
+
+def test_birth_data_mismatch():
+    with pytest.raises(ValueError, match='luogo di nascita'):
+        check_codice_fiscale_matches(CF, 'Milano (MI)', None)
+    with pytest.raises(ValueError, match='data di nascita'):
+        check_codice_fiscale_matches(CF, None, '1980-02-01')
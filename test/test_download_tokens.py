@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+from routes.files import router as files_router
+from services import download_tokens
+from services.download_tokens import (
+    ExpiredDownloadToken, InvalidDownloadToken, _b64decode, _b64encode, sign_download, verify_download,
+)
+
+def _with_claims(token: str, **changes) -> str:
+    # Cambia i dati del token lasciando la firma originale
+    payload, _, signature = token.partition('.')
+    claims = json.loads(_b64decode(payload))
+    claims.update(changes)
+    return f"{_b64encode(json.dumps(claims).encode('utf-8'))}.{signature}"
+
+def test_round_trip():
+    claims = verify_download(sign_download("/tmp/out/partita_iva_abc.pdf", "partita_iva", ttl=60))
+    assert claims.storage_key == "partita_iva_abc.pdf"
+    assert claims.document_type == "partita_iva"
+
+def test_expired_token():
+    with pytest.raises(ExpiredDownloadToken):
+        verify_download(sign_download("doc.pdf", "partita_iva", ttl=-1))
+
+@pytest.mark.parametrize("changes", [
+    {"k": "altro_documento.pdf"},
+    {"t": "bundle"},
+    {"e": 4102444800},  # scadenza allungata
+])
+def test_tampered_claims_are_rejected(changes):
+    token = sign_download("doc.pdf", "partita_iva", ttl=60)
+    with pytest.raises(InvalidDownloadToken) as raised:
+        verify_download(_with_claims(token, **changes))
+    assert not isinstance(raised.value, ExpiredDownloadToken)
+
+@pytest.mark.parametrize("mangle", [
+    lambda token: token[:-2] + ('AA' if not token.endswith('AA') else 'BB'),
+    lambda token: token.partition('.')[0],
+    lambda token: token + 'è',
+    lambda token: '',
+])
+def test_bad_signatures_are_rejected(mangle):
+    with pytest.raises(InvalidDownloadToken):
+        verify_download(mangle(sign_download("doc.pdf", "partita_iva", ttl=60)))
+
+def test_token_signed_with_another_secret(monkeypatch):
+    token = sign_download("doc.pdf", "partita_iva", ttl=60)
+    monkeypatch.setattr(download_tokens, '_secret', lambda: b'altra chiave')
+    with pytest.raises(InvalidDownloadToken):
+        verify_download(token)
+
+@pytest.mark.parametrize("storage_key", ["../etc/passwd", "sub/doc.pdf", ".download_secret"])
+def test_signed_key_stays_in_output_dir(monkeypatch, storage_key):
+    token = sign_download("doc.pdf", "partita_iva", ttl=60)
+    payload = _with_claims(token, k=storage_key).partition('.')[0]
+    # Anche con una firma valida la chiave non esce da OUTPUT_DIR
+    with pytest.raises(InvalidDownloadToken):
+        verify_download(f"{payload}.{download_tokens._signature(payload)}")
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(files_router, prefix="/api")
+    return TestClient(app)
+
+def test_download_route(client):
+    path = os.path.join(config.OUTPUT_DIR, "partita_iva_route.pdf")
+    with open(path, 'wb') as f:
+        f.write(b"%PDF-1.4 test")
+
+    response = client.get(f"/api/files/{sign_download(path, 'partita_iva', ttl=120)}")
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4 test"
+    max_age = int(response.headers["Cache-Control"].split("max-age=")[1].split(",")[0])
+    assert 0 < max_age <= 120
+
+    assert client.get(f"/api/files/{sign_download(path, 'partita_iva', ttl=-1)}").status_code == 410
+    assert client.get(f"/api/files/{_with_claims(sign_download(path, 'partita_iva'), t='bundle')}").status_code == 403
+    assert client.get(f"/api/files/{sign_download('mancante.pdf', 'partita_iva')}").status_code == 404
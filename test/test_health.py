@@ -0,0 +1,30 @@
+import asyncio
+import types
+
+from services import health
+
+def _stats(waiting: int):
+    return types.SimpleNamespace(stats=lambda: {"slots": 1, "busy": 1, "waiting": waiting})
+
+def test_queue_depth_counts_the_scheduler_waiters(monkeypatch):
+    monkeypatch.setattr(health, 'ADMISSION', _stats(3))
+    monkeypatch.setattr(health, 'SCHEDULERS', {'pdf': _stats(2), 'llm': _stats(1)})
+    monkeypatch.setattr(health.config, 'MAX_QUEUE_DEPTH', 5)
+
+    async def check():
+        return health.check_load()
+
+    load = asyncio.run(check())
+    assert load["queue_depth"] == 6
+    assert load["ok"] is False
+
+def test_readiness_runs_every_check(monkeypatch):
+    monkeypatch.setattr(health, 'READINESS_CHECKS', {
+        "disk": lambda: {"ok": True, "detail": "ok"},
+        "pdf": lambda: {"ok": False, "detail": "wkhtmltopdf non trovato"},
+        "broken": lambda: 1 / 0,
+    })
+    result = asyncio.run(health.readiness())
+    assert result["ready"] is False
+    assert result["checks"]["disk"]["ok"] is True
+    assert result["checks"]["broken"] == {"ok": False, "detail": "division by zero"}
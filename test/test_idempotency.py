@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from services import idempotency, tenants
+from services.state import MemoryStore
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = MemoryStore()
+    monkeypatch.setattr(idempotency, 'get_store', lambda: store)
+    return store
+
+def _generate(tenant: str, key: str, calls: list):
+    async def compute():
+        calls.append(tenant)
+        return {"pdfUrl": f"/api/files/{tenant}"}
+
+    async def request():
+        tenants._current.set((tenants.Tenant(tenant), 'interactive'))
+        return await idempotency.run_idempotent("generate", key, {"nome": "Mario"}, compute)
+
+    return asyncio.run(request())
+
+def test_same_key_replays_the_response():
+    calls = []
+    first = _generate("a", "chiave-1", calls)
+    assert _generate("a", "chiave-1", calls) == first
+    assert calls == ["a"]
+
+def test_tenants_dont_share_idempotency_keys():
+    calls = []
+    assert _generate("a", "chiave-1", calls) == {"pdfUrl": "/api/files/a"}
+    assert _generate("b", "chiave-1", calls) == {"pdfUrl": "/api/files/b"}
+    assert calls == ["a", "b"]
+
+def test_fingerprint_depends_on_scope_and_payload():
+    fingerprint = idempotency.request_fingerprint("generate", {"nome": "Mario", "cognome": "Rossi"})
+    assert fingerprint == idempotency.request_fingerprint("generate", {"cognome": "Rossi", "nome": "Mario"})
+    assert fingerprint != idempotency.request_fingerprint("bundle", {"nome": "Mario", "cognome": "Rossi"})
@@ -0,0 +1,28 @@
+import cProfile
+import os
+
+from services import profiling
+
+def _profile() -> cProfile.Profile:
+    profile = cProfile.Profile()
+    profile.runcall(sum, range(10))
+    return profile
+
+def test_saving_keeps_only_the_most_recent_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILES_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling.config, 'PROFILES_KEEP', 3)
+
+    saved = []
+    for i in range(5):
+        saved.append(profiling.save_request_profile([_profile()]))
+        # mtime distinti anche su filesystem a bassa risoluzione
+        os.utime(tmp_path / f"{saved[-1]}.prof", (i, i))
+
+    assert sorted(os.listdir(tmp_path)) == sorted(f"{profile_id}.prof" for profile_id in saved[-3:])
+
+def test_zero_keeps_every_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILES_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling.config, 'PROFILES_KEEP', 0)
+    for _ in range(4):
+        profiling.save_request_profile([_profile()])
+    assert len(os.listdir(tmp_path)) == 4
@@ -0,0 +1,51 @@
+import types
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import config
+from services import rate_limit
+from services.state import MemoryStore
+
+@pytest.fixture
+def client(monkeypatch):
+    store = MemoryStore()
+    monkeypatch.setattr(rate_limit, 'get_store', lambda: store)
+    monkeypatch.setattr(config, 'RATE_LIMIT_PER_MINUTE', 3)
+    # Orologio fermo a metà di una finestra: il test non dipende dal minuto in cui gira
+    monkeypatch.setattr(rate_limit, 'time', types.SimpleNamespace(time=lambda: 1_000_000 * 60 + 30))
+
+    app = FastAPI()
+    app.middleware("http")(rate_limit.rate_limit_middleware)
+
+    @app.post("/api/generate")
+    async def generate():
+        return {"ok": True}
+
+    @app.get("/api/ateco")
+    async def ateco():
+        return {"ok": True}
+
+    return TestClient(app)
+
+def test_limits_posts_per_client_and_window(client):
+    assert [client.post("/api/generate").status_code for _ in range(3)] == [200, 200, 200]
+
+    response = client.post("/api/generate")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+
+def test_forwarded_for_header_doesnt_reset_the_bucket(client):
+    statuses = [
+        client.post("/api/generate", headers={"X-Forwarded-For": f"10.0.0.{i}"}).status_code
+        for i in range(5)
+    ]
+    assert statuses == [200, 200, 200, 429, 429]
+
+def test_reads_are_not_limited(client):
+    assert all(client.get("/api/ateco").status_code == 200 for _ in range(10))
+
+def test_disabled_when_limit_is_zero(client, monkeypatch):
+    monkeypatch.setattr(config, 'RATE_LIMIT_PER_MINUTE', 0)
+    assert all(client.post("/api/generate").status_code == 200 for _ in range(10))
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from typing import List
+
+import anyio
+from fastapi.concurrency import run_in_threadpool
+
+from services import scheduler, tenants
+from services.scheduler import AsyncFairScheduler, FairScheduler, run_admitted
+
+def _wait_queued(scheduler: FairScheduler, count: int) -> None:
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, "richieste non accodate"
+        time.sleep(0.001)
+
+def _run_queued(scheduler: FairScheduler, requests: List[tuple]) -> List[str]:
+    """
+    Queue the requests one at a time behind a held slot, then release it: returns the service order
+    """
+    order: List[str] = []
+    threads = []
+
+    def request(label: str, tenant: str, weight: float, priority: str) -> None:
+        with scheduler.slot(tenant, weight, priority):
+            order.append(label)
+
+    with scheduler.slot("holder"):
+        for i, args in enumerate(requests):
+            thread = threading.Thread(target=request, args=args)
+            thread.start()
+            threads.append(thread)
+            # Una alla volta: l'ordine di arrivo decide i pareggi
+            _wait_queued(scheduler, i + 1)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+def test_slots_are_shared_by_weight():
+    scheduler = FairScheduler("test", slots=1)
+    requests = [(f"a{i}", "a", 3.0, "interactive") for i in range(6)]
+    requests += [(f"b{i}", "b", 1.0, "interactive") for i in range(2)]
+
+    order = _run_queued(scheduler, requests)
+
+    # Il tenant con peso 3 ottiene tre slot per ognuno dell'altro, anche se è arrivato prima con tutto il lotto
+    assert order == ["a0", "a1", "a2", "b0", "a3", "a4", "a5", "b1"]
+
+def test_batch_waits_for_interactive_requests():
+    scheduler = FairScheduler("test", slots=1)
+    requests = [
+        ("batch0", "bulk", 10.0, "batch"),
+        ("batch1", "bulk", 10.0, "batch"),
+        ("a0", "a", 1.0, "interactive"),
+        ("b0", "b", 1.0, "interactive"),
+    ]
+
+    assert _run_queued(scheduler, requests) == ["a0", "b0", "batch0", "batch1"]
+
+def test_stats_count_busy_slots_and_waiters():
+    scheduler = FairScheduler("test", slots=2)
+    with scheduler.slot("a"):
+        assert scheduler.stats() == {"slots": 2, "busy": 1, "waiting": 0}
+    assert scheduler.stats() == {"slots": 2, "busy": 0, "waiting": 0}
+
+def test_waiting_generations_hold_no_threads(monkeypatch):
+    monkeypatch.setattr(scheduler, 'ADMISSION', AsyncFairScheduler('generation', 4))
+    release = threading.Event()
+    started: List[str] = []
+
+    def generation(label: str) -> str:
+        started.append(label)
+        release.wait(5)
+        return label
+
+    async def request(tenant: str, label: str) -> str:
+        tenants._current.set((tenants.Tenant(tenant), 'interactive'))
+        return await run_admitted(generation, label)
+
+    async def main() -> None:
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        # Più richieste del tenant bulk che thread nel threadpool
+        bulk = [asyncio.create_task(request('bulk', f'bulk{i}')) for i in range(int(limiter.total_tokens) + 20)]
+        await asyncio.sleep(0.2)
+        other = asyncio.create_task(request('other', 'other'))
+        await asyncio.sleep(0.05)
+
+        # Solo le generazioni ammesse occupano thread: una chiamata breve (quote, store) ne trova subito uno
+        assert limiter.borrowed_tokens == 4
+        assert await asyncio.wait_for(run_in_threadpool(lambda: 'store'), timeout=1) == 'store'
+
+        release.set()
+        results = await asyncio.wait_for(asyncio.gather(*bulk, other), timeout=10)
+        assert len(results) == len(bulk) + 1
+
+    asyncio.run(main())
+    # L'altro tenant passa davanti alle richieste bulk ancora in coda
+    assert started.index('other') < 8
+
+def test_cancelled_waiter_leaves_the_queue():
+    admission = AsyncFairScheduler('generation', 1)
+
+    async def hold(event: asyncio.Event) -> None:
+        async with admission.slot('a'):
+            await event.wait()
+
+    async def main() -> None:
+        event = asyncio.Event()
+        holder = asyncio.create_task(hold(event))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(asyncio.Event()))
+        await asyncio.sleep(0)
+        assert admission.stats() == {"slots": 1, "busy": 1, "waiting": 1}
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert admission.stats()["waiting"] == 0
+
+        event.set()
+        await holder
+        assert admission.stats() == {"slots": 1, "busy": 0, "waiting": 0}
+
+    asyncio.run(main())
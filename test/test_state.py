@@ -0,0 +1,42 @@
+import pytest
+
+from services import state
+from services.state import MemoryStore, SqliteStore
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStore()
+    return SqliteStore(str(tmp_path / 'state.db'))
+
+def test_incr_counts_and_expires(store, monkeypatch):
+    assert [store.incr('hits', ttl=60) for _ in range(3)] == [1, 2, 3]
+    now = state.time.time()
+    monkeypatch.setattr(state.time, 'time', lambda: now + 61)
+    assert store.get('hits') is None
+    assert store.incr('hits', ttl=60) == 1
+
+def test_expired_keys_are_purged_every_n_writes(store, monkeypatch):
+    monkeypatch.setattr(state, '_PURGE_EVERY', 10)
+    for i in range(5):
+        store.set(f'old:{i}', i, ttl=1)
+    store.set('permanent', 'x')
+    now = state.time.time()
+    monkeypatch.setattr(state.time, 'time', lambda: now + 2)
+    assert store.purge_expired() == 5
+    assert store.get('permanent') == 'x'
+
+    for i in range(5):
+        store.set(f'old:{i}', i, ttl=1)
+    monkeypatch.setattr(state.time, 'time', lambda: now + 4)
+    for i in range(10):
+        store.incr(f'new:{i}', ttl=60)
+    # La decima scrittura ha già cancellato le chiavi scadute
+    assert store.purge_expired() == 0
+
+def test_sqlite_startup_purges_rows_left_by_previous_workers(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.db')
+    SqliteStore(path).set('stale', 1, ttl=1)
+    now = state.time.time()
+    monkeypatch.setattr(state.time, 'time', lambda: now + 2)
+    assert SqliteStore(path).purge_expired() == 0
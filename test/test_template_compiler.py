@@ -0,0 +1,39 @@
+import glob
+import os
+
+import pytest
+from jinja2 import Environment, Template, meta
+
+import config
+from services.template_compiler import try_compile_template
+
+TEMPLATES = sorted(glob.glob(os.path.join(config.TEMPLATE_DIR, '*.html')))
+
+def _contexts(variables):
+    """Contexts exercising every branch: missing variables, None, filled, falsy and special values"""
+    return {
+        'vuoto': {},
+        'none': dict.fromkeys(variables),
+        'compilato': {name: f"valore {name}" for name in variables},
+        'parziale': {name: f"valore {name}" for name in variables[::2]},
+        'falsy': {name: value for name, value in zip(variables, ['', 0, False] * len(variables))},
+        'speciali': {
+            name: value
+            for name, value in zip(variables, ['Non specificato', 'Uso generico', '<b>&"\'', 42, 'àèìòù'] * len(variables))
+        },
+    }
+
+def test_templates_found():
+    assert TEMPLATES
+
+@pytest.mark.parametrize('path', TEMPLATES, ids=os.path.basename)
+def test_compiled_templates_match_jinja(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    compiled = try_compile_template(source, os.path.basename(path))
+    assert compiled is not None, 'template non compilabile: verrebbe usato Jinja'
+
+    jinja_template = Template(source)
+    variables = sorted(meta.find_undeclared_variables(Environment().parse(source)))
+    for name, context in _contexts(variables).items():
+        assert compiled.render(**context) == jinja_template.render(**context), name